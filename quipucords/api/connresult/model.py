@@ -53,8 +53,37 @@ class SystemConnectionResult(BaseModel):
     task_connection_result = models.ForeignKey(
         TaskConnectionResult, on_delete=models.CASCADE, related_name="systems"
     )
+    # machine id and boot id printed by the connected host, see
+    # QUIPUCORDS_NETWORK_CONNECT_DEDUP
+    identity = models.JSONField(null=True)
 
     class Meta:
         """Metadata for model."""
 
         verbose_name_plural = _(messages.PLURAL_SYS_CONN_RESULTS_MSG)
+
+
+class CredentialAffinity(BaseModel):
+    """The credential that last connected to a host of a source.
+
+    Network scans try this credential first. An affinity is stale once its
+    credential is updated, and affinities of a source are dropped when its
+    connection settings or credentials change.
+    """
+
+    source = models.ForeignKey(
+        Source, on_delete=models.CASCADE, related_name="credential_affinities"
+    )
+    name = models.TextField()
+    credential = models.ForeignKey(
+        Credential, on_delete=models.CASCADE, related_name="+"
+    )
+
+    class Meta:
+        """Metadata for model."""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source", "name"], name="unique_credential_affinity"
+            )
+        ]
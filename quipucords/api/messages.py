@@ -75,6 +75,9 @@ SCAN_NAME_ALREADY_EXISTS = "Scan with name=%s already exists"
 SCAN_OPTIONS_EXTENDED_SEARCH_DIR_NOT_LIST = (
     "search_directories must be a JSON array of valid paths"
 )
+SCAN_OPTIONS_INVALID_FACT_PROFILE = (
+    "%(fact_profile)s is not a valid fact profile. Valid profiles: %(valid_profiles)s"
+)
 PLURAL_SCANS_MSG = "Scans"
 
 # scan jobs messages
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.16 on 2026-10-17 09:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0010_credentialaffinity"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="scan",
+            name="fact_profile",
+            field=models.CharField(
+                choices=[
+                    ("full", "full"),
+                    ("rhel-only", "rhel-only"),
+                    ("middleware", "middleware"),
+                ],
+                default="full",
+                max_length=16,
+            ),
+        ),
+    ]
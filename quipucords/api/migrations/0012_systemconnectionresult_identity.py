@@ -0,0 +1,17 @@
+# Generated by Django 5.2.16 on 2026-10-17 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0011_scan_fact_profile"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="systemconnectionresult",
+            name="identity",
+            field=models.JSONField(null=True),
+        ),
+    ]
@@ -3,6 +3,7 @@
 
 from api.aggregate_report.model import AggregateReport
 from api.connresult.model import (
+    CredentialAffinity,
     JobConnectionResult,
     SystemConnectionResult,
     TaskConnectionResult,
@@ -45,6 +45,17 @@ class Scan(BaseModel):
     MAX_CONCURRENCY = "max_concurrency"
     DISABLED_OPTIONAL_PRODUCTS = "disabled_optional_products"
     ENABLED_EXTENDED_PRODUCT_SEARCH = "enabled_extended_product_search"
+    FACT_PROFILE = "fact_profile"
+
+    # the facts network scans gather, see scanner.network.fact_profiles
+    FACT_PROFILE_FULL = "full"
+    FACT_PROFILE_RHEL_ONLY = "rhel-only"
+    FACT_PROFILE_MIDDLEWARE = "middleware"
+    FACT_PROFILE_CHOICES = (
+        (FACT_PROFILE_FULL, FACT_PROFILE_FULL),
+        (FACT_PROFILE_RHEL_ONLY, FACT_PROFILE_RHEL_ONLY),
+        (FACT_PROFILE_MIDDLEWARE, FACT_PROFILE_MIDDLEWARE),
+    )
 
     DEFAULT_MAX_CONCURRENCY = 25
     UPPER_MAX_CONCURRENCY = 200
@@ -64,6 +75,9 @@ class Scan(BaseModel):
     max_concurrency = models.PositiveIntegerField(default=DEFAULT_MAX_CONCURRENCY)
     enabled_optional_products = models.JSONField(null=True)
     enabled_extended_product_search = models.JSONField(null=True)
+    fact_profile = models.CharField(
+        max_length=16, choices=FACT_PROFILE_CHOICES, default=FACT_PROFILE_FULL
+    )
 
     class Meta:
         """Metadata for model."""
@@ -93,6 +107,8 @@ class Scan(BaseModel):
                 if val is not None:
                     disabled_products[key] = not val
             scan_options[Scan.DISABLED_OPTIONAL_PRODUCTS] = disabled_products
+        if self.fact_profile != Scan.FACT_PROFILE_FULL:
+            scan_options[Scan.FACT_PROFILE] = self.fact_profile
         return scan_options
 
     @options.setter
@@ -121,6 +137,9 @@ class Scan(BaseModel):
                 extended_search.get(Scan.EXT_PRODUCT_SEARCH_DIRS, None)
             )
             self.enabled_extended_product_search = enabled_extended_product_search
+        fact_profile = value.get(Scan.FACT_PROFILE, None)
+        if fact_profile is not None:
+            self.fact_profile = fact_profile
 
     @staticmethod
     def get_default_extra_vars():
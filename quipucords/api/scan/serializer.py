@@ -151,6 +151,7 @@ class ScanSerializer(NotEmptySerializer):
             ScanSerializer.validate_enabled_extended_product_search(
                 options.get(Scan.ENABLED_EXTENDED_PRODUCT_SEARCH, None)
             )
+            ScanSerializer.validate_fact_profile(options.get(Scan.FACT_PROFILE, None))
         return options
 
     @staticmethod
@@ -184,6 +185,24 @@ class ScanSerializer(NotEmptySerializer):
 
         return max_concurrency
 
+    @staticmethod
+    def validate_fact_profile(fact_profile):
+        """Validate fact_profile."""
+        if fact_profile is None:
+            return None
+
+        valid_profiles = [choice for choice, _ in Scan.FACT_PROFILE_CHOICES]
+        if fact_profile not in valid_profiles:
+            errors = {
+                Scan.FACT_PROFILE: [
+                    _(messages.SCAN_OPTIONS_INVALID_FACT_PROFILE)
+                    % {"fact_profile": fact_profile, "valid_profiles": valid_profiles}
+                ]
+            }
+            raise ValidationError(errors)
+
+        return fact_profile
+
     @staticmethod
     def validate_disabled_optional_products(disabled_optional_products):
         """Validate disabled_optional_products."""
@@ -285,6 +304,10 @@ class ScanSerializer(NotEmptySerializer):
         if extended_search:
             self.update_enabled_extended_product_search(instance, extended_search)
 
+        fact_profile = options.pop(Scan.FACT_PROFILE, None)
+        if fact_profile is not None:
+            instance.fact_profile = fact_profile
+
     @staticmethod
     def update_optional_products(instance, disabled_products):
         """Update the enabled_optional_products."""
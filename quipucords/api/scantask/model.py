@@ -308,6 +308,43 @@ class ScanTask(BaseModel):
             description = f"{prefix} {name}."
             self._log_stats(description)
 
+    # All task types
+    @transaction.atomic
+    def add_stats(  # noqa: PLR0913
+        self,
+        description,
+        sys_count=0,
+        sys_scanned=0,
+        sys_failed=0,
+        sys_unreachable=0,
+    ):
+        """Add amounts (possibly negative) to scan task stats.
+
+        Unlike update_stats, this is safe when several workers update the
+        stats of the same task concurrently.
+        :param description: Description to be logged with stats.
+        :param sys_count: Amount to add to total number of systems.
+        :param sys_scanned: Amount to add to systems scanned.
+        :param sys_failed: Amount to add to systems failed during scan.
+        :param sys_unreachable: Amount to add to systems unreachable during scan.
+        """
+        update_kwargs = {}
+        if sys_count:
+            update_kwargs["systems_count"] = F("systems_count") + sys_count
+        if sys_scanned:
+            update_kwargs["systems_scanned"] = F("systems_scanned") + sys_scanned
+        if sys_failed:
+            update_kwargs["systems_failed"] = F("systems_failed") + sys_failed
+        if sys_unreachable:
+            update_kwargs["systems_unreachable"] = (
+                F("systems_unreachable") + sys_unreachable
+            )
+
+        if update_kwargs:
+            ScanTask.objects.filter(id=self.id).update(**update_kwargs)
+        self.refresh_from_db()
+        self._log_stats(description)
+
     # All task types
     def status_start(self):
         """Change status to RUNNING."""
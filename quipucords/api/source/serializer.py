@@ -263,6 +263,18 @@ class SourceSerializerBase(ModelSerializer):
         instance.save()
         return instance
 
+    @staticmethod
+    def connection_settings(source):
+        """Get the settings a source connects to its hosts with."""
+        credential_ids = set(source.credentials.values_list("id", flat=True))
+        return source.port, source.use_paramiko, credential_ids
+
+    @staticmethod
+    def forget_stale_credential_affinities(source, connection_settings):
+        """Forget which credentials connected to hosts if connecting changed."""
+        if SourceSerializerBase.connection_settings(source) != connection_settings:
+            source.credential_affinities.all().delete()
+
     @staticmethod
     def check_credential_type(source_type, credential):
         """Look for existing credential with same type as the source.
@@ -493,6 +505,7 @@ class SourceSerializerV1(NotEmptySerializer, SourceSerializerBase):
     @transaction.atomic
     def update(self, instance, validated_data):
         """Update a V1 source."""
+        connection_settings = self.connection_settings(instance)
         options = validated_data.pop("options", None)
         instance = super().update_base(instance, validated_data)
         # If SSL options were specified via the options property,
@@ -502,6 +515,7 @@ class SourceSerializerV1(NotEmptySerializer, SourceSerializerBase):
             self.validate_opts(options, source_type)
             self.update_options(options, instance)
             instance.save()
+        self.forget_stale_credential_affinities(instance, connection_settings)
         return instance
 
 
@@ -567,6 +581,7 @@ class SourceSerializerV2(SourceSerializerBase):
     @transaction.atomic
     def update(self, instance, validated_data):
         """Update a V2 source."""
+        connection_settings = self.connection_settings(instance)
         ssl_options = {}
         for ssl_option in self.SSL_OPTIONS:
             value = validated_data.pop(ssl_option, None)
@@ -578,6 +593,7 @@ class SourceSerializerV2(SourceSerializerBase):
             self.validate_opts(ssl_options, source_type, apply_defaults=False)
             self.update_options(ssl_options, instance)
             instance.save()
+        self.forget_stale_credential_affinities(instance, connection_settings)
         return instance
 
 
@@ -16,6 +16,7 @@ class DataSources(TextChoices):
 
 ENCRYPTED_DATA_MASK = "********"
 SCAN_JOB_LOG = "scan-job-{scan_job_id}-{output_type}.txt"
+SCAN_JOB_TASK_PROFILE = "scan-job-{scan_job_id}-task-profile.{extension}"
 # minimum accepted version for imported reports
 MINIMUM_REPORT_VERSION = (1, 0, 0)
 GENERATED_SSH_KEYFILE = "generated_ssh_keyfile"
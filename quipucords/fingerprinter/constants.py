@@ -6,3 +6,8 @@ PRODUCTS_KEY = "products"
 NAME_KEY = "name"
 PRESENCE_KEY = "presence"
 SOURCES_KEY = "sources"
+
+# raw fact of the network hosts inspected with a fact profile, describing the
+# facts and products it left out; also marks the fingerprint metadata and the
+# products left out by it
+FACT_PROFILE = "fact_profile"
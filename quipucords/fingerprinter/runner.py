@@ -18,6 +18,7 @@ from constants import DataSources
 from fingerprinter import formatters
 from fingerprinter.constants import (
     ENTITLEMENTS_KEY,
+    FACT_PROFILE,
     META_DATA_KEY,
     NAME_KEY,
     PRESENCE_KEY,
@@ -900,19 +901,30 @@ class FingerprintTaskRunner(ScanTaskRunner):
                     priority_prod_dict[prod[NAME_KEY]] = prod
                 for prod in to_merge_prod:
                     merge_prod = priority_prod_dict.get(prod[NAME_KEY])
-                    presence = merge_prod.get(PRESENCE_KEY)
-                    if (
-                        merge_prod
-                        and presence == Product.ABSENT
-                        and prod.get(PRESENCE_KEY) != Product.ABSENT
-                    ):
-                        priority_prod_dict[prod[NAME_KEY]] = prod
-                    elif merge_prod is None:
+                    if merge_prod is None or self._replaces_product(merge_prod, prod):
                         priority_prod_dict[prod[NAME_KEY]] = prod
                 priority_fingerprint[PRODUCTS_KEY] = list(priority_prod_dict.values())
 
         return priority_fingerprint
 
+    @classmethod
+    def _replaces_product(cls, priority_product: dict, product: dict) -> bool:
+        """Tell if a product of a lower priority fingerprint replaces the other."""
+        if cls._skipped_by_fact_profile(priority_product):
+            # not detected at all; any other detection is better
+            return not cls._skipped_by_fact_profile(product)
+        if cls._skipped_by_fact_profile(product):
+            return False
+        return (
+            priority_product.get(PRESENCE_KEY) == Product.ABSENT
+            and product.get(PRESENCE_KEY) != Product.ABSENT
+        )
+
+    @staticmethod
+    def _skipped_by_fact_profile(product: dict) -> bool:
+        """Tell if the fact profile of the scan left the product undetected."""
+        return FACT_PROFILE in product.get(META_DATA_KEY, {})
+
     def _add_fact_to_fingerprint(  # noqa: PLR0913
         self,
         source: dict,
@@ -1152,9 +1164,34 @@ class FingerprintTaskRunner(ScanTaskRunner):
             source, "subman_consumed", fact, fingerprint
         )
         self._add_products_to_fingerprint(source, fact, fingerprint)
+        self._mark_skipped_by_fact_profile(fact, fingerprint)
 
         return fingerprint
 
+    @staticmethod
+    def _mark_skipped_by_fact_profile(fact: dict, fingerprint: dict):
+        """Tell the facts left out by a fact profile apart from the failed ones.
+
+        The facts of the roles a fact profile skips are missing just like the
+        facts that could not be collected. Their metadata names the fact profile,
+        and the products the profile doesn't detect are unknown, not absent.
+        """
+        profile = fact.get(FACT_PROFILE)
+        if not profile:
+            return
+        skipped_facts = set(profile.get("facts", []))
+        for fingerprint_key, metadata in fingerprint[META_DATA_KEY].items():
+            if (
+                fingerprint.get(fingerprint_key) is None
+                and metadata.get("raw_fact_key") in skipped_facts
+            ):
+                metadata[FACT_PROFILE] = profile["name"]
+        skipped_products = set(profile.get("products", []))
+        for product in fingerprint.get(PRODUCTS_KEY, []):
+            if product[NAME_KEY] in skipped_products:
+                product[PRESENCE_KEY] = Product.UNKNOWN
+                product[META_DATA_KEY][FACT_PROFILE] = profile["name"]
+
     def _process_vcenter_fact(self, source, fact):
         """Process a fact and convert to a fingerprint.
 
@@ -15,6 +15,7 @@ import os
 import random
 import stat
 import string
+import tempfile
 import warnings
 from pathlib import Path
 
@@ -177,6 +178,146 @@ QUIPUCORDS_NETWORK_CONNECT_JOB_TIMEOUT = env.int(
     "QUIPUCORDS_NETWORK_CONNECT_JOB_TIMEOUT", 10
 )  # 10 sec
 
+# How network inspect schedules hosts. "group" runs serial batches of
+# max_concurrency hosts (each batch waits for its slowest host); "sliding" runs
+# every host in a single playbook with the "free" strategy, so a finished host
+# is replaced right away by the next one.
+QUIPUCORDS_NETWORK_INSPECT_SCHEDULING = env.str(
+    "QUIPUCORDS_NETWORK_INSPECT_SCHEDULING", "group"
+).lower()
+
+# Adapt the number of hosts inspected at once with group scheduling, from
+# NETWORK_ADAPTIVE_CONCURRENCY_BASELINE up to the max_concurrency of the scan,
+# after each group: it is halved when the controller load average per CPU is
+# above NETWORK_ADAPTIVE_MAX_LOAD, when less than NETWORK_ADAPTIVE_MIN_AVAILABLE_MEMORY
+# of its memory is available, or when the hosts fail or slow down, and doubled
+# otherwise. See scanner/network/concurrency.py.
+QUIPUCORDS_NETWORK_ADAPTIVE_CONCURRENCY = env.bool(
+    "QUIPUCORDS_NETWORK_ADAPTIVE_CONCURRENCY", False
+)
+QUIPUCORDS_NETWORK_ADAPTIVE_CONCURRENCY_BASELINE = env.int(
+    "QUIPUCORDS_NETWORK_ADAPTIVE_CONCURRENCY_BASELINE", 5
+)
+QUIPUCORDS_NETWORK_ADAPTIVE_MAX_LOAD = env.float(
+    "QUIPUCORDS_NETWORK_ADAPTIVE_MAX_LOAD", 1.0
+)
+QUIPUCORDS_NETWORK_ADAPTIVE_MIN_AVAILABLE_MEMORY = env.float(
+    "QUIPUCORDS_NETWORK_ADAPTIVE_MIN_AVAILABLE_MEMORY", 0.1
+)
+
+# Max number of finished hosts waiting to be persisted during network inspect.
+QUIPUCORDS_NETWORK_INSPECT_WRITER_QUEUE_SIZE = env.int(
+    "QUIPUCORDS_NETWORK_INSPECT_WRITER_QUEUE_SIZE", 100
+)
+# Number of worker processes post processing the raw facts of network inspect
+# hosts waiting to be persisted, 0 to process them in the writer thread.
+# See scanner/network/post_process.py.
+QUIPUCORDS_NETWORK_POST_PROCESS_WORKERS = env.int(
+    "QUIPUCORDS_NETWORK_POST_PROCESS_WORKERS", 0
+)
+
+# Scan network hosts in a single pass: the inspect playbook runs once per
+# credential and finds the working credential for each host itself, instead of
+# running the connect playbook for every credential first.
+QUIPUCORDS_NETWORK_SINGLE_PASS_SCAN = env.bool(
+    "QUIPUCORDS_NETWORK_SINGLE_PASS_SCAN", False
+)
+# Max number of hosts inspected by each single pass inspect playbook run. The
+# remaining hosts of a credential are taken a chunk at a time.
+QUIPUCORDS_NETWORK_SINGLE_PASS_CHUNK_SIZE = env.int(
+    "QUIPUCORDS_NETWORK_SINGLE_PASS_CHUNK_SIZE", 1000
+)
+
+# Try all the credentials of a source in a single connect playbook run. Each host
+# attempts them in order until one works, and unreachable hosts are given up on
+# after the first attempt instead of timing out once per credential.
+QUIPUCORDS_NETWORK_CONNECT_ALL_CREDENTIALS = env.bool(
+    "QUIPUCORDS_NETWORK_CONNECT_ALL_CREDENTIALS", False
+)
+
+# Collect the machine id and boot id of network hosts with the connection test,
+# and inspect only one of the hosts (addresses) of the same machine. The others
+# are recorded in the host_aliases fact of the inspected one. Doesn't apply to
+# single pass scans, which connect and inspect at once.
+QUIPUCORDS_NETWORK_CONNECT_DEDUP = env.bool("QUIPUCORDS_NETWORK_CONNECT_DEDUP", False)
+
+# Record how long each task of the inspect playbook took on each host, in the
+# task profile files of the scan job (included in the reports tarball), and log
+# the slowest roles and hosts of each network scan task.
+QUIPUCORDS_NETWORK_TASK_PROFILE = env.bool("QUIPUCORDS_NETWORK_TASK_PROFILE", False)
+
+# Resume network scan tasks that run again after being interrupted (e.g. their
+# worker was killed): hosts with a connection result for the task are not
+# connected to again and hosts with an inspect result are not inspected again.
+# Doesn't apply to sharded tasks, whose stats are shared by the shards.
+QUIPUCORDS_NETWORK_SCAN_RESUME = env.bool("QUIPUCORDS_NETWORK_SCAN_RESUME", False)
+
+# Remember the credential that last connected to each network host, and try it
+# first on the next scan of the same source before searching all credentials.
+QUIPUCORDS_NETWORK_CREDENTIAL_AFFINITY = env.bool(
+    "QUIPUCORDS_NETWORK_CREDENTIAL_AFFINITY", False
+)
+
+# Skip the expensive product roles (redhat_packages and the jboss ones) on hosts
+# whose change signature did not change since their last successful inspection,
+# reusing the facts of that inspection instead.
+QUIPUCORDS_NETWORK_INCREMENTAL_INSPECT = env.bool(
+    "QUIPUCORDS_NETWORK_INCREMENTAL_INSPECT", False
+)
+
+# Gather the facts of 8 user level system roles (etc_release, uname,
+# redhat_release, installed_products, insights, system_purpose, memory and
+# hostnamectl) with a single shell script per host (the collector role) instead
+# of a raw task per command. This is not a single-shot inspection: the other
+# roles, including the ones needing privilege escalation (cpu, dmi, ifconfig,
+# subman, virt_what, the jboss_* ones...), still run a task per command.
+QUIPUCORDS_NETWORK_COLLECT_USER_ROLES = env.bool(
+    "QUIPUCORDS_NETWORK_COLLECT_USER_ROLES", False
+)
+
+# Probe network hosts with a TCP handshake on the source port before connecting
+# with Ansible. Hosts that refuse or don't answer within NETWORK_TCP_PROBE_TIMEOUT
+# seconds are recorded as unreachable right away instead of waiting out the SSH
+# connect timeout once per credential.
+QUIPUCORDS_NETWORK_TCP_PROBE = env.bool("QUIPUCORDS_NETWORK_TCP_PROBE", False)
+QUIPUCORDS_NETWORK_TCP_PROBE_CONCURRENCY = env.int(
+    "QUIPUCORDS_NETWORK_TCP_PROBE_CONCURRENCY", 256
+)
+QUIPUCORDS_NETWORK_TCP_PROBE_TIMEOUT = env.float(
+    "QUIPUCORDS_NETWORK_TCP_PROBE_TIMEOUT", 2.0
+)
+
+# Keep the SSH connections of a network scan task open (ControlMaster) between
+# its connect and inspect playbook runs, in a directory per scan job under
+# NETWORK_SSH_CONTROL_DIR. Idle connections close after NETWORK_SSH_CONTROL_PERSIST
+# seconds, and all of them when the task ends. Socket paths are length limited,
+# so keep the directory short.
+QUIPUCORDS_NETWORK_SSH_MULTIPLEXING = env.bool(
+    "QUIPUCORDS_NETWORK_SSH_MULTIPLEXING", False
+)
+QUIPUCORDS_NETWORK_SSH_CONTROL_DIR = Path(
+    env.str(
+        "QUIPUCORDS_NETWORK_SSH_CONTROL_DIR",
+        Path(tempfile.gettempdir()) / "quipucords-ssh",
+    )
+)
+QUIPUCORDS_NETWORK_SSH_CONTROL_PERSIST = env.int(
+    "QUIPUCORDS_NETWORK_SSH_CONTROL_PERSIST", 300
+)
+
+# Max number of Celery tasks a single network source is split into. Each shard
+# connects to and inspects its own slice of the source's hosts, so one source can
+# use several workers. A shard gets at least NETWORK_SCAN_SHARD_MIN_HOSTS hosts.
+# 1 disables sharding.
+QUIPUCORDS_NETWORK_SCAN_SHARDS = env.int("QUIPUCORDS_NETWORK_SCAN_SHARDS", 1)
+QUIPUCORDS_NETWORK_SCAN_SHARD_MIN_HOSTS = env.int(
+    "QUIPUCORDS_NETWORK_SCAN_SHARD_MIN_HOSTS", 100
+)
+# How often (in seconds) a running shard checks whether its scan was canceled.
+QUIPUCORDS_NETWORK_SCAN_SHARD_CANCEL_CHECK_INTERVAL = env.int(
+    "QUIPUCORDS_NETWORK_SCAN_SHARD_CANCEL_CHECK_INTERVAL", 5
+)
+
 QUIPUCORDS_CONNECT_TASK_TIMEOUT = env.int("QUIPUCORDS_CONNECT_TASK_TIMEOUT", 30)
 QUIPUCORDS_INSPECT_TASK_TIMEOUT = env.int("QUIPUCORDS_INSPECT_TASK_TIMEOUT", 600)
 
@@ -191,6 +332,25 @@ QUIPUCORDS_AAP_INSPECT_PAGE_COUNT_PERIODIC_WARNING = env.int(
 )
 QUIPUCORDS_AAP_USE_HOST_METRICS = env.bool("QUIPUCORDS_AAP_USE_HOST_METRICS", True)
 
+# Collect Satellite 6 (API v2) host details in bulk: the host fields come from full
+# pages of the host list and their facts from pages of fact values, both requested
+# concurrently, so only the details missing from those pages are requested per host.
+# See SatelliteSixV2.hosts_facts.
+QUIPUCORDS_SATELLITE_BULK_HOSTS = env.bool("QUIPUCORDS_SATELLITE_BULK_HOSTS", False)
+QUIPUCORDS_SATELLITE_BULK_PER_PAGE = env.int("QUIPUCORDS_SATELLITE_BULK_PER_PAGE", 500)
+
+# Only request the details of the Satellite 6 (API v2) hosts updated or checked in
+# since the previous successful scan of the same source, carrying the facts of the
+# other hosts forward from that scan. A full scan is still forced when the last one
+# is older than QUIPUCORDS_SATELLITE_FULL_REFRESH_DAYS.
+# See scanner.satellite.incremental.
+QUIPUCORDS_SATELLITE_INCREMENTAL_SCAN = env.bool(
+    "QUIPUCORDS_SATELLITE_INCREMENTAL_SCAN", False
+)
+QUIPUCORDS_SATELLITE_FULL_REFRESH_DAYS = env.int(
+    "QUIPUCORDS_SATELLITE_FULL_REFRESH_DAYS", 7
+)
+
 ANSIBLE_LOG_LEVEL = env.int("ANSIBLE_LOG_LEVEL", 3)
 
 if PRODUCTION:
@@ -361,6 +521,19 @@ elif QUIPUCORDS_DBMS == "postgres":
         }
     }
 QUIPUCORDS_BULK_CREATE_BATCH_SIZE = env.int("QUIPUCORDS_BULK_CREATE_BATCH_SIZE", 100)
+# Max number of systems whose inspect results are persisted together, with one
+# bulk insert of results, one of facts, and one scan task stats update.
+QUIPUCORDS_INSPECT_RESULT_BATCH_SIZE = env.int(
+    "QUIPUCORDS_INSPECT_RESULT_BATCH_SIZE", 50
+)
+# Scan task stats counted per system are written to the database once this many
+# systems were counted, or once the oldest unwritten count is this many seconds old.
+QUIPUCORDS_SCAN_TASK_STATS_FLUSH_COUNT = env.int(
+    "QUIPUCORDS_SCAN_TASK_STATS_FLUSH_COUNT", 50
+)
+QUIPUCORDS_SCAN_TASK_STATS_FLUSH_INTERVAL = env.float(
+    "QUIPUCORDS_SCAN_TASK_STATS_FLUSH_INTERVAL", 5.0
+)
 
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
@@ -0,0 +1,110 @@
+"""Persist the inspect results of many systems at once."""
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from api.models import InspectGroup, InspectResult, RawFact, ScanTask
+
+# scan task stat (an add_stats argument) counting each inspect result status
+STAT_BY_STATUS = {
+    InspectResult.SUCCESS: "sys_scanned",
+    InspectResult.FAILED: "sys_failed",
+    InspectResult.UNREACHABLE: "sys_unreachable",
+}
+
+
+class InspectResultBatch:
+    """Collect inspect results and persist them with a few bulk queries.
+
+    Persisting one system at a time costs an InspectResult insert, a RawFact insert
+    and a scan task stats update (plus a refresh) per system. A batch inserts the
+    results and facts of up to `batch_size` systems with a bulk_create each, and adds
+    their stats to the scan task with a single update.
+
+    Results are persisted when the batch is full, when `flush` is called and when
+    leaving the batch context without an exception; the results still pending when
+    the context raises are dropped, so the caller can retry them.
+    """
+
+    def __init__(
+        self,
+        scan_task: ScanTask,
+        inspect_group: InspectGroup,
+        batch_size: int | None = None,
+    ):
+        """Initialize the batch.
+
+        :param scan_task: the inspect scan task whose stats are updated
+        :param inspect_group: the group the inspect results belong to
+        :param batch_size: max number of results waiting to be persisted, defaults
+            to QUIPUCORDS_INSPECT_RESULT_BATCH_SIZE
+        """
+        self.scan_task = scan_task
+        self.inspect_group = inspect_group
+        self.batch_size = batch_size or settings.QUIPUCORDS_INSPECT_RESULT_BATCH_SIZE
+        self._pending: list[tuple[InspectResult, dict]] = []
+        # stats of the systems without a result of their own, see count
+        self._pending_stats = Counter()
+
+    def __enter__(self):
+        """Start collecting results."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Persist the results still pending, or drop them if the block raised."""
+        if exc_info[0] is None:
+            self.flush()
+        else:
+            self._pending = []
+            self._pending_stats = Counter()
+
+    def __len__(self):
+        """Return the number of results waiting to be persisted."""
+        return len(self._pending)
+
+    def add(self, name: str, status: str, facts: dict):
+        """Add the inspect result of a system, persisting the batch once full.
+
+        :param name: the system name
+        :param status: the InspectResult status
+        :param facts: the raw facts of the system, by name
+        """
+        inspect_result = InspectResult(
+            name=name, status=status, inspect_group=self.inspect_group
+        )
+        self._pending.append((inspect_result, facts))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def count(self, status: str):
+        """Count a system in the stats without adding a result for it.
+
+        :param status: the InspectResult status the system is counted with
+        """
+        self._pending_stats[STAT_BY_STATUS[status]] += 1
+
+    @transaction.atomic
+    def flush(self) -> list[InspectResult]:
+        """Persist the pending results and update the scan task stats."""
+        pending, self._pending = self._pending, []
+        stats, self._pending_stats = self._pending_stats, Counter()
+        if not pending and not stats:
+            return []
+        inspect_results = InspectResult.objects.bulk_create(
+            [inspect_result for inspect_result, _ in pending]
+        )
+        RawFact.objects.bulk_create(
+            [
+                RawFact(name=name, value=value, inspect_result=inspect_result)
+                for inspect_result, facts in pending
+                for name, value in facts.items()
+            ],
+            batch_size=settings.QUIPUCORDS_BULK_CREATE_BATCH_SIZE,
+        )
+        stats.update(STAT_BY_STATUS[result.status] for result in inspect_results)
+        self.scan_task.add_stats(
+            f"PERSISTED {len(inspect_results)} inspect results.", **stats
+        )
+        return inspect_results
@@ -11,8 +11,10 @@ from django.db.models import Sum
 
 from api.common.common_report import create_report_version
 from api.models import InspectGroup, Report, ScanJob, ScanTask
+from constants import DataSources
 from fingerprinter.runner import FingerprintTaskRunner
 from scanner.get_scanner import get_scanner
+from scanner.network.inspect import get_shard_count
 from scanner.runner import ScanTaskRunner
 
 logger = logging.getLogger(__name__)
@@ -103,23 +105,30 @@ def run_task_runner(runner: ScanTaskRunner, *run_args):
         runner.scan_job.status_fail(message)
         raise error
 
-    # Save Task status
+    return save_task_status(runner.scan_task, status_message, task_status)
+
+
+def save_task_status(scan_task: ScanTask, status_message, task_status):
+    """Save the status a scan task finished with.
+
+    :returns: the saved ScanTask status
+    """
     if task_status == ScanTask.CANCELED:
-        runner.scan_task.status_cancel()
+        scan_task.status_cancel()
     elif task_status == ScanTask.PAUSED:
-        runner.scan_task.status_pause()
+        scan_task.status_pause()
     elif task_status == ScanTask.COMPLETED:
-        runner.scan_task.status_complete(status_message)
+        scan_task.status_complete(status_message)
     elif task_status == ScanTask.FAILED:
-        runner.scan_task.status_fail(status_message)
+        scan_task.status_fail(status_message)
     else:
         error_message = (
-            f"ScanTask {runner.scan_task.sequence_number:d} failed."
+            f"ScanTask {scan_task.sequence_number:d} failed."
             " Scan task must return"
             " ScanTask.COMPLETED or ScanTask.FAILED. ScanTask returned"
             f' "{task_status}" and the following status message: {status_message}'
         )
-        runner.scan_task.status_fail(error_message)
+        scan_task.status_fail(error_message)
         task_status = ScanTask.FAILED
     return task_status
 
@@ -168,9 +177,12 @@ class CeleryBasedScanJobRunner:
         # This is an unfortunate necessity (until future refactoring) because the
         # tasks module also imports from this jobs module.
         from scanner.tasks import (  # pylint: disable=import-outside-toplevel
+            celery_run_network_shard,
             celery_run_task_runner,
             finalize_scan,
             fingerprint,
+            finish_network_shards,
+            start_network_shards,
         )
 
         # Get and group relevant IDs and types for Celery tasks to fetch later.
@@ -184,9 +196,32 @@ class CeleryBasedScanJobRunner:
             scan_task_id = scan_task.id
             source_type = scan_task.source.source_type
             scan_type = scan_task.scan_type
-            signature = celery_run_task_runner.si(
-                scan_task_id=scan_task_id, source_type=source_type, scan_type=scan_type
-            )
+            if (
+                source_type == DataSources.NETWORK
+                and (shard_count := get_shard_count(scan_task.source)) > 1
+            ):
+                # Split the source hosts across several workers. A chord waits
+                # for every shard before the task is finished.
+                shards = [
+                    celery_run_network_shard.si(
+                        scan_task_id=scan_task_id,
+                        shard_index=shard_index,
+                        shard_count=shard_count,
+                    )
+                    for shard_index in range(shard_count)
+                ]
+                signature = celery.chain(
+                    start_network_shards.si(scan_task_id=scan_task_id),
+                    celery.chord(
+                        shards, finish_network_shards.s(scan_task_id=scan_task_id)
+                    ),
+                )
+            else:
+                signature = celery_run_task_runner.si(
+                    scan_task_id=scan_task_id,
+                    source_type=source_type,
+                    scan_type=scan_type,
+                )
             celery_signatures_by_source[source_id].append(signature)
 
         # Start a chain with a group that contains n chains, one chain for each Source.
@@ -0,0 +1,144 @@
+"""Adapt the number of hosts network inspect runs at once.
+
+With QUIPUCORDS_NETWORK_ADAPTIVE_CONCURRENCY, group scheduling doesn't split
+the hosts in groups of max_concurrency hosts up front. Each inspect playbook run
+takes the next `AdaptiveConcurrency.size` hosts instead, starting at
+NETWORK_ADAPTIVE_CONCURRENCY_BASELINE. After each run the size is:
+
+- halved when the controller is overloaded: its load average per CPU is above
+  NETWORK_ADAPTIVE_MAX_LOAD or less than NETWORK_ADAPTIVE_MIN_AVAILABLE_MEMORY of
+  its memory is available;
+- halved when more than MAX_ERROR_RATE of the hosts of the run failed and the
+  run was larger than the smallest one, or when the run took more than
+  MAX_LATENCY_GROWTH times the median of the last LATENCY_WINDOW runs (hosts run
+  in parallel, so the run time is the latency of its slowest host). Only runs
+  with successful hosts count for latency: a run where every host failed, e.g.
+  unreachable, did no real work and says nothing about how long one takes;
+- doubled otherwise.
+
+The max_concurrency of the scan is the ceiling. Every decision is logged to the
+scan task with the measures it was based on.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import statistics
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.conf import settings
+
+from api.models import ScanTask
+
+MEMINFO = Path("/proc/meminfo")
+MAX_ERROR_RATE = 0.5
+MAX_LATENCY_GROWTH = 2.0
+# number of recent runs with successful hosts the latency baseline is the median of
+LATENCY_WINDOW = 5
+
+
+@dataclass
+class ControllerLoad:
+    """Load of the controller running the scan."""
+
+    # 1 minute load average per CPU
+    load_per_cpu: float
+    # available fraction of the memory, None if unknown
+    available_memory: float | None
+
+
+def _available_memory() -> float | None:
+    try:
+        meminfo = {
+            name: int(value.split()[0])
+            for name, value in (
+                line.split(":", 1) for line in MEMINFO.read_text().splitlines()
+            )
+        }
+        return meminfo["MemAvailable"] / meminfo["MemTotal"]
+    except (OSError, KeyError, ValueError, ZeroDivisionError):
+        return None
+
+
+def read_controller_load() -> ControllerLoad:
+    """Measure the load of this machine."""
+    return ControllerLoad(
+        load_per_cpu=os.getloadavg()[0] / (os.cpu_count() or 1),
+        available_memory=_available_memory(),
+    )
+
+
+class AdaptiveConcurrency:
+    """Choose the size of each inspect playbook run from the previous ones."""
+
+    def __init__(self, scan_task: ScanTask, ceiling: int, read_load=None):
+        """Start at the baseline size, up to `ceiling` hosts at once."""
+        self.scan_task = scan_task
+        self.ceiling = max(ceiling, 1)
+        self.size = min(
+            max(settings.QUIPUCORDS_NETWORK_ADAPTIVE_CONCURRENCY_BASELINE, 1),
+            self.ceiling,
+        )
+        self._read_load = read_load or read_controller_load
+        self._recent_runs: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._smallest_run: int | None = None
+
+    def _overloaded(self, load: ControllerLoad) -> bool:
+        if load.load_per_cpu > settings.QUIPUCORDS_NETWORK_ADAPTIVE_MAX_LOAD:
+            return True
+        return (
+            load.available_memory is not None
+            and load.available_memory
+            < settings.QUIPUCORDS_NETWORK_ADAPTIVE_MIN_AVAILABLE_MEMORY
+        )
+
+    def record_run(self, hosts: int, failed: int, seconds: float):
+        """Adjust the size after a run of `hosts` hosts, `failed` of which failed."""
+        if not hosts:
+            return
+        load = self._read_load()
+        error_rate = failed / hosts
+        did_work = failed < hosts
+        baseline_run = (
+            statistics.median(self._recent_runs) if self._recent_runs else None
+        )
+        if self._overloaded(load):
+            reason = "controller overloaded"
+            size = self.size // 2
+        elif error_rate > MAX_ERROR_RATE and hosts > (self._smallest_run or hosts):
+            reason = "high error rate"
+            size = self.size // 2
+        elif (
+            did_work
+            and baseline_run is not None
+            and seconds > MAX_LATENCY_GROWTH * baseline_run
+        ):
+            reason = "high latency"
+            size = self.size // 2
+        else:
+            reason = "healthy"
+            size = self.size * 2
+        if did_work:
+            self._recent_runs.append(seconds)
+        if self._smallest_run is None or hosts < self._smallest_run:
+            self._smallest_run = hosts
+        previous_size, self.size = self.size, min(max(size, 1), self.ceiling)
+        baseline_run_text = (
+            "unknown" if baseline_run is None else f"{baseline_run:.1f}s"
+        )
+        available_memory = (
+            "unknown"
+            if load.available_memory is None
+            else f"{load.available_memory:.0%}"
+        )
+        self.scan_task.log_message(
+            f"ADAPTIVE CONCURRENCY {previous_size} -> {self.size} ({reason}):"
+            f" {hosts=} {failed=} run={seconds:.1f}s"
+            f" baseline_run={baseline_run_text}"
+            f" load_per_cpu={load.load_per_cpu:.2f}"
+            f" available_memory={available_memory}",
+            log_level=logging.INFO,
+        )
@@ -2,9 +2,11 @@
 
 import logging
 import traceback
+from collections import Counter
 
 import log_messages
 from api.connresult.model import SystemConnectionResult
+from scanner.network.host_identity import parse_host_identity
 
 logger = logging.getLogger(__name__)
 
@@ -17,14 +19,16 @@ class ConnectResultCallback:
     """Record connection results.
 
     SystemConnectionResult objects are created for every machine we
-    scan, as we scan it.
+    scan, as we scan it. If `cancel_check` is given, it is polled by
+    `cancel_callback` and the playbook is stopped once it returns True.
     """
 
-    def __init__(self, result_store, credential, source):
+    def __init__(self, result_store, credential, source, cancel_check=None):
         """Create result callback."""
         self.result_store = result_store
         self.credential = credential
         self.source = source
+        self.cancel_check = cancel_check
         self.stopped = False
 
     def task_on_ok(self, event_data, host, task_result):
@@ -32,7 +36,11 @@ class ConnectResultCallback:
         try:
             if "rc" in task_result and task_result["rc"] == 0:
                 self.result_store.record_result(
-                    host, self.source, self.credential, SystemConnectionResult.SUCCESS
+                    host,
+                    self.source,
+                    self.credential,
+                    SystemConnectionResult.SUCCESS,
+                    identity=parse_host_identity(task_result.get("stdout_lines", [])),
                 )
             logger.debug("%s", {"host": host, "result": task_result})
         except Exception as error:
@@ -149,6 +157,55 @@ class ConnectResultCallback:
 
     def cancel_callback(self):
         """Control the cancel callback for runner."""
+        if not self.stopped and self.cancel_check is not None:
+            self.stopped = self.cancel_check()
         if self.stopped:
             return True
         return False
+
+
+class CredentialsConnectResultCallback(ConnectResultCallback):
+    """Record connection results of a run trying several credentials per host.
+
+    Hosts attempt the credentials in order and stop at the first one that works
+    (or as soon as they are unreachable), so the n-th connection attempt of a host
+    is always made with the n-th credential.
+    """
+
+    def __init__(self, result_store, credentials, source, cancel_check=None):
+        """Create result callback."""
+        super().__init__(result_store, None, source, cancel_check=cancel_check)
+        self.credentials = credentials
+        self._attempts = Counter()
+
+    def _use_next_credential(self, host):
+        self.credential = self.credentials[self._attempts[host]]
+        self._attempts[host] += 1
+
+    def task_on_ok(self, event_data, host, task_result):
+        """Record a successful connection attempt."""
+        self._use_next_credential(host)
+        super().task_on_ok(event_data, host, task_result)
+
+    def task_on_unreachable(self, event_data, host, task_result):
+        """Record an unreachable host or a rejected credential."""
+        self._use_next_credential(host)
+        super().task_on_unreachable(event_data, host, task_result)
+
+    def task_on_failed(self, event_data, host, task_result):
+        """Log a failed connection attempt."""
+        self._use_next_credential(host)
+        super().task_on_failed(event_data, host, task_result)
+
+    def _event_callback(self, event_dict=None):
+        """Control the event callback for runner."""
+        if event_dict:
+            event_data = event_dict.get("event_data") or {}
+            # credentials loop (include_tasks) and attempts skipped by hosts that
+            # are already done
+            if (
+                event_dict.get("event") == "runner_on_skipped"
+                or event_data.get("task_action") == "include_tasks"
+            ):
+                return
+        super()._event_callback(event_dict)
@@ -0,0 +1,63 @@
+"""Skip inspecting a machine again under another of its addresses.
+
+Sources often list the same machine by hostname and by several IPv4 and IPv6
+addresses. With QUIPUCORDS_NETWORK_CONNECT_DEDUP, the connect playbooks print
+the machine id and boot id of each host along with the connection test. Hosts
+with the same identity as a host connected before them are not inspected: they
+are recorded in the HOST_ALIASES fact of the inspected one instead, and counted
+in the scan stats with its status. The identities are persisted with the
+connection results, so resumed scans dedupe the same way.
+
+The machine id alone is not enough, as machines cloned from the same image
+often share it. The boot id is random on every boot, so together they only
+match for the same running machine. Hosts that don't print both (e.g. not
+Linux) are always inspected.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+HOST_ALIASES = "host_aliases"
+IDENTITY_KEYS = ("machine_id", "boot_id")
+
+HostIdentity = tuple[str, ...]
+
+
+def parse_host_identity(stdout_lines: Iterable[str]) -> HostIdentity | None:
+    """Get the identity printed by the connect playbook, None if incomplete."""
+    values = {}
+    for line in stdout_lines:
+        key, separator, value = line.partition("=")
+        key = key.strip()
+        if separator and key in IDENTITY_KEYS:
+            values[key] = value.strip()
+    identity = tuple(values.get(key) for key in IDENTITY_KEYS)
+    if not all(identity):
+        return None
+    return identity
+
+
+def dedupe_connected(
+    connected: list[tuple[str, object]], identities: dict[str, HostIdentity]
+) -> tuple[list[tuple[str, object]], dict[str, list[str]]]:
+    """Drop the connected hosts that are aliases of a previous one.
+
+    :param connected: (host, credential) pairs of the connected hosts
+    :param identities: the identity of each host that printed one
+    :returns: the hosts to inspect and the aliases of each of them
+    """
+    selected = []
+    selected_by_identity: dict[HostIdentity, str] = {}
+    aliases: dict[str, list[str]] = {}
+    for host, credential in connected:
+        identity = identities.get(host)
+        if identity is None:
+            selected.append((host, credential))
+            continue
+        if (selected_host := selected_by_identity.get(identity)) is not None:
+            aliases.setdefault(selected_host, []).append(host)
+            continue
+        selected_by_identity[identity] = host
+        selected.append((host, credential))
+    return selected, aliases
@@ -0,0 +1,244 @@
+"""Sets of network hosts that don't expand their patterns up front.
+
+A network source lists host patterns (CIDRs, Ansible [x:y] ranges and plain
+names) and patterns to exclude. Expanding `10.0.0.0/8` would allocate millions of
+strings, so IP addresses are kept as sorted, non-overlapping intervals of
+integers instead: excluding hosts is an interval subtraction, counting them is
+arithmetic, and host strings are only built while iterating.
+
+Expanded CIDRs and ranges yield the canonical form of their addresses
+(`2001:db8::1`), but an address listed on its own keeps the spelling it was
+listed with (`2001:DB8:0:0::1`), since the results and credentials of the
+previous scans are recorded under that name.
+"""
+
+from __future__ import annotations
+
+import bisect
+import ipaddress
+import itertools
+import re
+from collections.abc import Iterable, Iterator
+
+from ansible.plugins.inventory import detect_range
+
+from scanner.network.utils import _expand_ansible_range, _strip_port
+
+ADDRESS_CLASSES = {4: ipaddress.IPv4Address, 6: ipaddress.IPv6Address}
+IP_VERSIONS = tuple(ADDRESS_CLASSES)
+
+# an IPv4 address whose octets are numbers or [x:y] ranges, like 10.0.[0:3].[1:250]
+IPV4_RANGE_PATTERN = re.compile(r"^(\d+|\[\d+:\d+\])(\.(\d+|\[\d+:\d+\])){3}$")
+
+Interval = tuple[int, int]
+# the (IP version, interval) of some addresses, and the spelling of the address
+# when it was listed on its own in a non canonical form
+ParsedAddresses = tuple[int, Interval, str | None]
+
+
+class HostSet:
+    """The hosts described by host patterns, without the excluded ones.
+
+    IPv4 addresses come first, then IPv6 addresses, each in ascending order, then
+    other host names in the order they were listed.
+    """
+
+    def __init__(self, patterns: Iterable[str], exclude_patterns: Iterable[str] = ()):
+        """Initialize the host set.
+
+        :param patterns: host patterns, as accepted by expand_hostpattern
+        :param exclude_patterns: patterns of hosts to leave out
+        """
+        intervals, names, self._spellings = _parse_patterns(patterns)
+        excluded_intervals, excluded_names, _ = _parse_patterns(exclude_patterns)
+        self._intervals = {
+            version: _subtract(intervals[version], excluded_intervals[version])
+            for version in IP_VERSIONS
+        }
+        self._names = [name for name in names if name not in excluded_names]
+        # position of the first host of each interval, and of each name
+        self._interval_firsts = {}
+        self._interval_positions = {}
+        position = 0
+        for version in IP_VERSIONS:
+            self._interval_firsts[version] = [
+                first for first, _ in self._intervals[version]
+            ]
+            self._interval_positions[version] = []
+            for first, last in self._intervals[version]:
+                self._interval_positions[version].append(position)
+                position += last - first + 1
+        self._name_positions = {
+            name: position + index for index, name in enumerate(self._names)
+        }
+
+    def __len__(self):
+        """Count the hosts, without expanding them."""
+        return self._ip_count() + len(self._names)
+
+    def __contains__(self, host) -> bool:
+        """Tell whether a host is in the set, without expanding the patterns."""
+        return self.index(host) is not None
+
+    def index(self, host: str) -> int | None:
+        """Get the position of a host in the iteration order, None if absent."""
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return self._name_positions.get(host)
+        version, value = address.version, int(address)
+        interval_index = bisect.bisect_right(self._interval_firsts[version], value) - 1
+        if interval_index < 0:
+            return None
+        first, last = self._intervals[version][interval_index]
+        if value > last:
+            return None
+        return self._interval_positions[version][interval_index] + value - first
+
+    def __iter__(self) -> Iterator[str]:
+        """Yield the hosts, building their names lazily."""
+        for version, address_class in ADDRESS_CLASSES.items():
+            spellings = self._spellings[version]
+            for first, last in self._intervals[version]:
+                for address in range(first, last + 1):
+                    yield spellings.get(address) or str(address_class(address))
+        yield from self._names
+
+    def _ip_count(self) -> int:
+        return sum(
+            last - first + 1
+            for version in IP_VERSIONS
+            for first, last in self._intervals[version]
+        )
+
+
+def _parse_patterns(
+    patterns: Iterable[str],
+) -> tuple[dict[int, list[Interval]], dict[str, None], dict[int, dict[int, str]]]:
+    """Split host patterns into merged IP intervals (by IP version) and names.
+
+    Also returns the spellings of the addresses listed on their own in a non
+    canonical form, by IP version and address.
+    """
+    intervals = {version: [] for version in IP_VERSIONS}
+    spellings = {version: {} for version in IP_VERSIONS}
+    # a dict keeps the names ordered and unique
+    names = {}
+    for pattern in patterns:
+        for host in _parse_pattern(pattern):
+            if isinstance(host, str):
+                names[host] = None
+                continue
+            version, interval, spelling = host
+            intervals[version].append(interval)
+            if spelling:
+                spellings[version].setdefault(interval[0], spelling)
+    merged = {version: _merge(intervals[version]) for version in IP_VERSIONS}
+    return merged, names, spellings
+
+
+def _parse_pattern(pattern: str) -> Iterator[str | ParsedAddresses]:
+    """Parse a host pattern into IP addresses and host names.
+
+    This follows expand_hostpattern: CIDRs first, then Ansible ranges, and
+    anything else is a single host.
+    """
+    if "/" in pattern:
+        try:
+            network = ipaddress.ip_network(pattern, strict=False)
+        except ValueError:
+            pass
+        else:
+            yield network.version, _network_hosts(network), None
+            return
+
+    pattern = _strip_port(pattern)
+    if detect_range(pattern):
+        if IPV4_RANGE_PATTERN.match(pattern) and (
+            ipv4_intervals := _ipv4_range_intervals(pattern)
+        ):
+            for interval in ipv4_intervals:
+                yield 4, interval, None
+            return
+        if (hosts := _expand_ansible_range(pattern)) is not None:
+            for host in hosts:
+                yield _parse_host(host, keep_spelling=False)
+            return
+    yield _parse_host(pattern, keep_spelling=True)
+
+
+def _parse_host(host: str, *, keep_spelling: bool) -> str | ParsedAddresses:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return host
+    spelling = host if keep_spelling and host != str(address) else None
+    return address.version, (int(address), int(address)), spelling
+
+
+def _network_hosts(network: ipaddress.IPv4Network | ipaddress.IPv6Network) -> Interval:
+    """Get the interval of the addresses network.hosts() would yield."""
+    first, last = int(network.network_address), int(network.broadcast_address)
+    if network.num_addresses <= 2:  # noqa: PLR2004
+        # /31, /32, /127 and /128 networks have no reserved addresses
+        return first, last
+    if isinstance(network, ipaddress.IPv4Network):
+        # skip the network and broadcast addresses
+        return first + 1, last - 1
+    # skip the Subnet-Router anycast address
+    return first + 1, last
+
+
+def _ipv4_range_intervals(pattern: str) -> list[Interval] | None:
+    """Get the intervals of an IPv4 pattern with [x:y] ranges as octets.
+
+    Returns None when the pattern doesn't describe valid addresses, e.g. when a
+    range is zero padded ([01:10] expands to "01", ..., which are not octets).
+    """
+    octet_ranges = []
+    for octet in pattern.split("."):
+        bounds = octet.strip("[]").split(":")
+        if any(bound != str(int(bound)) for bound in bounds):
+            return None
+        first, last = int(bounds[0]), int(bounds[-1])
+        if not 0 <= first <= last <= 255:  # noqa: PLR2004
+            return None
+        octet_ranges.append(range(first, last + 1))
+    *network_octets, host_octets = octet_ranges
+    intervals = []
+    for first, second, third in itertools.product(*network_octets):
+        prefix = (first << 24) | (second << 16) | (third << 8)
+        intervals.append((prefix | host_octets[0], prefix | host_octets[-1]))
+    return intervals
+
+
+def _merge(intervals: list[Interval]) -> list[Interval]:
+    """Sort intervals and merge the overlapping or adjacent ones."""
+    merged = []
+    for first, last in sorted(intervals):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def _subtract(intervals: list[Interval], excluded: list[Interval]) -> list[Interval]:
+    """Remove the excluded intervals from (merged) intervals."""
+    result = []
+    excluded_index = 0
+    for first, last in intervals:
+        # skip exclusions entirely before this interval
+        while excluded_index < len(excluded) and excluded[excluded_index][1] < first:
+            excluded_index += 1
+        start = first
+        index = excluded_index
+        while index < len(excluded) and excluded[index][0] <= last:
+            excluded_first, excluded_last = excluded[index]
+            if excluded_first > start:
+                result.append((start, excluded_first - 1))
+            start = max(start, excluded_last + 1)
+            index += 1
+        if start <= last:
+            result.append((start, last))
+    return result
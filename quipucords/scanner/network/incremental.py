@@ -0,0 +1,103 @@
+"""Reuse the product facts of unchanged hosts from their previous network scan.
+
+In incremental mode, the change_signature role collects a cheap signature of each
+host (machine id, RPM database, product search directories and java processes).
+Hosts with the same signature as in their last successful inspection skip the
+expensive REUSABLE_ROLES, and the facts of those roles are copied from that
+inspection instead. The REUSED_FACTS fact of such hosts tells which facts were
+reused and where from. Inspections whose fact profile skipped any of those roles
+have none of their facts to reuse, so they are never reused.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from api.models import InspectResult, RawFact
+from fingerprinter.constants import FACT_PROFILE
+from scanner.network.utils import get_role_fact_names
+
+REUSABLE_ROLES = ("redhat_packages", "jboss_eap", "jboss_fuse", "jboss_ws")
+CHANGE_SIGNATURE = "change_signature"
+PREVIOUS_CHANGE_SIGNATURE = "previous_change_signature"
+REUSED_FACTS = "reused_facts"
+
+
+@dataclass(frozen=True)
+class PreviousInspection:
+    """The last successful inspection of a host, with a change signature."""
+
+    inspect_result_id: int
+    change_signature: str
+
+
+def get_reusable_fact_names() -> list[str]:
+    """List the names of the facts that can be reused."""
+    return sorted(
+        {name for role in REUSABLE_ROLES for name in get_role_fact_names(role)}
+    )
+
+
+def get_previous_inspections(source, hosts) -> dict[str, PreviousInspection]:
+    """Get the last successful inspection with a change signature of each host.
+
+    Inspections whose fact profile skipped a reusable role are left out.
+    """
+    previous_facts = RawFact.objects.filter(
+        inspect_result__status=InspectResult.SUCCESS,
+        inspect_result__inspect_group__source=source,
+        inspect_result__name__in=hosts,
+    )
+    signatures = (
+        previous_facts.filter(name=CHANGE_SIGNATURE)
+        .exclude(value=None)
+        .order_by("inspect_result_id")
+        .values_list("inspect_result__name", "inspect_result_id", "value")
+    )
+    fact_profiles = previous_facts.filter(name=FACT_PROFILE).values_list(
+        "inspect_result_id", "value"
+    )
+    skipped_reusable_roles = {
+        inspect_result_id
+        for inspect_result_id, fact_profile in fact_profiles
+        if set((fact_profile or {}).get("roles", ())) & set(REUSABLE_ROLES)
+    }
+    # ordered by inspection, so the last one of each host wins
+    return {
+        host: PreviousInspection(inspect_result_id, change_signature)
+        for host, inspect_result_id, change_signature in signatures
+        if inspect_result_id not in skipped_reusable_roles
+    }
+
+
+def add_previous_signatures(
+    inventory: dict, previous_inspections: dict[str, PreviousInspection]
+):
+    """Set the previous change signature of the hosts of an inventory."""
+    for group in inventory["all"]["children"].values():
+        for host, host_vars in group["hosts"].items():
+            if previous := previous_inspections.get(host):
+                host_vars[PREVIOUS_CHANGE_SIGNATURE] = previous.change_signature
+
+
+def reuse_facts(facts: dict, previous: PreviousInspection | None) -> dict:
+    """Copy the facts of the skipped roles from the previous inspection of a host.
+
+    The facts are only reused when the host has the same change signature as in
+    its previous inspection, which is when inspect.yml skipped the roles.
+    """
+    if previous is None or facts.get(CHANGE_SIGNATURE) != previous.change_signature:
+        return facts
+    reused = dict(
+        RawFact.objects.filter(
+            inspect_result_id=previous.inspect_result_id,
+            name__in=get_reusable_fact_names(),
+        ).values_list("name", "value")
+    )
+    facts.update(reused)
+    facts[REUSED_FACTS] = {
+        "inspect_result_id": previous.inspect_result_id,
+        "roles": list(REUSABLE_ROLES),
+        "facts": sorted(reused),
+    }
+    return facts
@@ -2,8 +2,14 @@
 
 from __future__ import annotations
 
+import itertools
 import logging
+import math
+import time
+from collections import Counter, defaultdict
+from collections.abc import Callable, Iterable, Iterator, Sized
 from contextlib import ExitStack
+from dataclasses import dataclass
 from functools import cached_property
 from pathlib import Path
 
@@ -12,34 +18,184 @@ import pexpect
 from ansible_runner.exceptions import AnsibleRunnerException
 from django.conf import settings
 from django.db import transaction
+from django.db.models import F
 from django.forms import model_to_dict
+from more_itertools import chunked
 
 import log_messages
 from api.credential.model import Credential
-from api.inspectresult.model import InspectGroup, RawFact
-from api.models import InspectResult, Scan, ScanTask, SystemConnectionResult
+from api.inspectresult.model import InspectGroup
+from api.models import (
+    CredentialAffinity,
+    InspectResult,
+    Scan,
+    ScanTask,
+    SystemConnectionResult,
+)
 from api.source.serializer import SourceSerializer
 from api.status.misc import get_server_id
 from api.vault import decrypt_data_as_unicode, write_to_yaml
 from constants import GENERATED_SSH_KEYFILE, SCAN_JOB_LOG
+from fingerprinter.constants import FACT_PROFILE
 from quipucords.environment import server_version
 from scanner.exceptions import ScanFailureError
-from scanner.network import ConnectResultCallback
+from scanner.inspect_results import STAT_BY_STATUS, InspectResultBatch
+from scanner.network.concurrency import AdaptiveConcurrency
+from scanner.network.connect_callback import (
+    ConnectResultCallback,
+    CredentialsConnectResultCallback,
+)
 from scanner.network.exceptions import ScannerError
-from scanner.network.inspect_callback import AnsibleResults, InspectCallback
-from scanner.network.processing.process import NO_DATA, process
+from scanner.network.fact_profiles import SKIPPED_ROLES, get_fact_profile
+from scanner.network.host_identity import (
+    HOST_ALIASES,
+    HostIdentity,
+    dedupe_connected,
+)
+from scanner.network.host_set import HostSet
+from scanner.network.incremental import (
+    PreviousInspection,
+    add_previous_signatures,
+    get_previous_inspections,
+    reuse_facts,
+)
+from scanner.network.inspect_callback import (
+    AnsibleResults,
+    ConnectInspectCallback,
+    InspectCallback,
+)
+from scanner.network.post_process import PostProcessPool
+from scanner.network.probe import probe_hosts
+from scanner.network.ssh_control import SSHControl
+from scanner.network.task_profile import (
+    append_task_profile,
+    write_task_profile_summary,
+)
 from scanner.network.utils import (
     construct_inventory,
-    expand_hostpattern,
     raw_facts_template,
 )
+from scanner.network.writer import InspectResultWriter
 from scanner.runner import ScanTaskRunner
+from scanner.stats import ScanTaskStatsCounter
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_SCAN_DIRS = ["/", "/opt", "/app", "/home", "/usr"]
 NETWORK_SCAN_IDENTITY_KEY = "connection_host"
 
+# max seconds connection results stay buffered, so a killed worker loses little
+CONNECT_FLUSH_INTERVAL = 5
+
+INSPECT_SCHEDULING_GROUP = "group"
+INSPECT_SCHEDULING_SLIDING = "sliding"
+
+
+@dataclass(frozen=True)
+class Shard:
+    """A slice of a network source's hosts, scanned by its own Celery task."""
+
+    index: int
+    count: int
+
+    def select(self, hosts: Iterable[str]) -> Iterator[str]:
+        """Iterate the hosts that belong to this shard.
+
+        Hosts must be given in a stable order, like the one of get_source_hosts.
+        """
+        return itertools.islice(hosts, self.index, None, self.count)
+
+    def contains(self, hosts: HostSet, host: str) -> bool:
+        """Tell whether a host of the host set belongs to this shard."""
+        position = hosts.index(host)
+        return position is not None and position % self.count == self.index
+
+    def size(self, hosts: Sized) -> int:
+        """Count the hosts of this shard."""
+        return len(range(self.index, len(hosts), self.count))
+
+
+def _inspect_runs(group_names, inventory, adaptive: AdaptiveConcurrency | None):
+    """Yield the host pattern and hosts of each inspect playbook run.
+
+    Without adaptive concurrency each run is a group of the inventory. With it,
+    each group holds a single host and a run takes as many groups as the current
+    adaptive size.
+    """
+    children = inventory["all"]["children"]
+    if adaptive is None:
+        for group_name in group_names:
+            yield group_name, children[group_name]["hosts"]
+        return
+    remaining = list(group_names)
+    while remaining:
+        run_groups, remaining = remaining[: adaptive.size], remaining[adaptive.size :]
+        hosts = {}
+        for group_name in run_groups:
+            hosts.update(children[group_name]["hosts"])
+        yield ":".join(run_groups), hosts
+
+
+def get_source_hosts(source) -> HostSet:
+    """Get the hosts of a network source, without its excluded hosts.
+
+    Sources can contain patterns that describe multiple hosts, like '1.2.3.[4:6]'
+    or '10.0.0.0/8'. The returned HostSet counts and iterates single hosts
+    without expanding all the patterns up front.
+    """
+    return HostSet(source.get_hosts(), source.get_exclude_hosts())
+
+
+def get_shard_count(source) -> int:
+    """Get the number of shards a network source should be split into."""
+    max_shards = settings.QUIPUCORDS_NETWORK_SCAN_SHARDS
+    if max_shards <= 1:
+        return 1
+    min_hosts = max(settings.QUIPUCORDS_NETWORK_SCAN_SHARD_MIN_HOSTS, 1)
+    return max(min(max_shards, len(get_source_hosts(source)) // min_hosts), 1)
+
+
+def create_inspect_group(scan_task: ScanTask) -> InspectGroup:
+    """Create the InspectGroup that holds the results of a network scan task."""
+    inspect_group = InspectGroup.objects.create(
+        source_type=scan_task.source.source_type,
+        source_name=scan_task.source.name,
+        server_id=get_server_id(),
+        server_version=server_version(),
+        source=scan_task.source,
+    )
+    inspect_group.tasks.add(scan_task)
+    return inspect_group
+
+
+class ScanTaskCancelCheck:
+    """Tell whether a scan task was canceled.
+
+    Shards run in separate workers, so they learn about a cancel from the
+    ScanTask status in the database. The database is queried at most once
+    every `interval` seconds.
+    """
+
+    def __init__(self, scan_task_id: int, interval: float):
+        """Initialize the check."""
+        self.scan_task_id = scan_task_id
+        self.interval = interval
+        self.canceled = False
+        self._last_check = None
+
+    def __call__(self) -> bool:
+        """Return True if the scan task was canceled."""
+        now = time.monotonic()
+        if self.canceled or (
+            self._last_check is not None and now - self._last_check < self.interval
+        ):
+            return self.canceled
+        self._last_check = now
+        self.canceled = ScanTask.objects.filter(
+            id=self.scan_task_id, status=ScanTask.CANCELED
+        ).exists()
+        return self.canceled
+
 
 class InspectTaskRunner(ScanTaskRunner):
     """InspectTaskRunner system connection capabilities.
@@ -47,8 +203,33 @@ class InspectTaskRunner(ScanTaskRunner):
     Attempts connections to a source using a list of credentials
     and gathers the set of successes (host/ip, credential) and
     failures (host/ip).
+
+    A large source may be split into shards (see `get_shard_count`) that run as
+    separate Celery tasks. Each shard connects to and inspects only its own hosts
+    and shares the ScanTask stats and InspectGroup with the others; `start_shards`
+    prepares the task and `finish_shards` combines the shards once all are done.
     """
 
+    def __init__(self, scan_job, scan_task, shard: Shard | None = None):
+        """Set context for task execution.
+
+        :param scan_job: the scan job that contains this task
+        :param scan_task: the scan task model for this task
+        :param shard: the slice of the source hosts to scan, None for all of them
+        """
+        super().__init__(scan_job, scan_task)
+        self.shard = shard
+        # last successful inspection of the hosts, for incremental inspection
+        self._previous_inspections: dict[str, PreviousInspection] = {}
+        # shared SSH connections, see QUIPUCORDS_NETWORK_SSH_MULTIPLEXING
+        self._ssh_control: SSHControl | None = None
+        # aliases of the inspected hosts, see QUIPUCORDS_NETWORK_CONNECT_DEDUP
+        self._host_aliases: dict[str, list[str]] = {}
+        # see QUIPUCORDS_NETWORK_POST_PROCESS_WORKERS
+        self._post_process_pool = PostProcessPool(
+            scan_task, settings.QUIPUCORDS_NETWORK_POST_PROCESS_WORKERS
+        )
+
     def execute_task(self):
         """Scan target systems to collect facts.
 
@@ -57,12 +238,30 @@ class InspectTaskRunner(ScanTaskRunner):
         failures (host/ip). Runs a host scan on the set of systems that are
         reachable. Collects the associated facts for the scanned systems
         """
-        message, status = self.check_connection()
-        if status != ScanTask.COMPLETED:
-            return message, status
+        if (
+            not settings.QUIPUCORDS_NETWORK_SSH_MULTIPLEXING
+            or self.scan_task.source.use_paramiko
+        ):
+            return self._execute_task()
+        shard_index = self.shard.index if self.shard is not None else None
+        with SSHControl(self.scan_task, shard_index) as ssh_control:
+            self._ssh_control = ssh_control
+            try:
+                return self._execute_task()
+            finally:
+                self._ssh_control = None
 
-        message, status = self.inspect()
-        return message, status
+    def _execute_task(self):
+        with self._post_process_pool:
+            if settings.QUIPUCORDS_NETWORK_SINGLE_PASS_SCAN:
+                return self.connect_and_inspect()
+
+            message, status = self.check_connection()
+            if status != ScanTask.COMPLETED:
+                return message, status
+
+            message, status = self.inspect()
+            return message, status
 
     def check_connection(self):
         """
@@ -76,36 +275,201 @@ class InspectTaskRunner(ScanTaskRunner):
 
         TODO Remove this function when we remove connect scan tasks.
         """
-        result_store = ConnectResultStore(self.scan_task)
+        result_store = ConnectResultStore(
+            self.scan_task, shard=self.shard, resume=self._resume
+        )
         scan_message, scan_result = run_with_result_store(
-            self.scan_task, self.scan_job, result_store
+            self.scan_task,
+            self.scan_job,
+            result_store,
+            cancel_check=self._cancel_check,
+            ssh_control=self._ssh_control,
         )
         return scan_message, scan_result
 
+    def connect_and_inspect(self):
+        """Connect to and inspect the hosts in a single pass.
+
+        Instead of running the connect playbook once per credential and then the
+        inspect playbook, the inspect playbook runs once per credential over the
+        hosts no credential worked for yet. Each host is inspected in the same
+        session that proves its credential works. SystemConnectionResults are
+        still recorded for every host.
+        """
+        if self._resume:
+            self._discard_uninspected_connections()
+        result_store = ConnectResultStore(
+            self.scan_task,
+            shard=self.shard,
+            count_connected=False,
+            resume=self._resume,
+        )
+        if self._resume:
+            # single pass counts the inspect results, not the connections
+            stats = Counter(
+                STAT_BY_STATUS[status]
+                for status in self.scan_task.get_result().values_list(
+                    "status", flat=True
+                )
+            )
+            self.scan_task.add_stats("RESUMED NETWORK INSPECT STATS", **stats)
+        scan_message, scan_result = None, ScanTask.COMPLETED
+        try:
+            try:
+                scan_message, scan_result = self._connect_and_inspect_each_credential(
+                    result_store
+                )
+            finally:
+                result_store.flush()
+            if scan_result == ScanTask.CANCELED:
+                return scan_message, scan_result
+
+            if self.shard is not None:
+                # facts from all shards are checked together in finish_shards
+                return scan_message, scan_result
+            if not result_store.connected_count:
+                return "No successful connections", ScanTask.FAILED
+            self._check_facts(self._inspect_group)
+
+        except (AnsibleRunnerException, AssertionError, ScannerError) as error:
+            error_message = f"Scan task encountered error: {error}"
+            raise ScanFailureError(error_message)
+
+        return self._final_status(scan_message, scan_result)
+
+    def _discard_uninspected_connections(self):
+        """Forget the connections of the hosts single pass didn't inspect yet.
+
+        Single pass records a host as connected as soon as its inspection starts,
+        so an interrupted scan leaves connected hosts without an inspect result.
+        """
+        inspected = self.scan_task.get_result().values_list("name", flat=True)
+        self.scan_task.connection_result.systems.filter(
+            status=SystemConnectionResult.SUCCESS
+        ).exclude(name__in=inspected).delete()
+
+    def _connect_and_inspect_each_credential(self, result_store: ConnectResultStore):
+        scan_message, scan_result = None, ScanTask.COMPLETED
+        if settings.QUIPUCORDS_NETWORK_TCP_PROBE:
+            record_unresponsive_hosts(
+                self.scan_task, result_store, self.scan_task.source.port
+            )
+        for credential in get_source_credentials(self.scan_task.source):
+            remaining_hosts = result_store.remaining_hosts()
+            if not remaining_hosts:
+                self.scan_task.log_message(
+                    f"Skipping credential {credential.name}. No remaining hosts."
+                )
+                break
+            self.scan_task.log_message(f"Attempting credential {credential.name}.")
+            with credential.generate_ssh_keyfile() as ssh_keyfile:
+                cred_data = model_to_dict(credential)
+                cred_data[GENERATED_SSH_KEYFILE] = ssh_keyfile
+                _handle_ssh_passphrase(cred_data)
+                # the remaining hosts are inspected a chunk at a time, so the
+                # inventories don't hold every host of large sources at once
+                for chunk in chunked(
+                    remaining_hosts, settings.QUIPUCORDS_NETWORK_SINGLE_PASS_CHUNK_SIZE
+                ):
+                    scan_message, scan_result = self._inspect_scan(
+                        [(host, cred_data) for host in chunk],
+                        result_store=result_store,
+                        credential=credential,
+                    )
+                    if scan_result == ScanTask.CANCELED:
+                        return scan_message, scan_result
+
+        for host in result_store.remaining_hosts():
+            # no credential worked for these hosts
+            result_store.record_result(
+                host, self.scan_task.source, None, SystemConnectionResult.FAILED
+            )
+        return scan_message, scan_result
+
+    def start_shards(self):
+        """Prepare this task to be scanned by several shards at once.
+
+        Shards add to the task stats instead of overwriting them, so the totals
+        for the whole source are set here, before any shard starts. The shards
+        also share a single InspectGroup.
+        """
+        self.scan_task.update_stats(
+            "INITIAL NETWORK CONNECT STATS.",
+            sys_count=len(get_source_hosts(self.scan_task.source)),
+            sys_scanned=0,
+            sys_failed=0,
+            sys_unreachable=0,
+        )
+        create_inspect_group(self.scan_task)
+
+    def finish_shards(self, shard_statuses: list[str]):
+        """Combine the results of every shard of this task.
+
+        :param shard_statuses: the ScanTask status each shard finished with
+        :returns: status message and ScanTask status for the whole task
+        """
+        if all(status == ScanTask.CANCELED for status in shard_statuses):
+            return "All shards were canceled.", ScanTask.CANCELED
+        if ScanTask.COMPLETED not in shard_statuses:
+            return f"All {len(shard_statuses)} shards failed.", ScanTask.FAILED
+        try:
+            self._check_facts(self.scan_task.inspect_groups.latest("id"))
+        except ScanFailureError as error:
+            return error.message, ScanTask.FAILED
+        return self._final_status(None, ScanTask.COMPLETED)
+
     def inspect(self):
         """Perform the actual inspect operations and progressively save results."""
         try:
             # Execute scan
             connected, completed, failed, unreachable = self._obtain_discovery_data()
+            selected = connected
+            if host_identities := self._get_host_identities():
+                selected, self._host_aliases = dedupe_connected(
+                    connected, host_identities
+                )
+                alias_count = sum(map(len, self._host_aliases.values()))
+                self.scan_task.log_message(
+                    f"Skipping {alias_count} hosts already connected to under"
+                    " another address."
+                )
+                # aliases of the hosts inspected before resuming share their status
+                completed, failed, unreachable = (
+                    hosts
+                    + [
+                        alias
+                        for host in hosts
+                        for alias in self._host_aliases.get(host, ())
+                    ]
+                    for hosts in (completed, failed, unreachable)
+                )
             processed_hosts = failed + completed
+            if self._resume:
+                # unreachable during inspect is final too, don't retry it
+                processed_hosts += unreachable
             num_total = len(connected) + len(processed_hosts)
 
             if num_total == 0:
                 msg = "Inventory provided no reachable hosts."
                 raise ScannerError(msg)
 
-            self.scan_task.update_stats(
-                "INITIAL NETWORK INSPECT STATS",
-                sys_count=len(connected),
-                sys_scanned=len(completed),
-                sys_failed=len(failed),
-                sys_unreachable=len(unreachable),
-            )
+            if self.shard is None:
+                self.scan_task.update_stats(
+                    "INITIAL NETWORK INSPECT STATS",
+                    sys_count=len(connected),
+                    sys_scanned=len(completed),
+                    sys_failed=len(failed),
+                    sys_unreachable=len(unreachable),
+                )
+            else:
+                self._replace_shard_connect_stats(
+                    connected, completed, failed, unreachable
+                )
 
             # remove completed hosts
             remaining = [
                 unprocessed
-                for unprocessed in connected
+                for unprocessed in selected
                 if unprocessed[0] not in processed_hosts
             ]
             # prepare ssh keys and format credential data
@@ -129,21 +493,33 @@ class InspectTaskRunner(ScanTaskRunner):
                 # finally, run the scan
                 scan_message, scan_result = self._inspect_scan(formatted_hosts)
 
-            self.scan_task.cleanup_facts(NETWORK_SCAN_IDENTITY_KEY)
-            temp_facts = self.scan_task.get_facts()
-            fact_size = len(temp_facts)
-            self._add_unreachable_hosts(temp_facts)
-            if temp_facts is None or fact_size == 0:
-                msg = (
-                    "SystemFacts set is empty. "
-                    "No results will be reported to fact endpoint."
-                )
-                raise ScanFailureError(msg)
+            if self.shard is not None:
+                # facts from all shards are checked together in finish_shards
+                return scan_message, scan_result
+            self._check_facts(self._inspect_group)
 
         except (AnsibleRunnerException, AssertionError, ScannerError) as error:
             error_message = f"Scan task encountered error: {error}"
             raise ScanFailureError(error_message)
 
+        return self._final_status(scan_message, scan_result)
+
+    def _check_facts(self, inspect_group: InspectGroup):
+        """Drop results without identity and add results for unreachable hosts."""
+        if settings.QUIPUCORDS_NETWORK_TASK_PROFILE:
+            write_task_profile_summary(self.scan_task)
+        self.scan_task.cleanup_facts(NETWORK_SCAN_IDENTITY_KEY)
+        temp_facts = self.scan_task.get_facts()
+        fact_size = len(temp_facts)
+        self._add_unreachable_hosts(temp_facts, inspect_group)
+        if temp_facts is None or fact_size == 0:
+            msg = (
+                "SystemFacts set is empty. "
+                "No results will be reported to fact endpoint."
+            )
+            raise ScanFailureError(msg)
+
+    def _final_status(self, scan_message, scan_result):
         if self.scan_task.systems_failed > 0:
             scan_message = (
                 f"{self.scan_task.systems_failed} systems could not be scanned."
@@ -152,10 +528,11 @@ class InspectTaskRunner(ScanTaskRunner):
             self.scan_task.log_message(scan_message, log_level=logging.WARNING)
         return scan_message, scan_result
 
-    def _add_unreachable_hosts(self, systems_list):
+    def _add_unreachable_hosts(self, systems_list, inspect_group: InspectGroup):
         """Add entry for systems that were unreachable.
 
         :param systems_list: Current list of system results.
+        :param inspect_group: InspectGroup to add the entries to.
         """
         connected_hosts = self.scan_task.connection_result.systems.filter(
             status=SystemConnectionResult.SUCCESS
@@ -165,21 +542,73 @@ class InspectTaskRunner(ScanTaskRunner):
         scanned_hosts = set(
             [system.get(NETWORK_SCAN_IDENTITY_KEY) for system in systems_list]
         )
-        unreachable_hosts = connected_hosts - scanned_hosts
+        # aliases of the inspected hosts were connected to but not inspected; they
+        # share the result of the inspected host, whatever its status
+        alias_hosts = {
+            alias for system in systems_list for alias in system.get(HOST_ALIASES) or ()
+        }
+        unreachable_hosts = connected_hosts - scanned_hosts - alias_hosts
 
         for host in unreachable_hosts:
             InspectResult.objects.create(
                 name=host,
                 status=InspectResult.UNREACHABLE,
-                inspect_group=self._inspect_group,
+                inspect_group=inspect_group,
             )
 
+    def _replace_shard_connect_stats(self, connected, completed, failed, unreachable):
+        """Swap the connect stats of this shard for its inspect stats.
+
+        Without shards, inspect simply overwrites the stats left by connect. Shards
+        share the task stats, so each one removes what its own connect step added
+        and adds its inspect counts instead.
+        """
+        connect_stats = Counter(
+            status
+            for name, status in self.scan_task.connection_result.systems.values_list(
+                "name", "status"
+            )
+            if self._in_shard(name)
+        )
+        self.scan_task.add_stats(
+            "INITIAL NETWORK INSPECT STATS",
+            sys_count=len(connected) - self.shard.size(self._source_hosts),
+            sys_scanned=len(completed) - connect_stats[SystemConnectionResult.SUCCESS],
+            sys_failed=len(failed) - connect_stats[SystemConnectionResult.FAILED],
+            sys_unreachable=len(unreachable)
+            - connect_stats[SystemConnectionResult.UNREACHABLE],
+        )
+
+    @cached_property
+    def _source_hosts(self) -> HostSet:
+        return get_source_hosts(self.scan_task.source)
+
+    def _in_shard(self, host: str) -> bool:
+        return self.shard is None or self.shard.contains(self._source_hosts, host)
+
+    @cached_property
+    def _resume(self) -> bool:
+        return settings.QUIPUCORDS_NETWORK_SCAN_RESUME and self.shard is None
+
+    @cached_property
+    def _cancel_check(self) -> ScanTaskCancelCheck | None:
+        # other shards run in other workers; watch the database for a cancel
+        if self.shard is None:
+            return None
+        return ScanTaskCancelCheck(
+            self.scan_task.id,
+            interval=settings.QUIPUCORDS_NETWORK_SCAN_SHARD_CANCEL_CHECK_INTERVAL,
+        )
+
     def _inspect_scan(  # noqa: PLR0912, PLR0915, C901
-        self, connected
+        self, connected, result_store=None, credential=None
     ):
         """Execute the host scan with the initialized source.
 
         :param connected: list of (host, credential) pairs to inspect
+        :param result_store: Optional. ConnectResultStore to record connection
+            results to, for hosts not known to be reachable yet
+        :param credential: the credential of every host, when result_store is given
         :param base_ssh_executable: ssh executable, or None for
             'ssh'. Will be wrapped with a timeout before being passed
             to Ansible.
@@ -208,33 +637,85 @@ class InspectTaskRunner(ScanTaskRunner):
 
         extra_vars["ansible_ssh_timeout"] = settings.QUIPUCORDS_SSH_INSPECT_TIMEOUT
 
+        scheduling = settings.QUIPUCORDS_NETWORK_INSPECT_SCHEDULING
+        adaptive = None
+        if scheduling == INSPECT_SCHEDULING_SLIDING:
+            # A single group holding every host; the "free" strategy keeps up to
+            # `forks` hosts in flight and starts the next host as soon as one ends.
+            concurrency_count = max(len(connected), 1)
+            envvars = {"ANSIBLE_STRATEGY": "free"}
+        else:
+            scheduling = INSPECT_SCHEDULING_GROUP
+            concurrency_count = forks
+            envvars = {}
+            if settings.QUIPUCORDS_NETWORK_ADAPTIVE_CONCURRENCY:
+                adaptive = AdaptiveConcurrency(self.scan_task, ceiling=forks)
+                concurrency_count = 1
+        if self._ssh_control is not None:
+            envvars.update(self._ssh_control.envvars)
+
         group_names, inventory = construct_inventory(
             hosts=connected,
             connection_port=connection_port,
-            concurrency_count=forks,
+            concurrency_count=concurrency_count,
         )
+        if settings.QUIPUCORDS_NETWORK_INCREMENTAL_INSPECT:
+            previous_inspections = get_previous_inspections(
+                self.scan_task.source, [host for host, _ in connected]
+            )
+            self._previous_inspections.update(previous_inspections)
+            add_previous_signatures(inventory, previous_inspections)
+            extra_vars["incremental_inspect"] = True
+        if settings.QUIPUCORDS_NETWORK_COLLECT_USER_ROLES:
+            extra_vars["collect_user_roles"] = True
+        if self._fact_profile.skipped_roles:
+            extra_vars[SKIPPED_ROLES] = list(self._fact_profile.skipped_roles)
         inventory_file = write_to_yaml(inventory)
 
         error_msg = None
         log_message = (
             "START INSPECT PROCESSING GROUPS"
             f" with use_paramiko: {use_paramiko}, "
-            f"{forks} forks and extra_vars={extra_vars}"
+            f"{forks} forks, {scheduling} scheduling and extra_vars={extra_vars}"
         )
         self.scan_task.log_message(log_message)
         scan_result = ScanTask.COMPLETED
+        inspect_start_time = time.monotonic()
 
         # Build Ansible Runner Dependencies
-        for idx, group_name in enumerate(group_names):
+        group_count = 0
+        children = inventory["all"]["children"]
+        hosts_left = sum(len(children[name]["hosts"]) for name in group_names)
+        runs = _inspect_runs(group_names, inventory, adaptive)
+        for idx, (group_name, group_hosts) in enumerate(runs):
+            group_count = idx + 1
+            group_start_time = time.monotonic()
+            number_of_hosts = len(group_hosts)
+            hosts_left -= number_of_hosts
             log_message = (
-                f"START INSPECT PROCESSING GROUP {(idx + 1):d} of {len(group_names):d}"
+                f"START INSPECT PROCESSING GROUP {(idx + 1):d}"
+                f" ({number_of_hosts:d} hosts, {hosts_left:d} left)"
             )
             self.scan_task.log_message(log_message)
-            call = InspectCallback()
-
-            number_of_hosts = len(
-                inventory.get("all").get("children").get(group_name).get("hosts").keys()
+            # facts are persisted in the background as each host finishes
+            writer = InspectResultWriter(
+                self._persist_results,
+                max_pending=settings.QUIPUCORDS_NETWORK_INSPECT_WRITER_QUEUE_SIZE,
+                batch_size=settings.QUIPUCORDS_INSPECT_RESULT_BATCH_SIZE,
             )
+            callback_kwargs = {
+                "on_host_done": writer.submit,
+                "cancel_check": self._cancel_check,
+            }
+            if result_store is not None:
+                call = ConnectInspectCallback(
+                    result_store,
+                    credential,
+                    self.scan_task.source,
+                    **callback_kwargs,
+                )
+            else:
+                call = InspectCallback(**callback_kwargs)
 
             # Build Ansible Runner Parameters
             job_timeout = (
@@ -256,7 +737,8 @@ class InspectTaskRunner(ScanTaskRunner):
                 f"{settings.QUIPUCORDS_ENCRYPTION_SECRET_KEY_PATH}"
             )
             cmdline_list.append(vault_file_path)
-            forks_cmd = f"--forks={forks}"
+            run_forks = forks if adaptive is None else number_of_hosts
+            forks_cmd = f"--forks={run_forks}"
             cmdline_list.append(forks_cmd)
             if use_paramiko:
                 cmdline_list.append("--connection=paramiko")
@@ -274,34 +756,49 @@ class InspectTaskRunner(ScanTaskRunner):
                 f"has timeout settings: {runner_settings}"
             )
             try:
-                runner_obj = ansible_runner.run(
-                    quiet=quiet_bool,
-                    settings=runner_settings,
-                    inventory=inventory_file,
-                    extravars=extra_vars,
-                    event_handler=call.event_callback,
-                    cancel_callback=call.cancel_callback,
-                    playbook=playbook_path,
-                    cmdline=all_commands,
-                    verbosity=verbosity_lvl,
-                )
+                with writer:
+                    runner_obj = ansible_runner.run(
+                        quiet=quiet_bool,
+                        settings=runner_settings,
+                        inventory=inventory_file,
+                        extravars=extra_vars,
+                        event_handler=call.event_callback,
+                        cancel_callback=call.cancel_callback,
+                        playbook=playbook_path,
+                        cmdline=all_commands,
+                        verbosity=verbosity_lvl,
+                        envvars=envvars or None,
+                    )
+                    # persist facts for hosts that never finished (failed or
+                    # interrupted hosts)
+                    for result in call.iter_results():
+                        writer.submit(result)
             except Exception:
                 logger.exception("Uncaught exception during Ansible Runner execution")
                 continue
+            if self._ssh_control is not None:
+                self._ssh_control.record_sockets(group_hosts)
 
             log_message = (
                 "INSPECT PROCESSING GROUP ANSIBLE RUNNER COMPLETED"
                 f" group {group_name}: {runner_obj.status=}"
                 f" {runner_obj.rc=} {runner_obj.stats=}"
+                f" wall_clock={time.monotonic() - group_start_time:.1f}s"
             )
             self.scan_task.log_message(log_message, log_level=logging.INFO)
 
-            # persist facts
-            for result in call.iter_results():
-                self._persist_results(result)
+            if adaptive is not None:
+                adaptive.record_run(
+                    number_of_hosts,
+                    number_of_hosts - call.host_status_counts[InspectResult.SUCCESS],
+                    time.monotonic() - group_start_time,
+                )
+
             # save stdout and stderr from ansible
             self._persist_ansible_logs(runner_obj)
             self._persist_skipped_tasks(call)
+            if settings.QUIPUCORDS_NETWORK_TASK_PROFILE:
+                append_task_profile(self.scan_task, call.task_durations)
 
             final_status = runner_obj.status
             if final_status == "canceled":
@@ -310,6 +807,8 @@ class InspectTaskRunner(ScanTaskRunner):
                     "canceled",
                 )
                 self.scan_task.log_message(msg)
+                scan_result = ScanTask.CANCELED
+                break
             if final_status not in ["successful", "unreachable", "failed"]:
                 if final_status == "timeout":
                     error_msg = log_messages.NETWORK_TIMEOUT_ERR
@@ -325,75 +824,66 @@ class InspectTaskRunner(ScanTaskRunner):
                 f" {error_msg=}"
             )
             self.scan_task.log_message(log_message, log_level=logging.DEBUG)
-        return error_msg, scan_result
 
-    @transaction.atomic
-    def _persist_results(self, ansible_results: AnsibleResults):
-        facts = self._post_process_facts(ansible_results)
         self.scan_task.log_message(
-            f"host scan complete for {ansible_results.host}."
-            f" Status: {ansible_results.status}. Facts {facts}",
-            log_level=logging.DEBUG,
+            "INSPECT PROCESSING GROUPS COMPLETED"
+            f" with {scheduling} scheduling: {group_count} group(s),"
+            f" {forks} forks,"
+            f" wall_clock={time.monotonic() - inspect_start_time:.1f}s"
         )
-        sys_result = InspectResult.objects.create(
-            name=ansible_results.host,
-            status=ansible_results.status,
-            inspect_group=self._inspect_group,
-        )
-        raw_facts = []
-        for fact_key, fact_value in facts.items():
-            raw_facts.append(
-                RawFact(
-                    name=fact_key,
-                    value=fact_value,
-                    inspect_result=sys_result,
+        return error_msg, scan_result
+
+    def _persist_results(self, *ansible_results: AnsibleResults):
+        processed_facts = self._post_process_pool.process(ansible_results)
+        # a single flush, so nothing is persisted when a host raises and the writer
+        # retries the hosts one by one
+        with InspectResultBatch(
+            self.scan_task, self._inspect_group, batch_size=len(ansible_results)
+        ) as batch:
+            for host_results, host_facts in zip(ansible_results, processed_facts):
+                facts = self._post_process_facts(host_facts)
+                facts = reuse_facts(
+                    facts, self._previous_inspections.get(host_results.host)
                 )
-            )
-        RawFact.objects.bulk_create(
-            raw_facts, batch_size=settings.QUIPUCORDS_BULK_CREATE_BATCH_SIZE
-        )
-        increment_kwargs = self._get_scan_task_increment_kwargs(ansible_results.status)
-        self.scan_task.increment_stats(ansible_results.host, **increment_kwargs)
+                if self._fact_profile_fact is not None:
+                    facts[FACT_PROFILE] = self._fact_profile_fact
+                if aliases := self._host_aliases.get(host_results.host):
+                    facts[HOST_ALIASES] = aliases
+                self.scan_task.log_message(
+                    f"host scan complete for {host_results.host}."
+                    f" Status: {host_results.status}. Facts {facts}",
+                    log_level=logging.DEBUG,
+                )
+                # aliases are counted with the status of the inspected host, even
+                # when it failed, instead of being left out of the stats
+                for _ in aliases or ():
+                    batch.count(host_results.status)
+                batch.add(host_results.host, host_results.status, facts)
+
+    @cached_property
+    def _fact_profile(self):
+        return get_fact_profile(self.scan_job)
+
+    @cached_property
+    def _fact_profile_fact(self):
+        """Describe the facts the fact profile left out, None if none."""
+        if not self._fact_profile.skipped_roles:
+            return None
+        return self._fact_profile.as_fact()
 
     @cached_property
     def _inspect_group(self):
-        inspect_group = InspectGroup.objects.create(
-            source_type=self.scan_task.source.source_type,
-            source_name=self.scan_task.source.name,
-            server_id=get_server_id(),
-            server_version=server_version(),
-            source=self.scan_task.source,
-        )
-        inspect_group.tasks.add(self.scan_task)
-        return inspect_group
-
-    def _post_process_facts(self, ansible_results):
-        logger.debug(
-            "[host=%s] post processing facts. Unprocessed facts=%s",
-            ansible_results.host,
-            ansible_results.facts,
-        )
-        facts = {}
-        for fact_key, fact_value in ansible_results.facts.items():
-            try:
-                processed_fact = process(
-                    scan_task=self.scan_task,
-                    previous_host_facts=facts,
-                    fact_key=fact_key,
-                    fact_value=fact_value,
-                    host=ansible_results.host,
-                )
-            except Exception:
-                logger.exception(
-                    "[host=%s] Unexpected error ocurred during fact '%s' processing",
-                    ansible_results.host,
-                    fact_key,
-                )
-                continue
-            if processed_fact == NO_DATA:
-                processed_fact = None
-            facts[fact_key] = processed_fact
+        if self.shard is not None:
+            # shards share the group created by start_shards
+            return self.scan_task.inspect_groups.latest("id")
+        if self._resume and (
+            inspect_group := self.scan_task.inspect_groups.order_by("id").last()
+        ):
+            return inspect_group
+        return create_inspect_group(self.scan_task)
 
+    def _post_process_facts(self, facts: dict):
+        """Prepare the processed facts of a host to be saved."""
         if settings.QUIPUCORDS_EXCLUDE_INTERNAL_FACTS:
             # remove internal facts before saving result
             facts = {
@@ -406,22 +896,6 @@ class InspectTaskRunner(ScanTaskRunner):
         final_facts.update(facts)
         return final_facts
 
-    def _get_scan_task_increment_kwargs(self, result):
-        return {
-            InspectResult.SUCCESS: {
-                "increment_sys_scanned": True,
-                "prefix": "CONNECTED",
-            },
-            InspectResult.FAILED: {
-                "increment_sys_failed": True,
-                "prefix": "FAILED",
-            },
-            InspectResult.UNREACHABLE: {
-                "increment_sys_unreachable": True,
-                "prefix": "UNREACHABLE",
-            },
-        }[result]
-
     def _persist_ansible_logs(self, runner_obj: ansible_runner.Runner):
         """Persist ansible logs."""
         for output in ["stdout", "stderr"]:
@@ -448,6 +922,16 @@ class InspectTaskRunner(ScanTaskRunner):
         skipped_everywhere = set.intersection(*call._skipped_facts.values())
         output_path.write_text("\n".join(sorted(skipped_everywhere)))
 
+    def _get_host_identities(self) -> dict[str, HostIdentity]:
+        """Get the identity the connected hosts printed, see dedupe_connected."""
+        return {
+            name: tuple(identity)
+            for name, identity in self.scan_task.connection_result.systems.filter(
+                status=SystemConnectionResult.SUCCESS, identity__isnull=False
+            ).values_list("name", "identity")
+            if self._in_shard(name)
+        }
+
     def _obtain_discovery_data(self):
         """Obtain discover scan data.  Either via new scan or paused scan.
 
@@ -460,10 +944,14 @@ class InspectTaskRunner(ScanTaskRunner):
         unreachable = []
         nostatus = []
         for result in self.scan_task.connection_result.systems.all():
+            if not self._in_shard(result.name):
+                continue
             if result.status == SystemConnectionResult.SUCCESS:
                 connected.append(tuple((result.name, result.credential)))
 
         for result in self.scan_task.get_result():
+            if not self._in_shard(result.name):
+                continue
             if result.status == InspectResult.SUCCESS:
                 completed.append(result.name)
             elif result.status == InspectResult.FAILED:
@@ -486,82 +974,182 @@ class InspectTaskRunner(ScanTaskRunner):
 class ConnectResultStore:
     """This object knows how to record and retrieve connection results."""
 
-    def __init__(self, scan_task):
-        """Initialize ConnectResultStore object."""
+    def __init__(
+        self,
+        scan_task,
+        shard: Shard | None = None,
+        *,
+        count_connected=True,
+        resume=False,
+    ):
+        """Initialize ConnectResultStore object.
+
+        :param scan_task: the scan task to record results for
+        :param shard: only connect to the hosts of this shard
+        :param count_connected: whether successful connections count as scanned
+            systems. Single-pass scans count the inspect result instead.
+        :param resume: keep the connection results already recorded for the task,
+            see QUIPUCORDS_NETWORK_SCAN_RESUME
+        """
         self.scan_task = scan_task
+        self.count_connected = count_connected
+        self.connected_count = 0
+        # results and stats are buffered, see flush
+        self._pending_results: list[SystemConnectionResult] = []
+        self._last_flush = time.monotonic()
+        self.stats = ScanTaskStatsCounter(scan_task)
+
+        # hosts are built while iterating, never all held at once
+        self._source_hosts = get_source_hosts(scan_task.source)
+        self._shard = shard
+        self._host_count = (
+            len(self._source_hosts) if shard is None else shard.size(self._source_hosts)
+        )
+        self._recorded_hosts = set()
+        recorded = Counter()
+        if resume:
+            recorded = self._load_recorded_results()
 
-        source = scan_task.source
-
-        # Sources can contain patterns that describe multiple hosts,
-        # like '1.2.3.[4:6]'. Expand the patterns so hosts is a list
-        # of single hosts we can try to connect to.
-
-        hosts, exclude_hosts = [], []
-
-        hosts_list = source.get_hosts()
-        exclude_hosts_list = source.get_exclude_hosts()
-
-        for host in hosts_list:
-            hosts.extend(expand_hostpattern(host))
-        for host in exclude_hosts_list:
-            exclude_hosts.extend(expand_hostpattern(host))
-
-        # Remove excluded ip addresses from the hosts list.
-        hosts = list(set(hosts) - set(exclude_hosts))
-
-        self._remaining_hosts = set(hosts)
-
+        if shard is not None:
+            # the stats for the whole source were set by start_shards
+            return
         scan_task.update_stats(
             "INITIAL NETWORK CONNECT STATS.",
-            sys_count=len(hosts),
-            sys_scanned=0,
-            sys_failed=0,
-            sys_unreachable=0,
+            sys_count=self._host_count,
+            sys_scanned=recorded[SystemConnectionResult.SUCCESS]
+            if count_connected
+            else 0,
+            sys_failed=recorded[SystemConnectionResult.FAILED],
+            sys_unreachable=recorded[SystemConnectionResult.UNREACHABLE],
         )
 
-    @transaction.atomic
-    def record_result(self, name, source, credential, status):
-        """Record a new result, either a connection success or a failure."""
-        SystemConnectionResult.objects.create(
-            name=name,
-            source=source,
-            credential=credential,
-            status=status,
-            task_connection_result=self.scan_task.connection_result,
+    def _load_recorded_results(self) -> Counter:
+        """Skip the hosts already recorded for the task, counting their status."""
+        recorded = Counter()
+        for name, status in self.scan_task.connection_result.systems.values_list(
+            "name", "status"
+        ):
+            if not self.has_host(name):
+                continue
+            self._recorded_hosts.add(name)
+            recorded[status] += 1
+        self.connected_count = recorded[SystemConnectionResult.SUCCESS]
+        if self._recorded_hosts:
+            self.scan_task.log_message(
+                f"Resuming after {len(self._recorded_hosts)} hosts with a"
+                " connection result."
+            )
+        return recorded
+
+    def record_result(  # noqa: PLR0913
+        self, name, source, credential, status, identity: HostIdentity | None = None
+    ):
+        """Record a new result, either a connection success or a failure.
+
+        The identity of connected hosts, see QUIPUCORDS_NETWORK_CONNECT_DEDUP, is
+        persisted with their result so inspecting can find it later.
+
+        Results are buffered and written in bulk once QUIPUCORDS_BULK_CREATE_BATCH_SIZE
+        of them are pending, CONNECT_FLUSH_INTERVAL seconds after the previous write,
+        or by `flush`.
+        """
+        self._pending_results.append(
+            SystemConnectionResult(
+                name=name,
+                source=source,
+                credential=credential,
+                status=status,
+                task_connection_result=self.scan_task.connection_result,
+                identity=identity,
+            )
         )
 
         if status == SystemConnectionResult.SUCCESS:
-            message = f"{name} with {credential.name}"
-            self.scan_task.increment_stats(
-                message, increment_sys_scanned=True, prefix="CONNECTED"
+            self.connected_count += 1
+            self.stats.increment(
+                f"CONNECTED {name} with {credential.name}",
+                sys_scanned=int(self.count_connected),
             )
         elif status == SystemConnectionResult.UNREACHABLE:
-            message = f"{name} is UNREACHABLE"
-            self.scan_task.increment_stats(
-                message, increment_sys_unreachable=True, prefix="FAILED"
-            )
+            self.stats.increment(f"FAILED {name} is UNREACHABLE", sys_unreachable=1)
         else:
             if credential is not None:
-                message = f"{name} with {credential.name}"
+                message = f"FAILED {name} with {credential.name}"
             else:
-                message = f"{name} has no valid credentials"
+                message = f"FAILED {name} has no valid credentials"
+            self.stats.increment(message, sys_failed=1)
 
-            self.scan_task.increment_stats(
-                message, increment_sys_failed=True, prefix="FAILED"
-            )
+        self._recorded_hosts.add(name)
+        if (
+            len(self._pending_results) >= settings.QUIPUCORDS_BULK_CREATE_BATCH_SIZE
+            or time.monotonic() - self._last_flush >= CONNECT_FLUSH_INTERVAL
+        ):
+            self.flush()
 
-        self._remaining_hosts.remove(name)
+    @transaction.atomic
+    def flush(self):
+        """Write the buffered results and stats to the database.
 
-    def remaining_hosts(self):
-        """Get the set of hosts that are left to scan."""
-        # Need to return a list because the caller can iterate over
-        # our return value and call record_result repeatedly. If we
-        # returned the actual list, then they would get a 'set changed
-        # size during iteration' error.
-        return list(self._remaining_hosts)
+        Called after every connect playbook run (including canceled ones) and
+        once connecting is done, so nothing buffered is lost.
+        """
+        pending, self._pending_results = self._pending_results, []
+        self._last_flush = time.monotonic()
+        SystemConnectionResult.objects.bulk_create(pending)
+        self.stats.flush()
+
+    def has_host(self, name) -> bool:
+        """Tell whether a host is one this store connects to."""
+        if self._shard is not None:
+            return self._shard.contains(self._source_hosts, name)
+        return name in self._source_hosts
+
+    def iter_hosts(self) -> Iterator[str]:
+        """Iterate the hosts of this store, in the source order."""
+        if self._shard is not None:
+            return self._shard.select(self._source_hosts)
+        return iter(self._source_hosts)
+
+    def remaining_hosts(self) -> RemainingHosts:
+        """Get the hosts that are left to scan, in the source order."""
+        return RemainingHosts(self)
+
+
+class RemainingHosts:
+    """The hosts of a ConnectResultStore without a connection result yet.
+
+    This is a view: the hosts are built while iterating and filtered against the
+    recorded ones as they come, so results can be recorded meanwhile, and it is
+    counted without iterating. Memory only grows with the recorded hosts.
+    """
+
+    def __init__(self, result_store: ConnectResultStore):
+        """Initialize the view of the remaining hosts of a store."""
+        self._result_store = result_store
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate the remaining hosts, in the source order."""
+        recorded = self._result_store._recorded_hosts
+        return (
+            host for host in self._result_store.iter_hosts() if host not in recorded
+        )
 
+    def __len__(self):
+        """Count the remaining hosts."""
+        store = self._result_store
+        return store._host_count - len(store._recorded_hosts)
 
-def _connect(  # noqa: PLR0913, PLR0915
+    def __bool__(self):
+        """Tell whether any host remains."""
+        return len(self) > 0
+
+    def __contains__(self, host) -> bool:
+        """Tell whether a host remains, without iterating."""
+        store = self._result_store
+        return host not in store._recorded_hosts and store.has_host(host)
+
+
+def _connect(  # noqa: PLR0913
     *,
     scan_task: ScanTask,
     hosts,
@@ -572,6 +1160,8 @@ def _connect(  # noqa: PLR0913, PLR0915
     ssh_keyfile: str | None,
     use_paramiko=False,
     exclude_hosts=None,
+    cancel_check=None,
+    ssh_control: SSHControl | None = None,
 ):
     """Attempt to connect to hosts using the given credential.
 
@@ -584,45 +1174,160 @@ def _connect(  # noqa: PLR0913, PLR0915
     :param forks: number of forks to run with
     :param exclude_hosts: Optional. Hosts to exclude from test connections
     :param ssh_keyfile: Path to credential ssh_keyfile. Can be none if not applicable.
+    :param cancel_check: Optional. Callable telling whether the scan was canceled
+    :param ssh_control: Optional. SSHControl sharing the SSH connections
     :returns: list of connected hosts credential tuples and
             list of host that failed connection
     """
     cred_data = model_to_dict(credential)
     cred_data[GENERATED_SSH_KEYFILE] = ssh_keyfile
-    group_names, inventory = construct_inventory(
+    if exclude_hosts:
+        excluded = set(exclude_hosts)
+        hosts = (host for host in hosts if host not in excluded)
+    _handle_ssh_passphrase(cred_data)
+
+    return _run_connect_playbook(
+        scan_task=scan_task,
         hosts=hosts,
-        credential=cred_data,
-        connection_port=connection_port,
-        concurrency_count=forks,
-        exclude_hosts=exclude_hosts,
+        construct_group_inventory=lambda group_hosts, group_index: construct_inventory(
+            hosts=group_hosts,
+            credential=cred_data,
+            connection_port=connection_port,
+            concurrency_count=forks,
+            first_group_index=group_index,
+        ),
+        new_callback=lambda: ConnectResultCallback(
+            result_store, credential, scan_task.source, cancel_check=cancel_check
+        ),
+        playbook="connect.yml",
+        forks=forks,
+        use_paramiko=use_paramiko,
+        ssh_control=ssh_control,
     )
-    inventory_file = write_to_yaml(inventory)
-    _handle_ssh_passphrase(cred_data)
 
+
+def _connect_all_credentials(  # noqa: PLR0913
+    *,
+    scan_task: ScanTask,
+    hosts,
+    result_store: ConnectResultStore,
+    credentials: list[Credential],
+    connection_port,
+    forks,
+    use_paramiko=False,
+    cancel_check=None,
+    ssh_control: SSHControl | None = None,
+):
+    """Attempt to connect to hosts trying all the credentials in a single run.
+
+    Each host attempts the credentials in order and stops at the first one that
+    works, so credential precedence is the same as connecting with one credential
+    after another. Unreachable hosts skip the remaining credentials.
+
+    :param credentials: The credentials used for connections, in order
+    :returns: see _connect
+    """
+    credential_names = ", ".join(credential.name for credential in credentials)
+    scan_task.log_message(f"Attempting credentials {credential_names}.")
+    with ExitStack() as stack:
+        creds_data = []
+        for credential in credentials:
+            cred_data = model_to_dict(credential)
+            cred_data[GENERATED_SSH_KEYFILE] = stack.enter_context(
+                credential.generate_ssh_keyfile()
+            )
+            _handle_ssh_passphrase(cred_data)
+            creds_data.append(cred_data)
+
+        try:
+            return _run_connect_playbook(
+                scan_task=scan_task,
+                hosts=hosts,
+                construct_group_inventory=lambda group_hosts, group_index: (
+                    construct_inventory(
+                        hosts=group_hosts,
+                        credentials=creds_data,
+                        connection_port=connection_port,
+                        concurrency_count=forks,
+                        first_group_index=group_index,
+                    )
+                ),
+                new_callback=lambda: CredentialsConnectResultCallback(
+                    result_store,
+                    credentials,
+                    scan_task.source,
+                    cancel_check=cancel_check,
+                ),
+                playbook="connect_credentials.yml",
+                forks=forks,
+                use_paramiko=use_paramiko,
+                attempts_per_host=len(credentials),
+                ssh_control=ssh_control,
+            )
+        except AnsibleRunnerException as ansible_error:
+            remaining_hosts_str = ", ".join(result_store.remaining_hosts())
+            error_message = (
+                f"Connect scan task failed with credentials {credential_names}."
+                f" Error: {ansible_error} Hosts: {remaining_hosts_str}"
+            )
+            return error_message, ScanTask.FAILED
+
+
+def _run_connect_playbook(  # noqa: PLR0912, PLR0913, PLR0915, C901
+    *,
+    scan_task: ScanTask,
+    hosts: Iterable[str],
+    construct_group_inventory: Callable[[list[str], int], tuple[list[str], dict]],
+    new_callback,
+    playbook: str,
+    forks,
+    use_paramiko=False,
+    attempts_per_host=1,
+    ssh_control: SSHControl | None = None,
+):
+    """Run a connect playbook over each group of `forks` hosts.
+
+    Hosts are taken a group at a time, and each run gets an inventory of its group
+    only, so neither the hosts nor the inventories are all held at once.
+
+    :param hosts: The hosts to connect to. Only iterated once, lazily.
+    :param construct_group_inventory: Callable returning the group names and
+        inventory of a group of hosts, given the hosts and the group index
+    :param new_callback: Callable returning the result callback of a group run
+    :param playbook: Name of the playbook in the runner directory
+    :param attempts_per_host: Number of connection attempts per host, used to
+        scale the job timeout
+    :param ssh_control: Optional. SSHControl sharing the SSH connections
+    :returns: see _connect
+    """
+    group_count = math.ceil(len(hosts) / forks) if isinstance(hosts, Sized) else None
     log_message = (
         "START CONNECT PROCESSING GROUPS"
         f" with use_paramiko: {use_paramiko} and {forks:d} forks"
     )
     scan_task.log_message(log_message)
     any_successful_connection = False
-    for idx, group_name in enumerate(group_names):
-        group_ips = (
-            inventory.get("all").get("children").get(group_name).get("hosts").keys()
-        )
-        group_ips = [f"'{ip}'" for ip in group_ips]
+    for idx, group_hosts in enumerate(chunked(hosts, forks)):
+        (group_name,), inventory = construct_group_inventory(group_hosts, idx)
+        group_ips = [
+            f"'{ip}'" for ip in inventory["all"]["children"][group_name]["hosts"]
+        ]
         group_ip_string = ", ".join(group_ips)
+        of_groups = f" of {group_count:d}" if group_count is not None else ""
         log_message = (
-            f"START CONNECT PROCESSING GROUP {(idx + 1):d} of {len(group_names):d}. "
+            f"START CONNECT PROCESSING GROUP {(idx + 1):d}{of_groups}. "
             f"About to connect to hosts [{group_ip_string}]"
         )
         scan_task.log_message(log_message)
-        call = ConnectResultCallback(result_store, credential, scan_task.source)
+        call = new_callback()
 
         number_of_hosts = len(group_ips)
         # Create parameters for ansible runner. For more info, see:
         # https://ansible.readthedocs.io/projects/runner/en/stable/intro/#env-settings-settings-for-runner-itself
         job_timeout = (
-            int(settings.QUIPUCORDS_NETWORK_CONNECT_JOB_TIMEOUT) * number_of_hosts
+            int(settings.QUIPUCORDS_NETWORK_CONNECT_JOB_TIMEOUT)
+            * number_of_hosts
+            * attempts_per_host
         )
         runner_settings = {
             "idle_timeout": job_timeout,  # Ansible default = 600 sec
@@ -632,7 +1337,9 @@ def _connect(  # noqa: PLR0913, PLR0915
             "variable_host": group_name,
             "ansible_ssh_timeout": settings.QUIPUCORDS_SSH_CONNECT_TIMEOUT,
         }
-        playbook_path = str(settings.BASE_DIR / "scanner/network/runner/connect.yml")
+        if settings.QUIPUCORDS_NETWORK_CONNECT_DEDUP:
+            extra_vars_dict["connect_identity"] = True
+        playbook_path = str(settings.BASE_DIR / "scanner/network/runner" / playbook)
         cmdline_list = []
         vault_file_path = (
             f"--vault-password-file={settings.QUIPUCORDS_ENCRYPTION_SECRET_KEY_PATH}"
@@ -654,6 +1361,7 @@ def _connect(  # noqa: PLR0913, PLR0915
                 f"ansible_runner.run for {number_of_hosts} hosts "
                 f"has timeout settings: {runner_settings}"
             )
+            inventory_file = write_to_yaml(inventory)
             runner_obj = ansible_runner.run(
                 quiet=quiet_bool,
                 settings=runner_settings,
@@ -664,13 +1372,21 @@ def _connect(  # noqa: PLR0913, PLR0915
                 playbook=playbook_path,
                 cmdline=all_commands,
                 verbosity=verbosity_lvl,
+                envvars=ssh_control.envvars if ssh_control is not None else None,
             )
         except Exception as err_msg:  # noqa: BLE001
             logger.exception("Uncaught exception during Ansible Runner execution")
             raise AnsibleRunnerException(err_msg) from err_msg
 
         final_status = runner_obj.status
-        any_successful_connection |= scan_task.systems_scanned >= 1
+        call.result_store.flush()
+        if ssh_control is not None:
+            ssh_control.record_sockets(
+                inventory["all"]["children"][group_name]["hosts"]
+            )
+        # the store of this run (or shard), unlike the task stats shared by shards
+        connected_count = call.result_store.connected_count
+        any_successful_connection |= connected_count >= 1
         if final_status == "canceled":
             msg = log_messages.NETWORK_PLAYBOOK_STOPPED % (
                 "CONNECT",
@@ -682,10 +1398,10 @@ def _connect(  # noqa: PLR0913, PLR0915
                 error = log_messages.NETWORK_TIMEOUT_ERR
             else:
                 error = log_messages.NETWORK_UNKNOWN_ERR
-            if scan_task.systems_scanned:
+            if connected_count:
                 msg = log_messages.NETWORK_CONNECT_CONTINUE % (
                     final_status,
-                    str(scan_task.systems_scanned),
+                    str(connected_count),
                     error,
                 )
                 scan_task.log_message(msg, log_level=logging.ERROR)
@@ -726,30 +1442,102 @@ def _handle_ssh_passphrase(credential):
             pass
 
 
-def run_with_result_store(scan_task, scan_job, result_store: ConnectResultStore):
-    """Run connection test logic with a given ConnectResultStore.
+def get_source_credentials(source) -> list[Credential]:
+    """Get the credentials of a source, in the order they should be tried."""
+    credential_ids = SourceSerializer(source).data["credentials"]
+    return [Credential.objects.get(pk=cred_id) for cred_id in credential_ids]
 
-    :param result_store: ConnectResultStore
+
+def get_credential_affinity(source, credentials) -> dict[str, Credential]:
+    """Get the credential that last connected to each host of a source.
+
+    Only the given credentials are considered, and only if they were not updated
+    since they last connected.
     """
-    serializer = SourceSerializer(scan_task.source)
-    source = serializer.data
+    credentials_by_id = {credential.id: credential for credential in credentials}
+    affinities = CredentialAffinity.objects.filter(
+        source=source,
+        credential__in=credentials,
+        credential__updated_at__lte=F("updated_at"),
+    ).values_list("name", "credential_id")
+    return {name: credentials_by_id[cred_id] for name, cred_id in affinities}
+
+
+def update_credential_affinity(scan_task: ScanTask):
+    """Remember the credentials that connected to the hosts of a scan task."""
+    connected = scan_task.connection_result.systems.filter(
+        status=SystemConnectionResult.SUCCESS, credential__isnull=False
+    ).values_list("name", "credential_id")
+    CredentialAffinity.objects.bulk_create(
+        [
+            CredentialAffinity(
+                source=scan_task.source, name=name, credential_id=credential_id
+            )
+            for name, credential_id in connected
+        ],
+        update_conflicts=True,
+        unique_fields=["source", "name"],
+        update_fields=["credential", "updated_at"],
+    )
 
-    if scan_job.options is not None:
-        forks = scan_job.options.get(Scan.MAX_CONCURRENCY)
-    else:
-        forks = Scan.DEFAULT_MAX_CONCURRENCY
 
-    use_paramiko = scan_task.source.use_paramiko
-    if use_paramiko is None:
-        use_paramiko = False
+def _connect_known_credentials(
+    *, scan_task: ScanTask, hosts, credentials: list[Credential], **connect_kwargs
+):
+    """Connect to hosts with the credential that last worked for them.
 
-    connection_port = source["port"]
-    credentials = source["credentials"]
+    Hosts that can't connect are left to the search over all credentials.
+
+    :param connect_kwargs: The remaining keyword arguments of _connect
+    :returns: see _connect
+    """
+    # the hosts are a lazy view of the remaining ones: only the hosts with an
+    # affinity, usually far fewer, are listed
+    hosts_by_credential = defaultdict(list)
+    for host, credential in get_credential_affinity(
+        scan_task.source, credentials
+    ).items():
+        if host in hosts:
+            hosts_by_credential[credential.id].append(host)
+    for credential in credentials:
+        known_hosts = hosts_by_credential[credential.id]
+        if not known_hosts:
+            continue
+        scan_task.log_message(
+            f"Attempting credential {credential.name} on the"
+            f" {len(known_hosts)} hosts it last connected to."
+        )
+        with credential.generate_ssh_keyfile() as ssh_keyfile:
+            try:
+                scan_message, scan_result = _connect(
+                    scan_task=scan_task,
+                    hosts=known_hosts,
+                    credential=credential,
+                    ssh_keyfile=ssh_keyfile,
+                    **connect_kwargs,
+                )
+            except AnsibleRunnerException as ansible_error:
+                error_message = (
+                    f"Connect scan task failed with credential {credential.name}."
+                    f" Error: {ansible_error} Hosts: {', '.join(known_hosts)}"
+                )
+                return error_message, ScanTask.FAILED
+        # failures are retried with all credentials, only stop if canceled
+        if scan_result == ScanTask.CANCELED:
+            return scan_message, scan_result
+    return None, ScanTask.COMPLETED
 
-    remaining_hosts = result_store.remaining_hosts()
 
-    for cred_id in credentials:
-        credential = Credential.objects.get(pk=cred_id)
+def _connect_each_credential(
+    *, scan_task: ScanTask, result_store: ConnectResultStore, credentials, **kwargs
+):
+    """Connect to the remaining hosts with one credential after another.
+
+    :param kwargs: The remaining keyword arguments of _connect
+    :returns: see _connect
+    """
+    remaining_hosts = result_store.remaining_hosts()
+    for credential in credentials:
         if not remaining_hosts:
             message = f"Skipping credential {credential.name}. No remaining hosts."
             scan_task.log_message(message)
@@ -764,10 +1552,8 @@ def run_with_result_store(scan_task, scan_job, result_store: ConnectResultStore)
                     hosts=remaining_hosts,
                     result_store=result_store,
                     credential=credential,
-                    connection_port=connection_port,
-                    forks=forks,
-                    use_paramiko=use_paramiko,
                     ssh_keyfile=ssh_keyfile,
+                    **kwargs,
                 )
                 if scan_result != ScanTask.COMPLETED:
                     return scan_message, scan_result
@@ -782,12 +1568,120 @@ def run_with_result_store(scan_task, scan_job, result_store: ConnectResultStore)
         remaining_hosts = result_store.remaining_hosts()
 
         logger.debug("Failed systems: %s", remaining_hosts)
+    return None, ScanTask.COMPLETED
+
+
+def record_unresponsive_hosts(scan_task, result_store: ConnectResultStore, port):
+    """Record the remaining hosts not answering a TCP probe as unreachable.
+
+    See scanner.network.probe. Only the hosts answering the probe are left for
+    the connect playbook runs.
+    """
+    hosts = result_store.remaining_hosts()
+    responsive = probe_hosts(hosts, port)
+    scan_task.log_message(
+        f"TCP probe: {len(responsive)} of {len(hosts)} hosts answered on port {port}."
+    )
+    for host in hosts:
+        if host not in responsive:
+            result_store.record_result(
+                host, scan_task.source, None, SystemConnectionResult.UNREACHABLE
+            )
+
+
+def run_with_result_store(
+    scan_task,
+    scan_job,
+    result_store: ConnectResultStore,
+    cancel_check=None,
+    ssh_control: SSHControl | None = None,
+):
+    """Run connection test logic with a given ConnectResultStore.
+
+    :param result_store: ConnectResultStore
+    :param cancel_check: Optional. Callable telling whether the scan was canceled
+    :param ssh_control: Optional. SSHControl sharing the SSH connections
+    """
+    try:
+        return _run_with_result_store(
+            scan_task,
+            scan_job,
+            result_store,
+            cancel_check=cancel_check,
+            ssh_control=ssh_control,
+        )
+    finally:
+        result_store.flush()
 
-    for host in remaining_hosts:
+
+def _run_with_result_store(
+    scan_task,
+    scan_job,
+    result_store: ConnectResultStore,
+    cancel_check=None,
+    ssh_control: SSHControl | None = None,
+):
+    source = SourceSerializer(scan_task.source).data
+
+    if scan_job.options is not None:
+        forks = scan_job.options.get(Scan.MAX_CONCURRENCY)
+    else:
+        forks = Scan.DEFAULT_MAX_CONCURRENCY
+
+    use_paramiko = scan_task.source.use_paramiko
+    if use_paramiko is None:
+        use_paramiko = False
+
+    connect_kwargs = {
+        "scan_task": scan_task,
+        "result_store": result_store,
+        "connection_port": source["port"],
+        "forks": forks,
+        "use_paramiko": use_paramiko,
+        "cancel_check": cancel_check,
+        "ssh_control": ssh_control,
+    }
+    credentials = get_source_credentials(scan_task.source)
+
+    if settings.QUIPUCORDS_NETWORK_TCP_PROBE:
+        record_unresponsive_hosts(scan_task, result_store, source["port"])
+
+    if settings.QUIPUCORDS_NETWORK_CREDENTIAL_AFFINITY:
+        scan_message, scan_result = _connect_known_credentials(
+            hosts=result_store.remaining_hosts(),
+            credentials=credentials,
+            **connect_kwargs,
+        )
+        if scan_result != ScanTask.COMPLETED:
+            return scan_message, scan_result
+
+    remaining_hosts = result_store.remaining_hosts()
+    if (
+        settings.QUIPUCORDS_NETWORK_CONNECT_ALL_CREDENTIALS
+        and len(credentials) > 1
+        and remaining_hosts
+    ):
+        scan_message, scan_result = _connect_all_credentials(
+            hosts=remaining_hosts,
+            credentials=credentials,
+            **connect_kwargs,
+        )
+    else:
+        scan_message, scan_result = _connect_each_credential(
+            credentials=credentials, **connect_kwargs
+        )
+    if scan_result != ScanTask.COMPLETED:
+        return scan_message, scan_result
+
+    for host in result_store.remaining_hosts():
         # We haven't connected to these hosts with any
         # credentials, so they have failed.
         result_store.record_result(
             host, scan_task.source, None, SystemConnectionResult.FAILED
         )
 
+    if settings.QUIPUCORDS_NETWORK_CREDENTIAL_AFFINITY:
+        result_store.flush()
+        update_credential_affinity(scan_task)
+
     return None, ScanTask.COMPLETED
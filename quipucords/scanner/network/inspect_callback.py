@@ -3,13 +3,14 @@
 from __future__ import annotations
 
 import logging
-from collections import defaultdict
+from collections import Counter, defaultdict
+from collections.abc import Callable, Generator
 from dataclasses import dataclass
-from typing import Generator
 
 from django.conf import settings
 
 import log_messages
+from api.connresult.model import SystemConnectionResult
 from api.inspectresult.model import InspectResult
 from utils.misc import sanitize_for_utf8_compatibility
 
@@ -19,6 +20,13 @@ HOST_DONE = "host_done"
 TIMEOUT_RC = 124  # 'timeout's return code when it times out.
 UNKNOWN_HOST = "unknown_host"
 UNKNOWN_TASK_PATH = "unknown_task_path"
+# events of a task result on a host, timed by ansible-runner
+TIMED_EVENTS = (
+    "runner_on_ok",
+    "runner_on_failed",
+    "runner_on_skipped",
+    "runner_on_unreachable",
+)
 
 
 @dataclass
@@ -31,15 +39,35 @@ class AnsibleResults:
 
 
 class InspectCallback:
-    """Callback helper to plug ansible callbacks for network scan inspection phase."""
+    """Callback helper to plug ansible callbacks for network scan inspection phase.
 
-    def __init__(self):
+    If `on_host_done` is given, each host's results are handed to it as soon as the
+    host finishes (emits the `host_done` fact or becomes unreachable), and the host
+    facts are dropped from memory. Hosts that never finish are still available
+    through `iter_results` once the playbook ends.
+
+    If `cancel_check` is given, it is polled by `cancel_callback` and the playbook is
+    stopped once it returns True.
+    """
+
+    def __init__(
+        self,
+        on_host_done: Callable[[AnsibleResults], None] | None = None,
+        cancel_check: Callable[[], bool] | None = None,
+    ):
         self._ansible_facts = defaultdict(dict)
+        self._on_host_done = on_host_done
+        self._cancel_check = cancel_check
         self._unreachable_hosts = set()
         self._collect_skipped_tasks_enabled = (
             settings.QUIPUCORDS_FEATURE_FLAGS.is_feature_active("REPORT_SKIPPED_TASKS")
         )
         self._skipped_facts = defaultdict(set)
+        # hosts handed over per InspectResult status
+        self.host_status_counts = Counter()
+        self._collect_task_durations_enabled = settings.QUIPUCORDS_NETWORK_TASK_PROFILE
+        # seconds spent per (host, role, task), see QUIPUCORDS_NETWORK_TASK_PROFILE
+        self.task_durations: dict[tuple[str, str, str], float] = defaultdict(float)
         self.stopped = False
 
     @property
@@ -52,15 +80,31 @@ class InspectCallback:
     def iter_results(self) -> Generator[AnsibleResults]:
         """Yield host completion state and ansible facts."""
         for host, facts in self.ansible_facts.items():
-            if host in self._unreachable_hosts:
-                host_status = InspectResult.UNREACHABLE
-            elif facts.get(HOST_DONE, False) is True:
-                # host_done is the last fact - we assume a host is successfully scanned
-                # if this fact is set to true
-                host_status = InspectResult.SUCCESS
-            else:
-                host_status = InspectResult.FAILED
-            yield AnsibleResults(host=host, status=host_status, facts=facts)
+            yield self._host_results(host, facts)
+
+    def _host_results(self, host, facts) -> AnsibleResults:
+        if host in self._unreachable_hosts:
+            host_status = InspectResult.UNREACHABLE
+        elif facts.get(HOST_DONE, False) is True:
+            # host_done is the last fact - we assume a host is successfully scanned
+            # if this fact is set to true
+            host_status = InspectResult.SUCCESS
+        else:
+            host_status = InspectResult.FAILED
+        self.host_status_counts[host_status] += 1
+        return AnsibleResults(host=host, status=host_status, facts=facts)
+
+    def _finish_host(self, host):
+        """Hand over a finished host to on_host_done and forget its facts."""
+        if self._on_host_done is None:
+            return
+        facts = self._ansible_facts.pop(host, None)
+        if not facts:
+            # nothing was collected, so there's nothing to hand over (just like
+            # iter_results, which only knows about hosts with facts)
+            return
+        logger.debug("[host=%s] host finished, handing over its results", host)
+        self._on_host_done(self._host_results(host, facts))
 
     def task_on_ok(self, event_dict: dict):
         """Handle successful ansible events."""
@@ -90,6 +134,8 @@ class InspectCallback:
                 logger.debug("[host=%s] Overwriting fact %s", host, fact_name)
             logger.debug("[host=%s] Storing fact %s", host, fact_name)
             self._ansible_facts[host][fact_name] = fact_value
+        if ansible_facts.get(HOST_DONE, False) is True:
+            self._finish_host(host)
 
     def task_on_failed(self, event_dict):
         """Handle failure events."""
@@ -138,6 +184,7 @@ class InspectCallback:
         error_msg = result.get("msg", "No information given on unreachable error.")
         logger.error("[host=%s] UNREACHABLE - %s", host, error_msg)
         self._unreachable_hosts.add(host)
+        self._finish_host(host)
 
     def task_on_skipped(self, event_dict):
         """Handle skipped events.
@@ -158,6 +205,17 @@ class InspectCallback:
         logger.debug("[host=%s] skipped task %s, item='%s'", host, task_path, item_id)
         self._skipped_facts[host].add(task_id)
 
+    def record_duration(self, event_dict):
+        """Add the duration of a task result to its host, role and task."""
+        event_data = event_dict.get("event_data", {})
+        duration = event_data.get("duration")
+        if duration is None:
+            return
+        host = event_data.get("host", UNKNOWN_HOST)
+        role = event_data.get("role") or ""
+        task = event_data.get("task") or ""
+        self.task_durations[(host, role, task)] += duration
+
     def event_callback(self, event_dict=None):
         """
         Handle ansible events.
@@ -189,6 +247,8 @@ class InspectCallback:
             )
             return
 
+        if self._collect_task_durations_enabled and event in TIMED_EVENTS:
+            self.record_duration(event_dict)
         if event in okay:
             self.task_on_ok(event_dict)
         elif event in failed:
@@ -200,6 +260,80 @@ class InspectCallback:
 
     def cancel_callback(self):
         """Control the cancel callback for ansible runner."""
+        if not self.stopped and self._cancel_check is not None:
+            self.stopped = self._cancel_check()
         if self.stopped:
             return True
         return False
+
+
+class ConnectInspectCallback(InspectCallback):
+    """InspectCallback that also records connection results.
+
+    Used by the single-pass network scan, which runs the inspect playbook with one
+    credential at a time instead of running the connect playbook first. The first
+    result of a command that ran on a host (one with a return code, unlike set_fact
+    tasks, which run on the controller) shows the credential works for it, and a
+    SystemConnectionResult is recorded, just like ConnectResultCallback does.
+    Hosts that reject the credential are left alone so the next credential can be
+    tried on them, and get no inspect result from this run.
+    """
+
+    def __init__(self, result_store, credential, source, **kwargs):
+        """Create result callback."""
+        super().__init__(**kwargs)
+        self.result_store = result_store
+        self.credential = credential
+        self.source = source
+        self._connected_hosts = set()
+
+    def iter_results(self) -> Generator[AnsibleResults]:
+        """Yield the results of the hosts connected to."""
+        for result in super().iter_results():
+            if result.host in self._connected_hosts:
+                yield result
+
+    def _record_connected(self, event_dict):
+        event_data = event_dict.get("event_data", {})
+        host = event_data.get("host", UNKNOWN_HOST)
+        if host in self._connected_hosts or "rc" not in (event_data.get("res") or {}):
+            # set_fact and other controller side tasks don't prove anything
+            return
+        self._connected_hosts.add(host)
+        self.result_store.record_result(
+            host, self.source, self.credential, SystemConnectionResult.SUCCESS
+        )
+
+    def task_on_ok(self, event_dict: dict):
+        """Handle successful ansible events."""
+        self._record_connected(event_dict)
+        super().task_on_ok(event_dict)
+
+    def task_on_failed(self, event_dict):
+        """Handle failure events."""
+        # a command that returned a code ran on the host, so the connection worked
+        self._record_connected(event_dict)
+        super().task_on_failed(event_dict)
+
+    def task_on_unreachable(self, event_dict):
+        """Handle unreachable events."""
+        event_data = event_dict.get("event_data", {})
+        host = event_data.get("host", UNKNOWN_HOST)
+        if host not in self._connected_hosts:
+            # forget the controller side facts set before trying to connect: the
+            # host only gets a connection result
+            self._ansible_facts.pop(host, None)
+            message = event_data.get("res", {}).get("msg") or ""
+            if "permission denied" in message.lower():
+                # invalid creds; keep the host for the next credential
+                self.result_store.scan_task.log_message(
+                    log_messages.TASK_PERMISSION_DENIED % (host, self.credential.name)
+                )
+                return
+            self.result_store.record_result(
+                host,
+                self.source,
+                self.credential,
+                SystemConnectionResult.UNREACHABLE,
+            )
+        super().task_on_unreachable(event_dict)
@@ -0,0 +1,161 @@
+"""Post process the raw facts of network inspect, inline or in worker processes.
+
+Processors run one fact after the other, and each may depend on the facts
+processed before it for the same host (see DEPS and REQUIRE_DEPS in
+`scanner.network.processing.process`), so the facts of a host are always
+processed together, in order. With QUIPUCORDS_NETWORK_POST_PROCESS_WORKERS,
+the hosts of each batch the InspectResultWriter picks up are processed in
+parallel by a pool of that many worker processes instead of one after the other
+in the writer thread (a batch of a single host is still processed inline, as
+sending it to a worker would only add to its latency). The writer queue feeds
+the pool: the further the writer falls behind, the larger its batches and the
+more hosts are processed at once.
+
+Workers are spawned, not forked, so they share neither the threads nor the
+database connections of the scan, and set Django up before processing anything.
+Processors don't touch the database: the messages they log to the scan task
+are recorded in the worker and replayed to the scan task once the host is done.
+If the pool can't be started or breaks, the remaining hosts are processed inline.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+
+from api.models import ScanTask
+from scanner.network.inspect_callback import AnsibleResults
+from scanner.network.processing.process import NO_DATA, process
+
+logger = logging.getLogger(__name__)
+
+
+class LogRecorder:
+    """Record the messages logged to the scan task by a worker process."""
+
+    def __init__(self):
+        """Start with no messages."""
+        self.messages: list[tuple[str, int]] = []
+
+    def log_message(self, message, log_level=logging.INFO):
+        """Record a message instead of logging it to the scan task."""
+        self.messages.append((message, log_level))
+
+
+def process_host_facts(scan_task, host: str, unprocessed_facts: dict) -> dict:
+    """Process each fact of a host, in order.
+
+    :param scan_task: the scan task, or a LogRecorder, the messages are logged to
+    :param host: the host the facts are from
+    :param unprocessed_facts: the facts as gathered by ansible
+    :returns: the processed facts, None for facts without data
+    """
+    logger.debug(
+        "[host=%s] post processing facts. Unprocessed facts=%s",
+        host,
+        unprocessed_facts,
+    )
+    facts = {}
+    for fact_key, fact_value in unprocessed_facts.items():
+        try:
+            processed_fact = process(
+                scan_task=scan_task,
+                previous_host_facts=facts,
+                fact_key=fact_key,
+                fact_value=fact_value,
+                host=host,
+            )
+        except Exception:
+            logger.exception(
+                "[host=%s] Unexpected error ocurred during fact '%s' processing",
+                host,
+                fact_key,
+            )
+            continue
+        if processed_fact == NO_DATA:
+            processed_fact = None
+        facts[fact_key] = processed_fact
+    return facts
+
+
+def _process_host_facts_in_worker(host: str, unprocessed_facts: dict):
+    recorder = LogRecorder()
+    facts = process_host_facts(recorder, host, unprocessed_facts)
+    return facts, recorder.messages
+
+
+class PostProcessPool:
+    """Post process the facts of inspected hosts, in parallel when entered.
+
+    Outside of its context, or without workers, hosts are processed inline.
+    """
+
+    def __init__(self, scan_task: ScanTask, workers: int = 0):
+        """Process the facts of the scan task hosts with up to `workers` processes."""
+        self.scan_task = scan_task
+        self.workers = workers
+        self._executor: ProcessPoolExecutor | None = None
+
+    def __enter__(self):
+        """Start the pool, which spawns its workers once hosts are submitted."""
+        if self.workers > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            )
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop the pool, waiting for the hosts being processed."""
+        self._stop(cancel_futures=exc_info[0] is not None)
+
+    def _stop(self, cancel_futures=False):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=cancel_futures)
+            self._executor = None
+
+    def _fall_back_inline(self, error: Exception):
+        self.scan_task.log_message(
+            f"POST PROCESSING POOL FAILED ({error!r}),"
+            " processing the remaining hosts inline",
+            log_level=logging.WARNING,
+        )
+        self._stop(cancel_futures=True)
+
+    def process(self, ansible_results: Sequence[AnsibleResults]) -> list[dict]:
+        """Process the facts of each host, returning them in the same order."""
+        if self._executor is None or len(ansible_results) < 2:  # noqa: PLR2004
+            return [
+                process_host_facts(self.scan_task, results.host, results.facts)
+                for results in ansible_results
+            ]
+        try:
+            futures = [
+                self._executor.submit(
+                    _process_host_facts_in_worker, results.host, results.facts
+                )
+                for results in ansible_results
+            ]
+        except Exception as error:  # noqa: BLE001
+            # e.g. processes can't be started from this one
+            self._fall_back_inline(error)
+            return self.process(ansible_results)
+
+        processed = []
+        for results, future in zip(ansible_results, futures):
+            try:
+                facts, messages = future.result()
+            except Exception as error:  # noqa: BLE001
+                if self._executor is not None:
+                    self._fall_back_inline(error)
+                facts = process_host_facts(self.scan_task, results.host, results.facts)
+                messages = []
+            for message, log_level in messages:
+                self.scan_task.log_message(message, log_level=log_level)
+            processed.append(facts)
+        return processed
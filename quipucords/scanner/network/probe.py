@@ -0,0 +1,79 @@
+"""Probe network hosts with a TCP handshake before connecting to them with Ansible.
+
+On sparse subnets most addresses have nothing listening, and Ansible waits
+QUIPUCORDS_SSH_CONNECT_TIMEOUT for each of them, once per credential. A plain
+TCP handshake on the source port tells those hosts apart in a fraction of that
+time, and asyncio lets many handshakes wait at once without a thread each.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Iterable
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def probe_hosts(
+    hosts: Iterable[str],
+    port: int,
+    concurrency: int | None = None,
+    timeout: float | None = None,
+) -> set[str]:
+    """Get the hosts accepting TCP connections on the given port.
+
+    Hosts refusing the connection, not answering within the timeout or whose
+    name can't be resolved are left out. Hosts that can't be probed at all, like
+    malformed or overlong names, are kept: the connect playbook reports them.
+
+    :param hosts: the hosts to probe
+    :param port: the port to connect to
+    :param concurrency: max number of handshakes in flight, defaults to
+        QUIPUCORDS_NETWORK_TCP_PROBE_CONCURRENCY
+    :param timeout: seconds to wait for each handshake, defaults to
+        QUIPUCORDS_NETWORK_TCP_PROBE_TIMEOUT
+    """
+    if concurrency is None:
+        concurrency = settings.QUIPUCORDS_NETWORK_TCP_PROBE_CONCURRENCY
+    if timeout is None:
+        timeout = settings.QUIPUCORDS_NETWORK_TCP_PROBE_TIMEOUT
+    return asyncio.run(_probe_hosts(hosts, port, max(concurrency, 1), timeout))
+
+
+async def _probe_hosts(
+    hosts: Iterable[str], port: int, concurrency: int, timeout: float
+) -> set[str]:
+    # a fixed number of workers pull from the same iterator, so hosts are only
+    # taken (and, for HostSets, built) as fast as they are probed
+    host_iterator = iter(hosts)
+    responsive = set()
+
+    async def worker():
+        for host in host_iterator:
+            if await _probe(host, port, timeout):
+                responsive.add(host)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return responsive
+
+
+async def _probe(host: str, port: int, timeout: float) -> bool:
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, TimeoutError) as error:
+        logger.debug("TCP probe of %s:%s failed: %r", host, port, error)
+        return False
+    except ValueError as error:
+        # e.g. a UnicodeError for a name with an empty or overlong label, which
+        # doesn't tell whether the host is up
+        logger.debug("TCP probe of %s:%s not possible: %r", host, port, error)
+        return True
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
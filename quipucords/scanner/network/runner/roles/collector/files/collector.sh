@@ -0,0 +1,131 @@
+# Collect the outputs the user level system roles (etc_release, uname,
+# redhat_release, installed_products, insights, system_purpose, memory and
+# hostnamectl) gather with a raw task each, in a single execution.
+#
+# Prints one JSON object mapping the register name of each raw task to its
+# {"rc": ..., "stdout": ..., "stdout_lines": [...]} result. The collector role
+# turns those results into the facts of the roles (see tasks/main.yml).
+#
+# Only POSIX shell and awk are required on the host.
+
+export LANG=C LC_ALL=C
+collector_tmp=$(mktemp 2>/dev/null || echo "/tmp/quipucords-collector.$$")
+collector_sep=''
+
+collector_json() {
+    awk -v eol="$1" '
+    function esc(s,    out, i, c) {
+        # gsub replacements of backslashes differ between awks, so build the
+        # escaped string one character at a time
+        if (s !~ /[\\"\001-\037]/) {
+            return s
+        }
+        out = ""
+        for (i = 1; i <= length(s); i++) {
+            c = substr(s, i, 1)
+            if (c == "\\" || c == "\"") {
+                c = "\\" c
+            } else if (c ~ /[\001-\037]/) {
+                c = sprintf("\\u%04x", index(ctrl, c))
+            }
+            out = out c
+        }
+        return out
+    }
+    BEGIN {
+        for (i = 1; i < 32; i++) {
+            ctrl = ctrl sprintf("%c", i)
+        }
+    }
+    {
+        lines[NR] = $0
+    }
+    END {
+        printf "\"stdout\":\""
+        for (i = 1; i <= NR; i++) {
+            printf "%s", esc(lines[i])
+            if (i < NR || eol) {
+                printf "\\n"
+            }
+        }
+        printf "\",\"stdout_lines\":["
+        for (i = 1; i <= NR; i++) {
+            line = lines[i]
+            sub(/\r$/, "", line)
+            printf "%s\"%s\"", (i > 1 ? "," : ""), esc(line)
+        }
+        printf "]"
+    }' "$collector_tmp"
+}
+
+# probe NAME COMMAND: run COMMAND and print its result as the NAME member
+probe() {
+    (eval "$2") >"$collector_tmp" 2>/dev/null
+    collector_rc=$?
+    collector_eol=1
+    if [ -s "$collector_tmp" ] && [ -n "$(tail -c 1 "$collector_tmp")" ]; then
+        collector_eol=0
+    fi
+    printf '%s"%s":{"rc":%d,' "$collector_sep" "$1" "$collector_rc"
+    collector_json "$collector_eol"
+    printf '}'
+    collector_sep=','
+}
+
+printf '{'
+
+# etc_release
+probe internal_release_found '
+    for i in \
+      /etc/debian_version \
+      /etc/redhat-release /etc/SuSE-release /etc/mandriva-release \
+      /etc/enterprise-release /etc/sun-release /etc/slackware-release \
+      /etc/ovs-release /etc/arch-release /etc/release \
+      /etc/lsb-release \
+    ; do
+      [ -f $i ] && echo $i && break
+    done;'
+collector_release_file=$(tail -n 1 "$collector_tmp")
+if [ -n "$collector_release_file" ]; then
+    if [ "$collector_release_file" = /etc/lsb-release ]; then
+        probe internal_lsb_release_file \
+            '. /etc/lsb-release && echo "$DISTRIB_ID" && echo "$DISTRIB_RELEASE"'
+    else
+        probe internal_release_file_content "cat $collector_release_file"
+    fi
+fi
+probe internal_lsb_release_cmd 'lsb_release -si -sr'
+probe internal_uname_version 'uname -s -r'
+probe internal_get_etc_machine_id \
+    "if [ -f /etc/machine-id ]; then cat /etc/machine-id; fi | tr -d '\r' | tr -d '\n'"
+
+# uname
+probe internal_uname_hostname 'uname -n'
+probe internal_uname_processor 'uname -p'
+probe internal_uname_all 'uname -a'
+
+# redhat_release
+probe internal_redhat_release \
+    'rpm -q --queryformat "%{NAME}\n%{VERSION}\n%{RELEASE}\n" --whatprovides redhat-release'
+
+# installed_products
+probe internal_installed_products \
+    "find /etc/pki/product*/ -name '*pem' -exec rct cat-cert --no-content '{}' \; | grep -C2 -E '^\s+ID:'"
+
+# insights
+probe internal_get_insights_client_id \
+    "if [ -f /etc/insights-client/machine-id ] ; then cat /etc/insights-client/machine-id; fi || if [ -f /etc/redhat-access-insights ] ; then cat /etc/redhat-access-insights/machine-id; fi | tr -d '\r' | tr -d '\n'"
+
+# system_purpose
+probe internal_system_purpose_json \
+    'if [ -f /etc/rhsm/syspurpose/syspurpose.json ] ; then cat /etc/rhsm/syspurpose/syspurpose.json 2>/dev/null; fi'
+
+# memory
+probe memory_in_kb \
+    "(set -o pipefail) 2>/dev/null && set -o pipefail; cat /proc/meminfo | grep MemTotal | awk '{print \$2}'"
+
+# hostnamectl
+probe internal_hostnamectl_status 'TERM=dumb hostnamectl status'
+
+printf '}\n'
+rm -f "$collector_tmp"
@@ -0,0 +1,197 @@
+"""Share SSH connections between the playbook runs of a network scan.
+
+Ansible's ssh connection keeps a ControlMaster connection per host for
+ControlPersist seconds, but only in a shared directory and for 60 seconds by
+default, so the inspect runs usually open new connections to the hosts the
+connect runs just reached. SSHControl gives each scan task (or shard) its own
+control directory under QUIPUCORDS_NETWORK_SSH_CONTROL_DIR/<scan job id>,
+keeps the master connections alive between the runs and closes them when the
+task ends.
+
+Ansible names each socket after a hash of the host, port and user, so the
+sockets seen after each run tell how many SSH handshakes every host took.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import shutil
+import subprocess
+from collections import Counter
+from collections.abc import Iterable
+from pathlib import Path
+
+from django.conf import settings
+
+from api.models import ScanJob, ScanTask
+
+logger = logging.getLogger(__name__)
+
+# scan jobs in these states may still use their control directory; a paused job
+# resumes with its tasks. ScanJob.status takes the ScanTask status choices.
+ACTIVE_JOB_STATUSES = (
+    ScanTask.CREATED,
+    ScanTask.PENDING,
+    ScanTask.RUNNING,
+    ScanTask.PAUSED,
+)
+SSH_EXIT_TIMEOUT = 5
+
+
+def control_socket_name(host: str, port: int, user: str | None) -> str:
+    """Get the name Ansible gives the ControlPath socket of a connection.
+
+    This mirrors the ssh connection plugin's _create_control_path.
+    """
+    digest = hashlib.sha1(f"{host}-{port}-{user}".encode()).hexdigest()  # noqa: S324
+    return digest[:10]
+
+
+class SSHControl:
+    """The SSH ControlMaster connections of a network scan task.
+
+    Use it as a context manager around the connect and inspect runs of the
+    task: leaving the context closes every master connection, whatever the
+    task outcome. Master connections left behind by a crashed worker are closed
+    by the next SSHControl started on the same machine, once their scan job is
+    no longer running; until then ControlPersist bounds their life.
+    """
+
+    def __init__(self, scan_task: ScanTask, shard_index: int | None = None):
+        """Initialize the control directory of a scan task.
+
+        :param scan_task: the scan task whose connections are shared
+        :param shard_index: the shard of the task, when sharded
+        """
+        self.scan_task = scan_task
+        self.root = Path(settings.QUIPUCORDS_NETWORK_SSH_CONTROL_DIR)
+        self.job_directory = self.root / str(scan_task.job_id)
+        name = str(scan_task.id)
+        if shard_index is not None:
+            name = f"{name}-{shard_index}"
+        self.directory = self.job_directory / name
+        self.port = scan_task.source.port
+        self.users = {
+            credential.username for credential in scan_task.source.credentials.all()
+        }
+        # the sockets seen for each host, one per handshake. Inodes get reused,
+        # so a socket is told apart by its inode and creation time.
+        self._sockets: dict[str, set[tuple[int, int]]] = {}
+
+    def __enter__(self):
+        """Close stale connections and create the control directory."""
+        close_stale_connections(self.root)
+        self.directory.mkdir(parents=True, exist_ok=True, mode=0o700)
+        return self
+
+    def __exit__(self, *exc_info):
+        """Log the handshakes and close every master connection."""
+        self.log_handshakes()
+        close_connections(self.directory)
+        try:
+            # only succeeds once the last task of the job is done
+            self.job_directory.rmdir()
+        except OSError:
+            pass
+
+    @property
+    def envvars(self) -> dict[str, str]:
+        """Get the environment variables making Ansible use this directory."""
+        persist = settings.QUIPUCORDS_NETWORK_SSH_CONTROL_PERSIST
+        return {
+            "ANSIBLE_SSH_ARGS": (
+                f"-C -o ControlMaster=auto -o ControlPersist={persist}s"
+            ),
+            "ANSIBLE_SSH_CONTROL_PATH_DIR": str(self.directory),
+        }
+
+    def record_sockets(self, hosts: Iterable[str]):
+        """Record the master connections open after a playbook run.
+
+        :param hosts: the hosts of the run
+        """
+        sockets = {
+            control_socket_name(host, self.port, user): host
+            for host in hosts
+            for user in self.users
+        }
+        try:
+            entries = list(self.directory.iterdir())
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if (host := sockets.get(entry.name)) is None:
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            self._sockets.setdefault(host, set()).add((stat.st_ino, stat.st_ctime_ns))
+
+    def handshakes(self) -> dict[str, int]:
+        """Get the number of SSH handshakes seen for each host."""
+        return {host: len(sockets) for host, sockets in self._sockets.items()}
+
+    def log_handshakes(self):
+        """Log the handshake counts of the hosts in the scan log."""
+        handshakes = self.handshakes()
+        if not handshakes:
+            return
+        distribution = Counter(handshakes.values())
+        summary = ", ".join(
+            f"{hosts} hosts with {count}"
+            for count, hosts in sorted(distribution.items())
+        )
+        self.scan_task.log_message(f"SSH HANDSHAKES PER HOST: {summary}.")
+        repeated = {host: count for host, count in handshakes.items() if count > 1}
+        if repeated:
+            self.scan_task.log_message(
+                f"SSH HANDSHAKES OF HOSTS CONNECTED MORE THAN ONCE: {repeated}"
+            )
+
+
+def close_connections(directory: Path):
+    """Close the master connections of a control directory and remove it."""
+    try:
+        sockets = [entry for entry in directory.iterdir() if entry.is_socket()]
+    except FileNotFoundError:
+        return
+    ssh = shutil.which("ssh")
+    for socket_path in sockets if ssh else ():
+        try:
+            # the host name is required but unused when a ControlPath is given
+            subprocess.run(  # noqa: S603
+                [ssh, "-o", f"ControlPath={socket_path}", "-O", "exit", "quipucords"],
+                capture_output=True,
+                timeout=SSH_EXIT_TIMEOUT,
+                check=False,
+            )
+        except (OSError, subprocess.TimeoutExpired) as error:
+            logger.warning("Failed to close SSH connection %s: %s", socket_path, error)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def close_stale_connections(root: Path):
+    """Close the connections of scan jobs that are no longer running."""
+    try:
+        job_directories = [entry for entry in root.iterdir() if entry.is_dir()]
+    except FileNotFoundError:
+        return
+    job_ids = {
+        int(directory.name): directory
+        for directory in job_directories
+        if directory.name.isdigit()
+    }
+    active_ids = set(
+        ScanJob.objects.filter(
+            id__in=job_ids, status__in=ACTIVE_JOB_STATUSES
+        ).values_list("id", flat=True)
+    )
+    for job_id, job_directory in job_ids.items():
+        if job_id in active_ids:
+            continue
+        logger.info("Closing the stale SSH connections of scan job %s", job_id)
+        for directory in job_directory.iterdir():
+            close_connections(directory)
+        shutil.rmtree(job_directory, ignore_errors=True)
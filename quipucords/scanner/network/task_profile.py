@@ -0,0 +1,119 @@
+"""Time spent by network inspection on each host, role and task.
+
+With QUIPUCORDS_NETWORK_TASK_PROFILE, InspectCallback adds up the duration
+ansible-runner reports for each task result, per (host, role, task). After each
+inspect playbook run they are appended to the CSV task profile of the scan job,
+which every shard and network scan task of the job shares. Once a scan task is
+done, the CSV is summarized by role, task and host in the JSON task profile, and
+the slowest roles and hosts of the task are logged. Both files are saved next to
+the ansible logs of the job, so they are included in the reports tarball.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import logging
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+from api.models import ScanTask
+from constants import SCAN_JOB_TASK_PROFILE
+
+PROFILE_FIELDS = ("scan_task", "host", "role", "task", "seconds")
+TOP_N = 10
+
+TaskKey = tuple[str, str, str]
+
+
+def task_profile_path(scan_job_id: int, extension: str) -> Path:
+    """Get the path of the task profile of a scan job."""
+    return settings.LOG_DIRECTORY / SCAN_JOB_TASK_PROFILE.format(
+        scan_job_id=scan_job_id, extension=extension
+    )
+
+
+def append_task_profile(scan_task: ScanTask, durations: dict[TaskKey, float]):
+    """Add the task durations of an inspect playbook run to the CSV profile."""
+    if not durations:
+        return
+    path = task_profile_path(scan_task.job_id, "csv")
+    try:
+        # only the first writer adds the header, even with concurrent shards
+        with path.open("x", newline="") as file_obj:
+            csv.writer(file_obj).writerow(PROFILE_FIELDS)
+    except FileExistsError:
+        pass
+    rows = io.StringIO()
+    writer = csv.writer(rows)
+    for (host, role, task), seconds in durations.items():
+        writer.writerow((scan_task.id, host, role, task, round(seconds, 3)))
+    with path.open("a") as file_obj:
+        # a single write, so rows of concurrent shards don't interleave
+        file_obj.write(rows.getvalue())
+
+
+def _slowest_first(seconds: dict, key_fields: tuple[str, ...], hosts=None):
+    entries = []
+    for key, total in sorted(seconds.items(), key=lambda item: -item[1]):
+        entry = dict(zip(key_fields, key))
+        entry["seconds"] = round(total, 3)
+        if hosts is not None:
+            entry["hosts"] = len(hosts[key])
+        entries.append(entry)
+    return entries
+
+
+def summarize_task_profile(rows) -> dict[str, list[dict]]:
+    """Add up the seconds of the task profile rows by role, task and host.
+
+    Roles and tasks also count the hosts they ran on. Each list is sorted with
+    the slowest first.
+    """
+    role_seconds = defaultdict(float)
+    role_hosts = defaultdict(set)
+    task_seconds = defaultdict(float)
+    task_hosts = defaultdict(set)
+    host_seconds = defaultdict(float)
+    for row in rows:
+        seconds = float(row["seconds"])
+        role = (row["role"],)
+        task = (row["role"], row["task"])
+        role_seconds[role] += seconds
+        role_hosts[role].add(row["host"])
+        task_seconds[task] += seconds
+        task_hosts[task].add(row["host"])
+        host_seconds[(row["host"],)] += seconds
+    return {
+        "roles": _slowest_first(role_seconds, ("role",), role_hosts),
+        "tasks": _slowest_first(task_seconds, ("role", "task"), task_hosts),
+        "hosts": _slowest_first(host_seconds, ("host",)),
+    }
+
+
+def write_task_profile_summary(scan_task: ScanTask):
+    """Write the JSON profile of the scan job and log the slowest of the task."""
+    csv_path = task_profile_path(scan_task.job_id, "csv")
+    if not csv_path.exists():
+        return
+    with csv_path.open(newline="") as file_obj:
+        rows = list(csv.DictReader(file_obj))
+    task_profile_path(scan_task.job_id, "json").write_text(
+        json.dumps(summarize_task_profile(rows))
+    )
+    summary = summarize_task_profile(
+        row for row in rows if row["scan_task"] == str(scan_task.id)
+    )
+    for totals, field in ((summary["roles"], "role"), (summary["hosts"], "host")):
+        if not totals:
+            continue
+        slowest = ", ".join(
+            f"{entry[field] or '(none)'}={entry['seconds']:.1f}s"
+            for entry in totals[:TOP_N]
+        )
+        scan_task.log_message(
+            f"TASK PROFILE slowest {field}s: {slowest}", log_level=logging.INFO
+        )
@@ -55,21 +55,27 @@ def _construct_vars(connection_port, credential: dict = None) -> dict:
     return ansible_vars
 
 
-def construct_inventory(
+def construct_inventory(  # noqa: PLR0913
     hosts: list,
     connection_port,
     concurrency_count: int,
     *,
     credential: dict = None,
+    credentials: list[dict] | None = None,
     exclude_hosts: list | None = None,
+    first_group_index: int = 0,
 ) -> tuple[list[str], dict]:
     """Create a dictionary inventory for Ansible to execute with.
 
     :param hosts: The collection of hosts (or hosts/credential tuples)
     :param credential: The credential used for connections
+    :param credentials: Optional. The credentials tried in order by the
+        connect_credentials playbook, exposed as the connect_credentials var
     :param connection_port: The connection port
     :param concurrency_count: The number of concurrent scans
     :param exclude_hosts: Optional. Hosts to exclude test connections
+    :param first_group_index: Optional. The index of the first group, for the
+        inventories of the groups of hosts built one at a time
     :returns: A dictionary of the ansible inventory
     """
     if exclude_hosts is not None:
@@ -79,10 +85,14 @@ def construct_inventory(
         for i in range(0, len(hosts), concurrency_count)
     ]
     vars_dict = _construct_vars(connection_port, credential)
+    if credentials is not None:
+        vars_dict["connect_credentials"] = [
+            _credential_vars(cred) for cred in credentials
+        ]
     children = {}
     group_names = []
     inventory = {"all": {"children": children, "vars": vars_dict}}
-    for index, group in enumerate(concurreny_groups):
+    for index, group in enumerate(concurreny_groups, start=first_group_index):
         group_name = f"group_{index}"
         group_names.append(group_name)
         children[group_name] = {"hosts": _format_hosts_dict(group)}
@@ -177,6 +187,21 @@ def get_fact_names():
     return list(sorted(collect_all_fact_names()))
 
 
+@cache
+def get_role_fact_names(role: str) -> tuple[str, ...]:
+    """List fact names set by an ansible role."""
+    roles_path = settings.BASE_DIR / "scanner/network/runner/roles"
+    playbook = roles_path / role / "tasks/main.yml"
+    fact_names = {
+        fact_name
+        for task in _yaml_load(playbook)
+        for fact_name in task.get("set_fact", {}).keys()
+    }
+    # set by every role to track progress
+    fact_names.discard("internal_host_started_processing_role")
+    return tuple(sorted(fact_names))
+
+
 def raw_facts_template():
     """Results template for fact collection on network scans."""
     return {fact_name: None for fact_name in get_fact_names()}
@@ -0,0 +1,115 @@
+"""Background writer for network inspect results."""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from collections.abc import Callable
+
+from django.db import connections
+
+from scanner.network.inspect_callback import AnsibleResults
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class InspectResultWriter:
+    """Persist inspect results from a bounded background thread.
+
+    Ansible runner calls the event handler from the same thread that consumes the
+    playbook output, so persisting results there would stall the playbook. Results
+    submitted here are queued and persisted by a dedicated thread instead. The queue
+    is bounded: once `max_pending` results are waiting, `submit` blocks until the
+    writer catches up, which keeps controller memory in check.
+
+    Results already waiting when the writer picks up the next one are persisted
+    together, up to `batch_size` of them, so a writer falling behind catches up
+    with fewer, larger writes.
+    """
+
+    def __init__(
+        self,
+        persist: Callable[..., None],
+        max_pending: int,
+        batch_size: int = 1,
+    ):
+        """Initialize the writer.
+
+        :param persist: callable that persists the host results it is called with
+        :param max_pending: max number of results waiting to be persisted
+        :param batch_size: max number of results persisted by a single call
+        """
+        self._persist = persist
+        self._batch_size = batch_size
+        self._stopping = False
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(
+            target=self._run, name="inspect-result-writer", daemon=True
+        )
+        self.written = 0
+        self.failed = 0
+
+    def __enter__(self):
+        """Start the writer thread."""
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Wait for all pending results to be persisted."""
+        self.close()
+
+    def submit(self, result: AnsibleResults):
+        """Queue a host result to be persisted."""
+        self._queue.put(result)
+
+    def close(self):
+        """Persist everything still pending and stop the writer thread."""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _next_batch(self) -> list[AnsibleResults] | None:
+        """Wait for the next results, returning None once the writer is stopped."""
+        if self._stopping or (result := self._queue.get()) is _STOP:
+            return None
+        batch = [result]
+        while len(batch) < self._batch_size:
+            try:
+                result = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if result is _STOP:
+                # persist this batch, then stop
+                self._stopping = True
+                break
+            batch.append(result)
+        return batch
+
+    def _persist_batch(self, batch: list[AnsibleResults]):
+        try:
+            self._persist(*batch)
+            self.written += len(batch)
+            return
+        except Exception:
+            if len(batch) == 1:
+                self.failed += 1
+                logger.exception(
+                    "[host=%s] Unexpected error persisting inspect results",
+                    batch[0].host,
+                )
+                return
+        # find out which results can't be persisted
+        for result in batch:
+            self._persist_batch([result])
+
+    def _run(self):
+        try:
+            while (batch := self._next_batch()) is not None:
+                self._persist_batch(batch)
+        finally:
+            # database connections are thread local; don't leak this one
+            connections.close_all()
@@ -8,12 +8,13 @@ from django.db import transaction
 
 from api.connresult.model import SystemConnectionResult
 from api.inspectresult.model import InspectGroup
-from api.models import InspectResult, RawFact, ScanTask
+from api.models import InspectResult, ScanTask
 from api.status.misc import get_server_id
 from quipucords.environment import server_version
+from scanner.inspect_results import InspectResultBatch
 from scanner.openshift import metrics
 from scanner.openshift.api import OpenShiftApi
-from scanner.openshift.entities import OCPBaseEntity, OCPCluster, OCPError, OCPNode
+from scanner.openshift.entities import OCPCluster, OCPError, OCPNode
 from scanner.openshift.runner import OpenShiftTaskRunner
 
 
@@ -113,13 +114,15 @@ class InspectTaskRunner(OpenShiftTaskRunner):
         )
         # cluster is considered a "system", hence the +1
         self._init_stats(len(nodes_list) + 1)
-        for node in nodes_list:
-            node.cluster_uuid = cluster.uuid
-            self._save_node(node)
+        with InspectResultBatch(self.scan_task, self._inspect_group) as batch:
+            for node in nodes_list:
+                node.cluster_uuid = cluster.uuid
+                self._save_node(node, batch)
 
         self.log("Retrieving extra cluster facts.")
         extra_cluster_facts = self._extra_cluster_facts(ocp_client, cluster)
-        self._save_cluster(cluster, extra_cluster_facts)
+        with InspectResultBatch(self.scan_task, self._inspect_group) as batch:
+            self._save_cluster(cluster, extra_cluster_facts, batch)
 
         self.log(f"Collected facts for {self.scan_task.systems_scanned} systems.")
         if self.scan_task.systems_failed:
@@ -194,66 +197,14 @@ class InspectTaskRunner(OpenShiftTaskRunner):
             )
         return SystemConnectionResult.UNREACHABLE
 
-    @transaction.atomic
-    def _save_cluster(self, cluster: OCPCluster, cluster_facts):
-        system_result = self._persist_cluster_facts(cluster, cluster_facts)
-        increment_kwargs = self._get_increment_kwargs(system_result.status)
-        self.scan_task.increment_stats(cluster.name, **increment_kwargs)
-
-    @transaction.atomic
-    def _save_node(self, node: OCPNode):
-        system_result = self._persist_facts(node)
-        increment_kwargs = self._get_increment_kwargs(system_result.status)
-        self.scan_task.increment_stats(node.name, **increment_kwargs)
-
-    def _persist_cluster_facts(self, cluster, other_facts):
-        inspection_status = self._infer_inspection_status(cluster)
-        system_result = InspectResult.objects.create(
-            name=cluster.name,
-            status=inspection_status,
-            inspect_group=self._inspect_group,
-        )
-        raw_fact = self._entity_as_raw_fact(cluster, system_result)
-        raw_fact.save()
-        other_raw_facts = self._entities_as_raw_facts(system_result, other_facts)
-        RawFact.objects.bulk_create(
-            other_raw_facts, batch_size=settings.QUIPUCORDS_BULK_CREATE_BATCH_SIZE
-        )
-        return system_result
-
-    def _persist_facts(self, node: OCPNode) -> InspectResult:
-        inspection_status = self._infer_inspection_status(node)
-        sys_result = InspectResult.objects.create(
-            name=node.name,
-            status=inspection_status,
-            inspect_group=self._inspect_group,
-        )
-        raw_fact = self._entity_as_raw_fact(node, sys_result)
-        raw_fact.save()
-        return sys_result
-
-    def _entity_as_raw_fact(
-        self, entity: OCPBaseEntity, inspection_result: InspectResult
-    ) -> RawFact:
-        return RawFact(
-            name=entity.kind,
-            value=entity,
-            inspect_result=inspection_result,
-        )
-
-    def _entities_as_raw_facts(
-        self, inspection_result: InspectResult, entities: dict
-    ) -> list[RawFact]:
-        raw_fact_list = []
-        for collection_name, entity in entities.items():
-            raw_fact = RawFact(
-                name=collection_name,
-                value=entity,
-                inspect_result=inspection_result,
-            )
-            raw_fact_list.append(raw_fact)
+    def _save_cluster(
+        self, cluster: OCPCluster, cluster_facts, batch: InspectResultBatch
+    ):
+        facts = {cluster.kind: cluster, **cluster_facts}
+        batch.add(cluster.name, self._infer_inspection_status(cluster), facts)
 
-        return raw_fact_list
+    def _save_node(self, node: OCPNode, batch: InspectResultBatch):
+        batch.add(node.name, self._infer_inspection_status(node), {node.kind: node})
 
     def _infer_inspection_status(self, entity):
         if entity.errors:
@@ -14,9 +14,10 @@ from urllib3.exceptions import MaxRetryError
 
 from api.connresult.model import SystemConnectionResult
 from api.inspectresult.model import InspectGroup
-from api.models import InspectResult, RawFact, ScanTask
+from api.models import InspectResult, ScanTask
 from api.status.misc import get_server_id
 from quipucords.environment import server_version
+from scanner.inspect_results import InspectResultBatch
 from scanner.rhacs.runner import RHACSTaskRunner
 
 logger = getLogger(__name__)
@@ -174,17 +175,6 @@ class InspectTaskRunner(RHACSTaskRunner):
         :param inspection_status: The status of the inspection
         :param facts_dict: Dictionary of facts to be saved to
         """
-        system = self._persist_facts(inspection_status, facts_dict)
-        increment_kwargs = self._get_increment_kwargs(system.status)
-        self.scan_task.increment_stats(self.system_name, **increment_kwargs)
-
-    def _persist_facts(self, inspection_status, facts_dict: dict) -> InspectResult:
-        """
-        Persist facts to database.
-
-        :param inspection_status: status of the inspection
-        :param facts_dict: dictionary of facts to persist
-        """
         inspect_group = InspectGroup.objects.create(
             source_type=self.scan_task.source.source_type,
             source_name=self.scan_task.source.name,
@@ -193,36 +183,8 @@ class InspectTaskRunner(RHACSTaskRunner):
             source=self.scan_task.source,
         )
         inspect_group.tasks.add(self.scan_task)
-        sys_result = InspectResult.objects.create(
-            name=self.system_name,
-            status=inspection_status,
-            inspect_group=inspect_group,
-        )
-        raw_facts = self._facts_dict_as_raw_facts(sys_result, **facts_dict)
-        RawFact.objects.bulk_create(
-            raw_facts, batch_size=settings.QUIPUCORDS_BULK_CREATE_BATCH_SIZE
-        )
-        return sys_result
-
-    def _facts_dict_as_raw_facts(
-        self, inspection_result: InspectResult, **facts_dict
-    ) -> list[RawFact]:
-        """
-        Convert a dictionary of facts to a list of RawFacts.
-
-        :param inspection_result: The SystemInspectionResult that will be used to
-         determine if facts are valid
-        """
-        raw_facts = []
-        for fact_name, fact_value in facts_dict.items():
-            raw_facts.append(
-                RawFact(
-                    name=fact_name,
-                    value=fact_value,
-                    inspect_result=inspection_result,
-                )
-            )
-        return raw_facts
+        with InspectResultBatch(self.scan_task, inspect_group) as batch:
+            batch.add(self.system_name, inspection_status, facts_dict)
 
     def _get_increment_kwargs(self, inspection_status):
         # TODO FIXME Why sometimes InspectResult vs SystemConnectionResult?
@@ -3,26 +3,38 @@
 import logging
 from abc import ABC, abstractmethod
 from collections.abc import Callable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import cached_property
 
-import celery
-from django.db import transaction
+from django.conf import settings
+from django.db import connections, transaction
+from more_itertools import chunked
 
 from api.inspectresult.model import InspectGroup
 from api.models import (
     InspectResult,
-    RawFact,
     Scan,
     SystemConnectionResult,
 )
 from api.status.misc import get_server_id
 from quipucords.environment import server_version
+from scanner.inspect_results import InspectResultBatch
 from scanner.satellite import utils
 from scanner.satellite.exceptions import SatelliteError
 
 logger = logging.getLogger(__name__)
 
 
+def _request_in_thread(request_host_details: Callable, host_params: dict):
+    """Request the details of a host from a thread of the host details pool."""
+    try:
+        return request_host_details(**host_params)
+    finally:
+        # database connections are thread local; don't leak this one. Requesting
+        # the host details takes much longer than connecting again.
+        connections.close_all()
+
+
 class SatelliteInterface(ABC):
     """Generic interface for dealing with Satellite."""
 
@@ -64,31 +76,34 @@ class SatelliteInterface(ABC):
         inspect_group.tasks.add(self.inspect_scan_task)
         return inspect_group
 
-    @transaction.atomic
-    def record_inspect_result(self, name, facts, status=InspectResult.SUCCESS):
+    def inspect_result_batch(self) -> InspectResultBatch:
+        """Return a batch persisting several inspect results at once."""
+        return InspectResultBatch(self.inspect_scan_task, self._inspect_group)
+
+    def record_inspect_result(
+        self,
+        name,
+        facts,
+        status=InspectResult.SUCCESS,
+        batch: InspectResultBatch | None = None,
+    ):
         """Record a new result.
 
         :param name: The host name
         :param facts: The dictionary of facts
         :param status: The status of the inspection
+        :param batch: The batch to add the result to; when not given, the result
+            is persisted right away
         """
-        sys_result = InspectResult.objects.create(
-            name=name, status=status, inspect_group=self._inspect_group
-        )
-        if status == InspectResult.SUCCESS:
-            for key, val in facts.items():
-                if val is not None:
-                    stored_fact = RawFact(
-                        name=key, value=val, inspect_result=sys_result
-                    )
-                    stored_fact.save()
-
         if status == InspectResult.SUCCESS:
-            self.inspect_scan_task.increment_stats(name, increment_sys_scanned=True)
-        elif status == InspectResult.UNREACHABLE:
-            self.inspect_scan_task.increment_stats(name, increment_sys_unreachable=True)
+            facts = {key: val for key, val in facts.items() if val is not None}
         else:
-            self.inspect_scan_task.increment_stats(name, increment_sys_failed=True)
+            facts = {}
+        if batch is not None:
+            batch.add(name, status, facts)
+            return
+        with self.inspect_result_batch() as new_batch:
+            new_batch.add(name, status, facts)
 
     def _prepare_host_request_options(self):
         if self.inspect_scan_task is None:
@@ -117,55 +132,52 @@ class SatelliteInterface(ABC):
         request_host_details: Callable,
         process_results: Callable,
     ):
-        self._prepare_and_process_hosts_using_celery(
-            hosts, request_host_details, process_results
+        """Request the details of the hosts and process them, a chunk at a time.
+
+        Up to max_concurrency hosts are requested at once, by threads of the current
+        task rather than by one Celery task per host, so the broker isn't flooded
+        and the task never waits for other workers to be available. Hosts are
+        prepared and requested in chunks of QUIPUCORDS_INSPECT_RESULT_BATCH_SIZE,
+        and each chunk is processed and persisted as soon as its details are in,
+        while the next chunk is requested. Only two chunks are held in memory at
+        any time, however many hosts the Satellite server knows.
+
+        :param hosts: iterable of host dicts
+        :param request_host_details: API version-specific function to get host details
+        :param process_results: API version-specific function to process results
+        """
+        self._request_and_process_hosts(
+            self.prepare_hosts(hosts), request_host_details, process_results
         )
 
-    def _prepare_and_process_hosts_using_celery(
+    def _request_and_process_hosts(
         self,
-        hosts: Iterable[dict],
+        prepared_hosts: Iterable[dict],
         request_host_details: Callable,
         process_results: Callable,
     ):
-        """Prepare and process hosts using Celery tasks.
-
-        Calling this function may result in a large number of Celery tasks, 1:1 with the
-        number of hosts known by the Satellite server, and will synchronously block
-        until all those tasks complete. This behavior does not follow Celery best
-        practices and should be revised in the future.
+        """Request the details of prepared hosts, see _prepare_and_process_hosts.
 
-        :param hosts: iterable of host dicts
-        :param request_host_details: API version-specific function to get host details,
-            must also be a registered Celery task
+        :param prepared_hosts: iterable of request_host_details keyword arguments
+        :param request_host_details: API version-specific function to get host details
         :param process_results: API version-specific function to process results
         """
-        all_prepared_hosts = self.prepare_hosts(hosts)
-        # At the time of implementation, we don't know if it's okay to create many
-        # tasks (one per hosts) in a group like this. If this proves problematic, we
-        # should consider replacing `group` with `chunks` and calculate a reasonable
-        # size to limit parallel load. For example:
-        #     chunk_size = ceil(len(all_prepared_hosts) / self.max_concurrency)
-        #     request_host_details.chunks(all_prepared_hosts, chunk_size)().get()
-        #     results = list(itertools.chain.from_iterable(results))
-        # FIXME We SHOULD NOT use disable_sync_subtasks=False.
-        # Calling `get` blocks the current process, and if you do this from within a
-        # running task, Celery normally raises `RuntimeError(E_WOULDBLOCK)` to
-        # discourage that behavior. Although unlikely in *this* case, calling `get`
-        # from inside a task may lead to deadlocks if there are not available Celery
-        # workers; the blocking task may never complete and return its result to the
-        # blocked task's `get` call. Setting `disable_sync_subtasks=False` bypasses
-        # this internal Celery check, allowing the `get` to execute despite the risk.
-        # See this discussion for more details:
-        # https://github.com/quipucords/quipucords/pull/2364#discussion_r1229832809
-        results = (
-            celery.group(
-                request_host_details.s(**host_params)
-                for host_params in all_prepared_hosts
-            )
-            .apply_async()
-            .get(disable_sync_subtasks=False)
-        )
-        process_results(results=results)
+        chunk_size = max(settings.QUIPUCORDS_INSPECT_RESULT_BATCH_SIZE, 1)
+        pending: list[Future] = []
+        with ThreadPoolExecutor(
+            max_workers=max(self.max_concurrency, 1),
+            thread_name_prefix="satellite-host-details",
+        ) as executor:
+            for chunk in chunked(prepared_hosts, chunk_size):
+                requested = [
+                    executor.submit(_request_in_thread, request_host_details, params)
+                    for params in chunk
+                ]
+                if pending:
+                    process_results(results=[future.result() for future in pending])
+                pending = requested
+            if pending:
+                process_results(results=[future.result() for future in pending])
 
     def _prepare_host_logging_options(self):
         return {
@@ -0,0 +1,129 @@
+"""Carry the facts of unchanged Satellite hosts forward from their previous scan.
+
+In incremental mode, only the hosts updated or checked in since the previous
+successful inspection of the same source are requested from Satellite (see
+`updated_since_search`). The other hosts Satellite still manages keep the facts of
+that inspection: they are copied with a CARRIED_FORWARD fact telling which result
+they come from and when they were collected. Hosts without a successful result in
+the previous inspection are requested like changed ones.
+
+A full scan is forced when the last one is older than
+QUIPUCORDS_SATELLITE_FULL_REFRESH_DAYS, so the facts that change without updating
+the host are eventually refreshed.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from more_itertools import chunked
+
+from api.models import InspectGroup, InspectResult, RawFact, ScanTask
+from scanner.inspect_results import InspectResultBatch
+
+CARRIED_FORWARD = "carried_forward"
+# hosts are requested if updated a bit before the previous scan started, in case
+# the clocks of the Satellite server and of quipucords differ
+CLOCK_SKEW_MARGIN = timedelta(hours=1)
+
+
+@dataclass(frozen=True)
+class PreviousScan:
+    """The last successful inspection of a Satellite source."""
+
+    inspect_group_id: int
+    start_time: datetime
+    last_full_scan: datetime
+
+    @property
+    def updated_since(self) -> datetime:
+        """Get the time hosts updated since must be requested again."""
+        return self.start_time - CLOCK_SKEW_MARGIN
+
+    def full_refresh_due(self, now: datetime | None = None) -> bool:
+        """Tell whether the last full scan is too old to carry facts forward."""
+        max_age = timedelta(days=settings.QUIPUCORDS_SATELLITE_FULL_REFRESH_DAYS)
+        return (now or timezone.now()) - self.last_full_scan >= max_age
+
+
+def get_previous_scan(scan_task: ScanTask) -> PreviousScan | None:
+    """Get the last successful inspection of the source of a scan task."""
+    previous_task = (
+        ScanTask.objects.filter(
+            source_id=scan_task.source_id,
+            scan_type=ScanTask.SCAN_TYPE_INSPECT,
+            status=ScanTask.COMPLETED,
+            start_time__isnull=False,
+        )
+        .exclude(id=scan_task.id)
+        .order_by("-start_time")
+        .first()
+    )
+    if previous_task is None:
+        return None
+    inspect_group = InspectGroup.objects.filter(tasks=previous_task).first()
+    if inspect_group is None:
+        return None
+    # the facts carried forward by an incremental scan tell when the last full scan
+    # was; a scan that didn't carry any forward was a full one
+    carried = (
+        RawFact.objects.filter(
+            inspect_result__inspect_group=inspect_group, name=CARRIED_FORWARD
+        )
+        .values_list("value", flat=True)
+        .first()
+    )
+    if carried:
+        last_full_scan = datetime.fromisoformat(carried["last_full_scan"])
+    else:
+        last_full_scan = previous_task.start_time
+    return PreviousScan(inspect_group.id, previous_task.start_time, last_full_scan)
+
+
+def updated_since_search(since: datetime) -> str:
+    """Build the search of the hosts updated or checked in since the given time."""
+    timestamp = since.astimezone(UTC).strftime("%Y-%m-%d %H:%M:%S UTC")
+    return f'last_checkin > "{timestamp}" or updated_at > "{timestamp}"'
+
+
+def get_previous_results(previous: PreviousScan) -> dict[str, int]:
+    """Get the id of each successful result of the previous scan, by host name."""
+    return dict(
+        InspectResult.objects.filter(
+            inspect_group_id=previous.inspect_group_id,
+            status=InspectResult.SUCCESS,
+        ).values_list("name", "id")
+    )
+
+
+def carry_forward(
+    batch: InspectResultBatch, previous: PreviousScan, results: dict[str, int]
+):
+    """Copy the facts of the previous results of hosts, marking them as carried.
+
+    :param batch: the batch the copied results are added to
+    :param previous: the scan the results are from
+    :param results: the id of the previous result of each host, by host name
+    """
+    for chunk in chunked(results.items(), batch.batch_size):
+        names = {inspect_result_id: name for name, inspect_result_id in chunk}
+        facts_by_result = defaultdict(dict)
+        for inspect_result_id, name, value in RawFact.objects.filter(
+            inspect_result_id__in=names
+        ).values_list("inspect_result_id", "name", "value"):
+            facts_by_result[inspect_result_id][name] = value
+        for inspect_result_id, name in names.items():
+            facts = facts_by_result[inspect_result_id]
+            carried = facts.get(CARRIED_FORWARD) or {}
+            facts[CARRIED_FORWARD] = {
+                "inspect_result_id": inspect_result_id,
+                "collected_at": carried.get(
+                    "collected_at", previous.start_time.isoformat()
+                ),
+                "last_full_scan": previous.last_full_scan.isoformat(),
+            }
+            batch.add(name, InspectResult.SUCCESS, facts)
@@ -50,6 +50,8 @@ class SatelliteTaskRunner(ScanTaskRunner, metaclass=ABCMeta):
             self.handle_api_calls(api)
         except self.EXPECTED_EXCEPTIONS as error:
             return self._handle_error(error)
+        finally:
+            utils.close_session(self.scan_task)
 
         return None, ScanTask.COMPLETED
 
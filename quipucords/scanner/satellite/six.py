@@ -4,17 +4,22 @@ from __future__ import annotations
 
 import itertools
 import logging
+import math
 from abc import ABCMeta, abstractmethod
+from collections import defaultdict
 from collections.abc import Generator, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from functools import partial
 
 import celery
 import requests
-from more_itertools import unique_everseen
+from django.conf import settings
+from more_itertools import chunked, unique_everseen
 from requests.exceptions import Timeout
 
 from api.models import InspectResult, ScanTask
-from scanner.satellite import utils
+from scanner.satellite import incremental, utils
 from scanner.satellite.api import SatelliteError, SatelliteInterface
 from scanner.satellite.utils import raw_facts_template
 from scanner.tasks import set_scan_task_failure_on_exception
@@ -26,6 +31,9 @@ APP_JSON = "application/json"
 PER_PAGE = "per_page"
 PAGE = "page"
 THIN = "thin"
+SEARCH = "search"
+TOTAL = "total"
+SUBTOTAL = "subtotal"
 RESULTS = "results"
 ID = "id"
 NAME = "name"
@@ -82,6 +90,7 @@ HOSTS_SUBS_V1_URL = (
 HOSTS_V2_URL = "https://{sat_host}:{port}/api/v2/hosts"
 HOSTS_FIELDS_V2_URL = "https://{sat_host}:{port}/api/v2/hosts/{host_id}"
 HOSTS_SUBS_V2_URL = "https://{sat_host}:{port}/api/v2/hosts/{host_id}/subscriptions"
+FACT_VALUES_V2_URL = "https://{sat_host}:{port}/api/v2/fact_values"
 
 QUERY_PARAMS_FIELDS = {"fields": "full"}
 
@@ -135,6 +144,44 @@ ERRATA_MAPPING = {
     "packages_out_of_date": "total",
 }
 
+# Facts host_fields reads, for the fact values requested in bulk
+BULK_FACTS_SEARCH = " or ".join(
+    (
+        "fact ^ ({})".format(
+            ", ".join(f'"{name}"' for name in FACTS_V2_MAPPING.values())
+        ),
+        f'fact ~ "{NET_INTER_COLON}"',
+    )
+)
+# Max number of list pages requested at once in bulk, each of them a heavy query
+# for the Satellite server
+BULK_MAX_PAGES_IN_FLIGHT = 4
+# Page size of the host list when the details of each host are requested
+HOSTS_PER_PAGE = 100
+
+
+@dataclass
+class BulkApiCalls:
+    """Count the API calls made to collect the host details in bulk."""
+
+    hosts: int = 0
+    pages: int = 0
+    host_details: int = 0
+
+    def summary(self) -> str:
+        """Compare the calls made with those requesting the details of each host."""
+        calls = self.pages + self.host_details
+        message = f"SATELLITE BULK HOSTS {self.hosts} host(s) in {calls} API call(s)"
+        if not self.hosts:
+            return message
+        # a page of the host list, then the fields and subscriptions of each host
+        per_host_calls = math.ceil(self.hosts / HOSTS_PER_PAGE) + 2 * self.hosts
+        return (
+            f"{message}: {1000 * calls / self.hosts:.0f} per 1k hosts instead of"
+            f" {1000 * per_host_calls / self.hosts:.0f} requesting the details of"
+            " each host"
+        )
+
 
 def request_results(  # noqa: PLR0913
     scan_task: ScanTask,
@@ -143,15 +190,19 @@ def request_results(  # noqa: PLR0913
     host_id=None,
     options=None,
     per_page: int = 100,
+    search: str | None = None,
 ) -> Generator[dict, None, None]:
     """
     Request and yield results for the given scan_task and url_template.
 
     This generator yields each result individually from the response and continues to
     execute more requests and yield their results until pagination is exhausted.
+    Only the results matching `search`, when given, are requested.
     """
     for page in itertools.count(1):
         query_params = {PAGE: page, PER_PAGE: per_page, THIN: 1}
+        if search:
+            query_params[SEARCH] = search
         response, url = utils.execute_request(
             scan_task,
             url=url_template,
@@ -173,6 +224,48 @@ def request_results(  # noqa: PLR0913
             break
 
 
+def request_pages(  # noqa: PLR0913
+    scan_task: ScanTask,
+    url_template: str,
+    query_params: dict,
+    options: dict,
+    max_in_flight: int,
+    api_calls: BulkApiCalls,
+) -> Generator[dict, None, None]:
+    """Request and yield the body of each page of a list, several pages at once.
+
+    The first page tells how many pages there are. The others are then requested up
+    to `max_in_flight` at a time, and yielded in order.
+    """
+
+    def request_page(page):
+        response, url = utils.execute_request(
+            scan_task,
+            url=url_template,
+            query_params={**query_params, PAGE: page},
+            options=options,
+        )
+        if response.status_code != requests.codes.ok:
+            raise SatelliteError(
+                f"Invalid response code {response.status_code} for url: {url}"
+            )
+        return response.json()
+
+    first_page = request_page(1)
+    api_calls.pages += 1
+    yield first_page
+    per_page = int(first_page.get(PER_PAGE) or query_params[PER_PAGE])
+    total = int(first_page.get(SUBTOTAL, first_page.get(TOTAL)) or 0)
+    page_count = math.ceil(total / per_page)
+    with ThreadPoolExecutor(
+        max_workers=max_in_flight, thread_name_prefix="satellite-pages"
+    ) as executor:
+        for pages in chunked(range(2, page_count + 1), max_in_flight):
+            for body in executor.map(request_page, pages):
+                api_calls.pages += 1
+                yield body
+
+
 def host_fields(api_version, response):  # noqa: PLR0912, PLR0915, C901
     """Obtain the fields for a given host id.
 
@@ -309,6 +402,8 @@ def request_host_details(  # noqa: PLR0913
     fields_url,
     subs_url,
     request_options,
+    host_fields_json=None,
+    request_subscriptions=True,
 ):
     """Wrap _request_host_details to call it as an async Celery task."""
     return _request_host_details(
@@ -319,6 +414,8 @@ def request_host_details(  # noqa: PLR0913
         fields_url=fields_url,
         subs_url=subs_url,
         request_options=request_options,
+        host_fields_json=host_fields_json,
+        request_subscriptions=request_subscriptions,
     )
 
 
@@ -331,6 +428,8 @@ def _request_host_details(  # noqa: PLR0913
     fields_url,
     subs_url,
     request_options,
+    host_fields_json=None,
+    request_subscriptions=True,
 ):
     """Request detailed data about a specific host from the Satellite server.
 
@@ -342,64 +441,31 @@ def _request_host_details(  # noqa: PLR0913
     :param subs_url: The sat61 or sat62 subs url
     :param request_options: A dictionary containing host, port,
         ssl_cert_verify, user, password and proxy_url
+    :param host_fields_json: The fields of the host when already known, in which
+        case they are not requested
+    :param request_subscriptions: Whether to request the subscriptions of the host
     :returns: A dictionary containing the unique name for the host,
         the response & url for host_fields request, and the
         response & url for the host_subs request.
     """
     scan_task = ScanTask.objects.get(id=scan_task_id)
     unique_name = f"{host_name}_{host_id}"
-    host_fields_json = {}
+    host_fields = {}
     host_subscriptions_json = {}
     results = {}
     try:
         message = f"REQUESTING HOST DETAILS: {unique_name}"
         scan_task.log_message(message, logging.INFO, logging_options)
-        host_fields_response, host_fields_url = utils.execute_request(
-            scan_task,
-            url=fields_url,
-            org_id=None,
-            host_id=host_id,
-            query_params=QUERY_PARAMS_FIELDS,
-            options=request_options,
-        )
-
-        if host_fields_response.status_code != requests.codes.ok:
-            raise SatelliteError(
-                f"Invalid response code {host_fields_response.status_code}"
-                f" for url: {host_fields_url}"
+        if host_fields_json is None:
+            host_fields_json = _request_host_fields(
+                scan_task, fields_url, host_id, request_options
             )
-        host_subscriptions_response, host_subscriptions_url = utils.execute_request(
-            scan_task,
-            url=subs_url,
-            org_id=None,
-            host_id=host_id,
-            options=request_options,
-        )
-
-        if host_subscriptions_response.status_code in (400, 404):
-            content_type = host_subscriptions_response.headers.get(CONTENT_TYPE)
-            if content_type and APP_JSON in content_type:
-                message = (
-                    f"Invalid status code {host_subscriptions_response.status_code}"
-                    f" for url: {host_subscriptions_url}."
-                    f" Response: {host_subscriptions_response.json()}"
-                )
-                scan_task.log_message(message, logging.WARN, logging_options)
-            else:
-                message = (
-                    f"Invalid status code {host_subscriptions_response.status_code}"
-                    f" for url: {host_subscriptions_url}."
-                    " Response not JSON"
-                )
-                scan_task.log_message(message, logging.WARN, logging_options)
-        elif host_subscriptions_response.status_code != requests.codes.ok:
-            raise SatelliteError(
-                f"Invalid response code {host_subscriptions_response.status_code}"
-                f" for url: {host_subscriptions_url}"
+        if request_subscriptions:
+            host_subscriptions_json = _request_host_subscriptions(
+                scan_task, subs_url, host_id, request_options, logging_options
             )
+        host_fields = host_fields_json
         system_inspection_result = InspectResult.SUCCESS
-        host_fields_json = host_fields_response.json()
-        host_subscriptions_json = host_subscriptions_response.json()
     except SatelliteError as sat_error:
         error_message = f"Satellite 6 unknown error encountered: {sat_error}\n"
         logger.error(error_message)
@@ -410,33 +476,85 @@ def _request_host_details(  # noqa: PLR0913
         system_inspection_result = InspectResult.FAILED
     results["unique_name"] = unique_name
     results["system_inspection_result"] = system_inspection_result
-    results["host_fields_response"] = host_fields_json
+    results["host_fields_response"] = host_fields
     results["host_subscriptions_response"] = host_subscriptions_json
     return results
 
 
+def _request_host_fields(scan_task, fields_url, host_id, request_options):
+    host_fields_response, host_fields_url = utils.execute_request(
+        scan_task,
+        url=fields_url,
+        org_id=None,
+        host_id=host_id,
+        query_params=QUERY_PARAMS_FIELDS,
+        options=request_options,
+    )
+
+    if host_fields_response.status_code != requests.codes.ok:
+        raise SatelliteError(
+            f"Invalid response code {host_fields_response.status_code}"
+            f" for url: {host_fields_url}"
+        )
+    return host_fields_response.json()
+
+
+def _request_host_subscriptions(
+    scan_task, subs_url, host_id, request_options, logging_options
+):
+    host_subscriptions_response, host_subscriptions_url = utils.execute_request(
+        scan_task,
+        url=subs_url,
+        org_id=None,
+        host_id=host_id,
+        options=request_options,
+    )
+
+    if host_subscriptions_response.status_code in (400, 404):
+        content_type = host_subscriptions_response.headers.get(CONTENT_TYPE)
+        if content_type and APP_JSON in content_type:
+            message = (
+                f"Invalid status code {host_subscriptions_response.status_code}"
+                f" for url: {host_subscriptions_url}."
+                f" Response: {host_subscriptions_response.json()}"
+            )
+            scan_task.log_message(message, logging.WARN, logging_options)
+        else:
+            message = (
+                f"Invalid status code {host_subscriptions_response.status_code}"
+                f" for url: {host_subscriptions_url}."
+                " Response not JSON"
+            )
+            scan_task.log_message(message, logging.WARN, logging_options)
+    elif host_subscriptions_response.status_code != requests.codes.ok:
+        raise SatelliteError(
+            f"Invalid response code {host_subscriptions_response.status_code}"
+            f" for url: {host_subscriptions_url}"
+        )
+    return host_subscriptions_response.json()
+
+
 def process_results(self, results, api_version):
     """Process & record the responses returned from satellite requests.
 
     :param results: A list of responses returned from the sat endpoint.
     """
-    for raw_result in results:
-        name = raw_result["unique_name"]
-        system_inspection_result = raw_result["system_inspection_result"]
-        host_fields_response = raw_result["host_fields_response"]
-        host_subscriptions_response = raw_result["host_subscriptions_response"]
-        details = {}
-        if system_inspection_result == InspectResult.SUCCESS:
-            details.update(host_fields(api_version, host_fields_response))
-            details.update(host_subscriptions(host_subscriptions_response))
-            logger.debug("name=%s, host_details=%s", name, details)
-        else:
-            subs_dict = {ENTITLEMENTS: []}
-            details.update(subs_dict)
-        result = {"name": name, "details": details, "status": system_inspection_result}
-        if result is not None:
+    with self.inspect_result_batch() as batch:
+        for raw_result in results:
+            name = raw_result["unique_name"]
+            system_inspection_result = raw_result["system_inspection_result"]
+            host_fields_response = raw_result["host_fields_response"]
+            host_subscriptions_response = raw_result["host_subscriptions_response"]
+            details = {}
+            if system_inspection_result == InspectResult.SUCCESS:
+                details.update(host_fields(api_version, host_fields_response))
+                details.update(host_subscriptions(host_subscriptions_response))
+                logger.debug("name=%s, host_details=%s", name, details)
+            else:
+                subs_dict = {ENTITLEMENTS: []}
+                details.update(subs_dict)
             self.record_inspect_result(
-                result.get("name"), result.get("details"), result.get("status")
+                name, details, system_inspection_result, batch=batch
             )
 
 
@@ -451,23 +569,25 @@ class SatelliteSix(SatelliteInterface, metaclass=ABCMeta):
     def prepare_hosts(self, hosts: Iterable[dict]) -> Iterable[dict]:
         """Prepare each host with necessary information.
 
+        Hosts are prepared lazily, as they are consumed.
+
         :param hosts: an iterable of dicts that each contain information about one host
-        :return: A list of dicts that contain information about each host.
+        :return: An iterable of dicts that contain information about each host.
         """
-        host_params = [
+        logging_options = self._prepare_host_logging_options()
+        request_options = self._prepare_host_request_options()
+        return (
             {
                 "scan_task_id": self.inspect_scan_task.id,
-                "logging_options": self._prepare_host_logging_options(),
+                "logging_options": logging_options,
                 "host_id": host.get(ID),
                 "host_name": host.get(NAME),
                 "fields_url": self.HOSTS_FIELDS_URL,
                 "subs_url": self.HOSTS_SUBS_URL,
-                "request_options": self._prepare_host_request_options(),
+                "request_options": request_options,
             }
             for host in hosts
-        ]
-
-        return host_params
+        )
 
     def _request_and_record_hosts(self, credential, org_id=None):
         """Request and record hosts for the given credential and optional org filter."""
@@ -609,3 +729,165 @@ class SatelliteSixV2(SatelliteSix):
     def _requests_hosts_unique(self):
         """Get an iterable of all unique hosts."""
         return unique_everseen(request_results(self.inspect_scan_task, self.HOSTS_URL))
+
+    def hosts_facts(self):
+        """Obtain the managed hosts detail raw facts.
+
+        With QUIPUCORDS_SATELLITE_INCREMENTAL_SCAN, only the details of the hosts
+        updated since the previous scan of the source are requested, see
+        `_incremental_hosts_facts`; full scans then still follow the settings below.
+
+        With QUIPUCORDS_SATELLITE_BULK_HOSTS, the fields of the hosts come from
+        full pages of the host list and their facts from pages of fact values,
+        instead of two requests per host. The fields of a host are only requested
+        when the pages miss some, and its subscriptions only when it is registered
+        with subscription-manager.
+        """
+        if settings.QUIPUCORDS_SATELLITE_INCREMENTAL_SCAN:
+            previous = self._get_previous_scan_to_update()
+            if previous is not None:
+                return self._incremental_hosts_facts(previous)
+        if not settings.QUIPUCORDS_SATELLITE_BULK_HOSTS:
+            return super().hosts_facts()
+        api_calls = BulkApiCalls()
+        request_options = self._prepare_host_request_options()
+        per_page = max(settings.QUIPUCORDS_SATELLITE_BULK_PER_PAGE, 1)
+        max_in_flight = max(min(self.max_concurrency, BULK_MAX_PAGES_IN_FLIGHT), 1)
+        facts_by_host = defaultdict(dict)
+        for body in request_pages(
+            self.inspect_scan_task,
+            FACT_VALUES_V2_URL,
+            {SEARCH: BULK_FACTS_SEARCH, PER_PAGE: per_page},
+            request_options,
+            max_in_flight,
+            api_calls,
+        ):
+            # the facts of a host may span several pages
+            for host_name, facts in (body.get(RESULTS) or {}).items():
+                facts_by_host[host_name].update(facts)
+        host_pages = request_pages(
+            self.inspect_scan_task,
+            self.HOSTS_URL,
+            {THIN: 0, PER_PAGE: per_page},
+            request_options,
+            max_in_flight,
+            api_calls,
+        )
+        self._request_and_process_hosts(
+            self._prepare_bulk_hosts(
+                host_pages, facts_by_host, request_options, api_calls
+            ),
+            request_host_details,
+            partial(process_results, self=self, api_version=self.SATELLITE_API_VERSION),
+        )
+        self.inspect_scan_task.log_message(api_calls.summary(), log_level=logging.INFO)
+        utils.validate_task_stats(self.inspect_scan_task)
+
+    def _get_previous_scan_to_update(self) -> incremental.PreviousScan | None:
+        """Get the previous scan an incremental scan can update, if any."""
+        previous = incremental.get_previous_scan(self.inspect_scan_task)
+        if previous is None:
+            message = "no previous successful scan of the source"
+        elif previous.full_refresh_due():
+            message = (
+                f"last full scan on {previous.last_full_scan.isoformat()} is older"
+                f" than {settings.QUIPUCORDS_SATELLITE_FULL_REFRESH_DAYS} day(s)"
+            )
+        else:
+            return previous
+        self.inspect_scan_task.log_message(
+            f"SATELLITE INCREMENTAL SCAN skipped, {message}: requesting all hosts",
+            log_level=logging.INFO,
+        )
+        return None
+
+    def _incremental_hosts_facts(self, previous: incremental.PreviousScan):
+        """Request the hosts updated since the previous scan, carry the others.
+
+        Hosts updated or checked in since the previous scan, and those without a
+        successful result in it, are requested one by one as in a full scan. The
+        previous facts of the other hosts still listed are carried forward.
+        """
+        previous_results = incremental.get_previous_results(previous)
+        updated_ids = {
+            host.get(ID)
+            for host in request_results(
+                self.inspect_scan_task,
+                self.HOSTS_URL,
+                search=incremental.updated_since_search(previous.updated_since),
+            )
+        }
+        hosts = []
+        carried = {}
+        seen = set()
+        for host in request_results(self.inspect_scan_task, self.HOSTS_URL):
+            host_id, host_name = host.get(ID), host.get(NAME)
+            if host_id is None or host_name is None or host_id in seen:
+                continue
+            seen.add(host_id)
+            unique_name = f"{host_name}_{host_id}"
+            if host_id in updated_ids or unique_name not in previous_results:
+                hosts.append(host)
+            else:
+                carried[unique_name] = previous_results[unique_name]
+        self._prepare_and_process_hosts(
+            hosts,
+            request_host_details,
+            partial(process_results, self=self, api_version=self.SATELLITE_API_VERSION),
+        )
+        with self.inspect_result_batch() as batch:
+            incremental.carry_forward(batch, previous, carried)
+        self.inspect_scan_task.log_message(
+            f"SATELLITE INCREMENTAL SCAN requested {len(hosts)} host(s) updated"
+            f" since {previous.updated_since.isoformat()}, carried {len(carried)}"
+            " forward",
+            log_level=logging.INFO,
+        )
+        utils.validate_task_stats(self.inspect_scan_task)
+
+    def _prepare_bulk_hosts(
+        self,
+        host_pages: Iterable[dict],
+        facts_by_host: dict[str, dict],
+        request_options: dict,
+        api_calls: BulkApiCalls,
+    ) -> Generator[dict, None, None]:
+        """Prepare each host of the host list pages with the fields they have."""
+        logging_options = self._prepare_host_logging_options()
+        seen = set()
+        for body in host_pages:
+            for host in body.get(RESULTS, []):
+                host_id, host_name = host.get(ID), host.get(NAME)
+                if host_id is None or host_name is None or host_id in seen:
+                    continue
+                seen.add(host_id)
+                facts = facts_by_host.pop(host_name, None)
+                fields = None
+                if not _missing_host_fields(host, facts):
+                    fields = {**host, FACTS: facts}
+                request_subscriptions = bool(host.get(SUBSCRIPTION_FACET))
+                api_calls.hosts += 1
+                api_calls.host_details += (fields is None) + request_subscriptions
+                yield {
+                    "scan_task_id": self.inspect_scan_task.id,
+                    "logging_options": logging_options,
+                    "host_id": host_id,
+                    "host_name": host_name,
+                    "fields_url": self.HOSTS_FIELDS_URL,
+                    "subs_url": self.HOSTS_SUBS_URL,
+                    "request_options": request_options,
+                    "host_fields_json": fields,
+                    "request_subscriptions": request_subscriptions,
+                }
+
+
+def _missing_host_fields(host: dict, facts: dict | None) -> bool:
+    """Tell whether the host list and fact values miss fields of a host.
+
+    Hosts without fact values miss them, and so may hypervisors: the host list
+    includes their virtual guests only for some Satellite versions.
+    """
+    if not facts:
+        return True
+    is_guest = str(facts.get(FACTS_V2_MAPPING["is_virtualized"])).lower() == "true"
+    return not is_guest and VIRTUAL_GUESTS not in (host.get(SUBSCRIPTION_FACET) or {})
@@ -1,11 +1,15 @@
 """Utilities used for Satellite operations."""
 
+import hashlib
 import logging
+import threading
 
 import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
 from rest_framework import status as codes
 
+from api.models import Scan
 from api.vault import decrypt_data_as_unicode
 from scanner.satellite.exceptions import SatelliteAuthError, SatelliteError
 from scanner.utils import format_host_for_url
@@ -17,6 +21,12 @@ requests.packages.urllib3.disable_warnings()
 
 SATELLITE_VERSION_6 = "6"
 
+# Sessions of this worker process, keyed by session_key. Each keeps a pool of
+# connections to a Satellite server, reused by every request of the scan task
+# instead of paying a new TCP and TLS handshake per request.
+_sessions: dict[tuple, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
 
 def get_credential(scan_task):
     """Extract the credential from the scan task.
@@ -63,6 +73,62 @@ def construct_url(url, sat_host, port="443", org_id=None, host_id=None):
     )
 
 
+def session_key(  # noqa: PLR0913
+    host, port, user, password, ssl_verify, proxy_url
+) -> tuple:
+    """Identify the session of requests made with the given connection data."""
+    # only a digest of the password is kept around in memory
+    password_digest = hashlib.sha256(str(password).encode()).hexdigest()
+    return (host, str(port), user, password_digest, ssl_verify, proxy_url)
+
+
+def get_session(key: tuple) -> requests.Session:
+    """Get the session of the given key, creating it the first time."""
+    with _sessions_lock:
+        if (session := _sessions.get(key)) is None:
+            session = requests.Session()
+            # enough connections for every host details request in flight
+            adapter = HTTPAdapter(pool_maxsize=Scan.UPPER_MAX_CONCURRENCY)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[key] = session
+    return session
+
+
+def connection_stats(session: requests.Session) -> tuple[int, int]:
+    """Count the connections opened and the requests served by a session."""
+    connections = requests_served = 0
+    for adapter in set(session.adapters.values()):
+        for manager in (adapter.poolmanager, *adapter.proxy_manager.values()):
+            for pool_key in manager.pools.keys():
+                pool = manager.pools[pool_key]
+                connections += pool.num_connections
+                requests_served += pool.num_requests
+    return connections, requests_served
+
+
+def close_session(scan_task):
+    """Close the session of the scan task, logging how many connections it used."""
+    if not _sessions:
+        return
+    ssl_verify = scan_task.source.ssl_cert_verify
+    if ssl_verify is None:
+        ssl_verify = True
+    host, port, user, password, proxy_url = get_connect_data(scan_task)
+    key = session_key(host, port, user, password, ssl_verify, proxy_url)
+    with _sessions_lock:
+        session = _sessions.pop(key, None)
+    if session is None:
+        return
+    connections, requests_served = connection_stats(session)
+    session.close()
+    scan_task.log_message(
+        f"SATELLITE CONNECTIONS opened {connections} connection(s)"
+        f" for {requests_served} request(s)",
+        log_level=logging.INFO,
+    )
+
+
 def execute_request(  # noqa: PLR0913
     scan_task, url, org_id=None, host_id=None, query_params=None, options=None
 ):
@@ -100,7 +166,10 @@ def execute_request(  # noqa: PLR0913
         protocol = "https" if str(url).startswith("https") else "http"
         proxies = {protocol: proxy_url}
 
-    response = requests.get(
+    session = get_session(
+        session_key(host, port, user, password, ssl_verify, proxy_url)
+    )
+    response = session.get(
         url,
         auth=(user, password),
         timeout=(connect_timeout, inspect_timeout),
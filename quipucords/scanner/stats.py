@@ -0,0 +1,95 @@
+"""Count scan task stats in memory, writing them to the database periodically."""
+
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from api.models import ScanTask
+
+logger = logging.getLogger(__name__)
+
+STATS = ("sys_count", "sys_scanned", "sys_failed", "sys_unreachable")
+
+
+class ScanTaskStatsCounter:
+    """Accumulate scan task stats and add them to the scan task in one update.
+
+    ScanTask.increment_stats costs an update, a refresh and a log line for every
+    system. Counts added here are only written, with ScanTask.add_stats, once
+    `flush_count` systems were counted or the oldest unwritten count is
+    `flush_interval` seconds old, so the scan job API still shows progress while
+    the scan runs. Call `flush` (or leave the counter context) when the task ends.
+
+    add_stats adds to the stats instead of overwriting them, so several processes
+    (e.g. the shards of a task) can count stats of the same task at once.
+    """
+
+    def __init__(
+        self,
+        scan_task: ScanTask,
+        flush_count: int | None = None,
+        flush_interval: float | None = None,
+    ):
+        """Initialize the counter.
+
+        :param scan_task: the scan task whose stats are counted
+        :param flush_count: number of counted systems triggering a flush, defaults
+            to QUIPUCORDS_SCAN_TASK_STATS_FLUSH_COUNT
+        :param flush_interval: age in seconds of the oldest unwritten count
+            triggering a flush, defaults to QUIPUCORDS_SCAN_TASK_STATS_FLUSH_INTERVAL
+        """
+        self.scan_task = scan_task
+        if flush_count is None:
+            flush_count = settings.QUIPUCORDS_SCAN_TASK_STATS_FLUSH_COUNT
+        if flush_interval is None:
+            flush_interval = settings.QUIPUCORDS_SCAN_TASK_STATS_FLUSH_INTERVAL
+        self.flush_count = flush_count
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._pending_systems = 0
+        self._pending_since = None
+
+    def __enter__(self):
+        """Start counting."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Write the stats still pending."""
+        self.flush()
+
+    def increment(self, name: str, **stats: int):
+        """Count the stats of a system, writing them once a threshold is reached.
+
+        :param name: the system name, for logging
+        :param stats: the amounts to add, named like the add_stats arguments
+        """
+        if unknown := set(stats) - set(STATS):
+            raise TypeError(f"Unknown scan task stats: {sorted(unknown)}")
+        logger.debug("Counting stats of %s for %s: %s", name, self.scan_task, stats)
+        with self._lock:
+            self._pending.update(stats)
+            self._pending_systems += 1
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            if (
+                self._pending_systems >= self.flush_count
+                or time.monotonic() - self._pending_since >= self.flush_interval
+            ):
+                self._flush()
+
+    def flush(self):
+        """Write the pending stats to the scan task."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending_systems:
+            return
+        pending, systems = self._pending, self._pending_systems
+        self._pending, self._pending_systems = Counter(), 0
+        self._pending_since = None
+        self.scan_task.add_stats(f"COUNTED {systems} systems.", **pending)
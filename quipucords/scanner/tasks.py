@@ -13,7 +13,8 @@ from api.scantask.model import ScanTask
 from fingerprinter.runner import FingerprintTaskRunner
 from quipucords.celery import app as celery_app
 from scanner.get_scanner import get_scanner
-from scanner.job import create_report_for_scan_job, run_task_runner
+from scanner.job import create_report_for_scan_job, run_task_runner, save_task_status
+from scanner.network.inspect import InspectTaskRunner, Shard
 from scanner.runner import ScanTaskRunner
 
 logger = logging.getLogger(__name__)
@@ -183,6 +184,130 @@ def _celery_run_task_runner(
     return success, scan_task_id, task_status
 
 
+@celery.shared_task(bind=True)
+@set_scan_task_failure_on_exception
+def start_network_shards(
+    self: celery.Task, *, scan_task_id: int
+) -> tuple[bool, int, str]:
+    """Wrap _start_network_shards to call it as an async Celery task."""
+    return _start_network_shards(task_instance=self, scan_task_id=scan_task_id)
+
+
+def _start_network_shards(
+    *, task_instance: celery.Task, scan_task_id: int
+) -> tuple[bool, int, str]:
+    """Start a network ScanTask whose hosts are split into shards.
+
+    :returns: tuple containing success bool, scan task id, and scan task status
+    """
+    scan_task = ScanTask.objects.get(id=scan_task_id)
+    scan_job_id = scan_task.job_id
+    if scan_job_is_canceled(task_instance, scan_job_id):
+        logger.info(
+            f"Scan Job {scan_job_id} canceled, skipping scan task {scan_task_id}."
+        )
+        # Do not start the shards.
+        task_instance.request.chain = None
+        return False, scan_task_id, ScanTask.CANCELED
+
+    scan_task.status_start()
+    InspectTaskRunner(scan_task.job, scan_task).start_shards()
+    return True, scan_task_id, scan_task.status
+
+
+@celery.shared_task(bind=True)
+def celery_run_network_shard(
+    self: celery.Task, *, scan_task_id: int, shard_index: int, shard_count: int
+) -> tuple[bool, int, str]:
+    """Wrap _celery_run_network_shard to call it as an async Celery task.
+
+    Unexpected exceptions only fail this shard. They must not fail the ScanTask,
+    which other shards are still working on, nor break the chord that waits for
+    every shard.
+    """
+    try:
+        return _celery_run_network_shard(
+            task_instance=self,
+            scan_task_id=scan_task_id,
+            shard=Shard(shard_index, shard_count),
+        )
+    except Exception as e:  # noqa: BLE001
+        logger.exception(
+            f"Unexpected exception in celery_run_network_shard "
+            f"with scan_task_id={scan_task_id} shard={shard_index}: {e}"
+        )
+        return False, scan_task_id, ScanTask.FAILED
+
+
+def _celery_run_network_shard(
+    *, task_instance: celery.Task, scan_task_id: int, shard: Shard
+) -> tuple[bool, int, str]:
+    """Connect to and inspect the hosts of a single shard.
+
+    :returns: tuple containing success bool, scan task id, and shard status
+    """
+    scan_task = ScanTask.objects.get(id=scan_task_id)
+    scan_job_id = scan_task.job_id
+    if scan_task.status == ScanTask.CANCELED or scan_job_is_canceled(
+        task_instance, scan_job_id
+    ):
+        logger.info(
+            f"Scan Job {scan_job_id} canceled, skipping shard {shard.index}"
+            f" of scan task {scan_task_id}."
+        )
+        return False, scan_task_id, ScanTask.CANCELED
+
+    scan_task.log_message(f"START SHARD {shard.index + 1:d} of {shard.count:d}")
+    runner = InspectTaskRunner(scan_task.job, scan_task, shard=shard)
+    status_message, task_status = runner.run()
+    scan_task.log_message(
+        f"SHARD {shard.index + 1:d} of {shard.count:d} finished with status"
+        f" {task_status}: {status_message}"
+    )
+    return task_status == ScanTask.COMPLETED, scan_task_id, task_status
+
+
+@celery.shared_task(bind=True)
+@set_scan_task_failure_on_exception
+def finish_network_shards(
+    self: celery.Task, shard_results: list[tuple[bool, int, str]], *, scan_task_id: int
+) -> tuple[bool, int, str]:
+    """Wrap _finish_network_shards to call it as an async Celery task."""
+    return _finish_network_shards(
+        task_instance=self, shard_results=shard_results, scan_task_id=scan_task_id
+    )
+
+
+def _finish_network_shards(
+    *,
+    task_instance: celery.Task,
+    shard_results: list[tuple[bool, int, str]],
+    scan_task_id: int,
+) -> tuple[bool, int, str]:
+    """Set the status of a sharded network ScanTask once every shard is done.
+
+    :returns: tuple containing success bool, scan task id, and scan task status
+    """
+    scan_task = ScanTask.objects.get(id=scan_task_id)
+    scan_job_id = scan_task.job_id
+    if scan_task.status == ScanTask.CANCELED or scan_job_is_canceled(
+        task_instance, scan_job_id
+    ):
+        logger.info(
+            f"Scan Job {scan_job_id} canceled, skipping finish of"
+            f" scan task {scan_task_id}."
+        )
+        scan_task.status_cancel()
+        return False, scan_task_id, ScanTask.CANCELED
+
+    runner = InspectTaskRunner(scan_task.job, scan_task)
+    status_message, task_status = runner.finish_shards(
+        [shard_status for _, _, shard_status in shard_results]
+    )
+    task_status = save_task_status(scan_task, status_message, task_status)
+    return task_status == ScanTask.COMPLETED, scan_task_id, task_status
+
+
 @celery.shared_task(bind=True)
 @set_scan_task_failure_on_exception
 def fingerprint(self: celery.Task, *, scan_task_id: int) -> tuple[bool, int, str]:
@@ -5,13 +5,13 @@ from datetime import UTC, datetime
 from functools import cached_property
 from socket import gaierror
 
-from django.db import transaction
 from pyVmomi import vim, vmodl
 
 from api.inspectresult.model import InspectGroup
-from api.models import InspectResult, RawFact, ScanTask, SystemConnectionResult
+from api.models import InspectResult, ScanTask, SystemConnectionResult
 from api.status.misc import get_server_id
 from quipucords.environment import server_version
+from scanner.inspect_results import InspectResultBatch
 from scanner.network.utils import is_valid_ipv4_address, is_valid_ipv6_address
 from scanner.runner import ScanTaskRunner
 from scanner.vcenter.utils import (
@@ -259,12 +259,13 @@ class InspectTaskRunner(ScanTaskRunner):
         inspect_group.tasks.add(self.scan_task)
         return inspect_group
 
-    @transaction.atomic
-    def parse_vm_props(self, props, host_dict):  # noqa: PLR0912, C901
+    def parse_vm_props(self, props, host_dict, batch=None):  # noqa: PLR0912, C901
         """Parse (and store) Virtual Machine properties.
 
         :param props: Array of Dynamic Properties
         :param host_dict: Dictionary of host properties
+        :param batch: InspectResultBatch to add the VM to; when not given, the VM
+            is persisted right away
         """
         now = datetime.now(UTC).strftime("%Y-%m-%d %H:%M:%S")
 
@@ -317,18 +318,12 @@ class InspectTaskRunner(ScanTaskRunner):
 
         logger.debug("system %s facts=%s", vm_name, facts)
 
-        sys_result = InspectResult.objects.create(
-            name=vm_name,
-            status=InspectResult.SUCCESS,
-            inspect_group=self._inspect_group,
-        )
-
-        for key, val in facts.items():
-            if val is not None:
-                stored_fact = RawFact(name=key, value=val, inspect_result=sys_result)
-                stored_fact.save()
-
-        self.scan_task.increment_stats(vm_name, increment_sys_scanned=True)
+        facts = {key: val for key, val in facts.items() if val is not None}
+        if batch is not None:
+            batch.add(vm_name, InspectResult.SUCCESS, facts)
+            return
+        with InspectResultBatch(self.scan_task, self._inspect_group) as new_batch:
+            new_batch.add(vm_name, InspectResult.SUCCESS, facts)
 
     def retrieve_properties(self, content):  # noqa: C901
         """Retrieve properties from all VirtualMachines.
@@ -375,11 +370,12 @@ class InspectTaskRunner(ScanTaskRunner):
                 props = object_content.propSet
                 host_dict[str(obj)] = self.parse_host_props(props, cluster_dict)
 
-        for object_content in objects:
-            obj = object_content.obj
-            if isinstance(obj, vim.VirtualMachine):
-                props = object_content.propSet
-                self.parse_vm_props(props, host_dict)
+        with InspectResultBatch(self.scan_task, self._inspect_group) as batch:
+            for object_content in objects:
+                obj = object_content.obj
+                if isinstance(obj, vim.VirtualMachine):
+                    props = object_content.propSet
+                    self.parse_vm_props(props, host_dict, batch=batch)
 
     def _init_stats(self):
         """Initialize the scan_task stats."""
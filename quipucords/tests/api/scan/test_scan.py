@@ -306,6 +306,42 @@ class TestScanCreate:
             }
         }
 
+    def test_create_with_fact_profile(self, client_logged_in):
+        """Test creating a scan with a fact profile."""
+        source = SourceFactory()
+        payload = {
+            "name": "test",
+            "sources": [source.id],
+            "options": {"fact_profile": Scan.FACT_PROFILE_RHEL_ONLY},
+        }
+        response = client_logged_in.post(reverse("v1:scan-list"), data=payload)
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.json()["options"] == {
+            "fact_profile": Scan.FACT_PROFILE_RHEL_ONLY,
+            "max_concurrency": Scan.DEFAULT_MAX_CONCURRENCY,
+        }
+        scan = Scan.objects.get(id=response.json()["id"])
+        assert scan.fact_profile == Scan.FACT_PROFILE_RHEL_ONLY
+
+    def test_create_invalid_fact_profile(self, client_logged_in, faker):
+        """Test fact profiles must be one of the known ones."""
+        source = SourceFactory()
+        payload = {
+            "name": faker.bothify("Scan ????-######"),
+            "sources": [source.id],
+            "options": {"fact_profile": "everything"},
+        }
+        response = client_logged_in.post(reverse("v1:scan-list"), data=payload)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json() == {
+            "options": {
+                "fact_profile": [
+                    "everything is not a valid fact profile. Valid profiles:"
+                    " ['full', 'rhel-only', 'middleware']"
+                ]
+            }
+        }
+
 
 @pytest.mark.django_db
 class TestScanRetrieve:
@@ -459,6 +495,19 @@ class TestScanUpdate:
             "sources": [s.id for s in scan.sources.all()],
         }
 
+    def test_partial_update_fact_profile(self, client_logged_in):
+        """Test partial update of the fact profile of a scan."""
+        scan = ScanFactory()
+        url = reverse("v1:scan-detail", args=(scan.id,))
+        payload = {"options": {"fact_profile": Scan.FACT_PROFILE_MIDDLEWARE}}
+        response = client_logged_in.patch(url, data=payload)
+        assert response.ok, response.json()
+        assert response.json()["options"]["fact_profile"] == (
+            Scan.FACT_PROFILE_MIDDLEWARE
+        )
+        scan.refresh_from_db()
+        assert scan.fact_profile == Scan.FACT_PROFILE_MIDDLEWARE
+
     def test_partial_update_name(self, client_logged_in):
         """Test partial update on sources."""
         scan = ScanFactory()
@@ -4,7 +4,7 @@ import pytest
 from django.core.exceptions import ValidationError
 
 from api import messages
-from api.models import Credential, Source
+from api.models import Credential, CredentialAffinity, Source
 from api.source.serializer import SourceSerializer, SourceSerializerV2
 from constants import DataSources
 
@@ -767,3 +767,32 @@ def test_ssl_cert_verify_true_is_preserved_on_update(
     instance = serializer.save()
 
     assert instance.ssl_cert_verify is True
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "updated_data,forgotten",
+    (
+        ({"hosts": ["1.2.3.5"]}, False),
+        ({"port": 2222}, True),
+        ({"use_paramiko": True}, True),
+    ),
+)
+def test_source_update_forgets_credential_affinities(
+    network_cred_id, updated_data, forgotten
+):
+    """Test credential affinities are dropped when the connection settings change."""
+    source = Source.objects.create(
+        name="network_source",
+        source_type=DataSources.NETWORK,
+        port=22,
+        hosts=["1.2.3.4"],
+    )
+    source.credentials.add(network_cred_id)
+    CredentialAffinity.objects.create(
+        source=source, name="1.2.3.4", credential_id=network_cred_id
+    )
+    serializer = SourceSerializerV2(data=updated_data, instance=source, partial=True)
+    assert serializer.is_valid(), serializer.errors
+    serializer.save()
+    assert source.credential_affinities.exists() is not forgotten
@@ -11,17 +11,30 @@ from django.test import override_settings
 
 from api.aggregate_report.model import AggregateReport
 from api.deployments_report.model import SystemFingerprint
-from api.models import DeploymentsReport, Report, ServerInformation, Source
+from api.models import (
+    DeploymentsReport,
+    Product,
+    Report,
+    Scan,
+    ServerInformation,
+    Source,
+)
 from api.scantask.model import ScanTask
 from constants import DataSources
 from fingerprinter import formatters
-from fingerprinter.constants import ENTITLEMENTS_KEY, META_DATA_KEY, PRODUCTS_KEY
+from fingerprinter.constants import (
+    ENTITLEMENTS_KEY,
+    FACT_PROFILE,
+    META_DATA_KEY,
+    PRODUCTS_KEY,
+)
 from fingerprinter.runner import (
     FINGERPRINT_GLOBAL_ID_KEY,
     NETWORK_SATELLITE_MERGE_KEYS,
     NETWORK_VCENTER_MERGE_KEYS,
     FingerprintTaskRunner,
 )
+from scanner.network.fact_profiles import FACT_PROFILES
 from scanner.network.utils import raw_facts_template as network_template
 from scanner.satellite.utils import raw_facts_template as satellite_template
 from scanner.vcenter.utils import raw_facts_template as vcenter_template
@@ -710,6 +723,129 @@ def test_process_network_system_purpose(server_id, fingerprint_task_runner):
     _validate_network_result(fingerprint, fact)
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "fact_profile, redhat_metadata, presence",
+    (
+        (None, None, Product.ABSENT),
+        (Scan.FACT_PROFILE_RHEL_ONLY, None, Product.UNKNOWN),
+        (Scan.FACT_PROFILE_MIDDLEWARE, Scan.FACT_PROFILE_MIDDLEWARE, Product.ABSENT),
+    ),
+)
+def test_process_network_fact_profile(
+    server_id, fingerprint_task_runner, fact_profile, redhat_metadata, presence
+):
+    """Test facts left out by a fact profile are told apart from failed ones."""
+    facts = {"uname_hostname": "host1"}
+    if fact_profile is not None:
+        facts[FACT_PROFILE] = FACT_PROFILES[fact_profile].as_fact()
+    source = {
+        "server_id": server_id,
+        "source_name": "source1",
+        "source_type": DataSources.NETWORK,
+    }
+    fingerprint = fingerprint_task_runner._process_network_fact(source, facts)
+    metadata = fingerprint[META_DATA_KEY]
+    assert fingerprint["is_redhat"] is None
+    assert metadata["is_redhat"].get(FACT_PROFILE) == redhat_metadata
+    # missing facts not left out by the profile are not marked
+    assert FACT_PROFILE not in metadata["cpu_count"]
+    assert FACT_PROFILE not in metadata["name"]
+    assert [product["presence"] for product in fingerprint[PRODUCTS_KEY]] == [
+        presence
+    ] * 3
+
+
+def _product(presence, fact_profile=None):
+    """Return a JBoss EAP product, marked as left out by the fact profile."""
+    product = {"name": "JBoss EAP", "presence": presence, META_DATA_KEY: {}}
+    if fact_profile:
+        product[META_DATA_KEY][FACT_PROFILE] = fact_profile
+    return product
+
+
+RHEL_ONLY_UNKNOWN = _product(Product.UNKNOWN, Scan.FACT_PROFILE_RHEL_ONLY)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "priority_product, to_merge_product, expected_product",
+    (
+        (RHEL_ONLY_UNKNOWN, _product(Product.PRESENT), _product(Product.PRESENT)),
+        (RHEL_ONLY_UNKNOWN, _product(Product.ABSENT), _product(Product.ABSENT)),
+        (RHEL_ONLY_UNKNOWN, _product(Product.UNKNOWN), _product(Product.UNKNOWN)),
+        (RHEL_ONLY_UNKNOWN, RHEL_ONLY_UNKNOWN, RHEL_ONLY_UNKNOWN),
+        (_product(Product.ABSENT), RHEL_ONLY_UNKNOWN, _product(Product.ABSENT)),
+        (_product(Product.PRESENT), RHEL_ONLY_UNKNOWN, _product(Product.PRESENT)),
+    ),
+)
+def test_merge_fingerprint_skipped_by_fact_profile(
+    server_id,
+    fingerprint_task_runner,
+    priority_product,
+    to_merge_product,
+    expected_product,
+):
+    """Test products left out by a fact profile take the other detection."""
+    priority = _create_network_fingerprint(server_id, fingerprint_task_runner)
+    to_merge = _create_network_fingerprint(server_id, fingerprint_task_runner)
+    priority[PRODUCTS_KEY] = [deepcopy(priority_product)]
+    to_merge[PRODUCTS_KEY] = [deepcopy(to_merge_product)]
+
+    merged = fingerprint_task_runner._merge_fingerprint(priority, to_merge)
+    assert merged[PRODUCTS_KEY] == [expected_product]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "priority_presence, to_merge_presence, expected_presence",
+    (
+        (Product.UNKNOWN, Product.PRESENT, Product.UNKNOWN),
+        (Product.UNKNOWN, Product.ABSENT, Product.UNKNOWN),
+        (Product.ABSENT, Product.UNKNOWN, Product.UNKNOWN),
+        (Product.ABSENT, Product.POTENTIAL, Product.POTENTIAL),
+        (Product.ABSENT, Product.ABSENT, Product.ABSENT),
+        (Product.POTENTIAL, Product.PRESENT, Product.POTENTIAL),
+    ),
+)
+def test_dedup_product_presence_without_fact_profile(
+    server_id,
+    fingerprint_task_runner,
+    priority_presence,
+    to_merge_presence,
+    expected_presence,
+):
+    """Test the dedup of network, satellite and vcenter products keeps its rules."""
+    nfingerprints = [
+        _create_network_fingerprint(
+            server_id, fingerprint_task_runner, dmi_system_uuid="match"
+        )
+    ]
+    sfingerprints = [
+        _create_satellite_fingerprint(server_id, fingerprint_task_runner, uuid="match")
+    ]
+    vfingerprints = [
+        _create_vcenter_fingerprint(server_id, fingerprint_task_runner, vm_uuid="match")
+    ]
+    # the network fingerprint has the priority over the others
+    nfingerprints[0][PRODUCTS_KEY] = [_product(priority_presence)]
+    sfingerprints[0][PRODUCTS_KEY] = [_product(to_merge_presence)]
+    vfingerprints[0][PRODUCTS_KEY] = [_product(to_merge_presence)]
+
+    _, network_satellite = (
+        fingerprint_task_runner._merge_fingerprints_from_source_types(
+            NETWORK_SATELLITE_MERGE_KEYS, nfingerprints, sfingerprints
+        )
+    )
+    _, result_fingerprints = (
+        fingerprint_task_runner._merge_fingerprints_from_source_types(
+            NETWORK_VCENTER_MERGE_KEYS, deepcopy(nfingerprints), vfingerprints
+        )
+    )
+    for result_fingerprint in (*network_satellite, *result_fingerprints):
+        assert result_fingerprint[PRODUCTS_KEY] == [_product(expected_presence)]
+
+
 @pytest.mark.django_db
 def test_process_vcenter_source_with_dns(server_id, fingerprint_task_runner):
     """Test process vcenter source that has a dns name."""
@@ -346,7 +346,7 @@ def patched_scan_data(mocker, target_ip, raw_facts):
     mocker.patch.object(InspectCallback, "ansible_facts", raw_facts_per_ip)
     # Finally, given we are generating "raw facts" already post processed, we need to
     # turn off the real post processor.
-    mocker.patch("scanner.network.inspect.process", side_effect=_patched_process)
+    mocker.patch("scanner.network.post_process.process", side_effect=_patched_process)
 
 
 @pytest.mark.integration
@@ -211,6 +211,54 @@ def test_run_celery_based_job_runner_inspect_one_job_multiple_sources(
     mock__finalize_scan.assert_called_once()
 
 
+@pytest.mark.django_db(transaction=True)
+def test_run_celery_based_job_runner_sharded_network_source(  # noqa: PLR0913
+    mocker,
+    mock__fingerprint,
+    mock__finalize_scan,
+    celery_worker,
+    inspect_scan_job,
+    settings,
+):
+    """Test a network Source is split into shards joined before fingerprint."""
+    settings.QUIPUCORDS_NETWORK_SCAN_SHARDS = 3
+    settings.QUIPUCORDS_NETWORK_SCAN_SHARD_MIN_HOSTS = 2
+    scan_task = inspect_scan_job.tasks.get(scan_type=ScanTask.SCAN_TYPE_INSPECT)
+    source = scan_task.source
+    source.source_type = DataSources.NETWORK
+    source.hosts = ["10.0.0.[1:10]"]
+    source.save()
+
+    mock_shard = mocker.patch.object(
+        tasks,
+        "_celery_run_network_shard",
+        side_effect=lambda scan_task_id, **kwargs: (
+            True,
+            scan_task_id,
+            ScanTask.COMPLETED,
+        ),
+    )
+    mock_finish = mocker.patch.object(
+        tasks.InspectTaskRunner,
+        "finish_shards",
+        return_value=(None, ScanTask.COMPLETED),
+    )
+
+    job_runner = job.ScanJobRunner(inspect_scan_job)
+    async_result = job_runner.run()
+    async_result.get()
+
+    shards = {call.kwargs["shard"] for call in mock_shard.call_args_list}
+    assert shards == {tasks.Shard(index, 3) for index in range(3)}
+    mock_finish.assert_called_once_with([ScanTask.COMPLETED] * 3)
+    mock__fingerprint.assert_called_once()
+    mock__finalize_scan.assert_called_once()
+    scan_task.refresh_from_db()
+    assert scan_task.status == ScanTask.COMPLETED
+    assert scan_task.systems_count == 10
+    assert scan_task.inspect_groups.count() == 1
+
+
 @pytest.mark.django_db
 @pytest.mark.dbcompat
 def test_fingerprint_job_greenpath(fingerprint_only_scanjob):
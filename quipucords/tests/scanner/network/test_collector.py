@@ -0,0 +1,103 @@
+"""Test the collector role gathers the same facts as the roles it replaces."""
+
+import os
+import sys
+from pathlib import Path
+from unittest.mock import Mock
+
+import ansible_runner
+import pytest
+import yaml
+from django.conf import settings
+
+from api.models import ScanTask
+from scanner.network import inspect
+from scanner.network.inspect import InspectTaskRunner
+from scanner.network.inspect_callback import InspectCallback
+from scanner.network.processing.process import is_ansible_task_result
+from tests.scanner.test_util import create_scan_job
+
+ROLES_PATH = settings.BASE_DIR / "scanner/network/runner/roles"
+COLLECTED_ROLES = [
+    "etc_release",
+    "installed_products",
+    "uname",
+    "insights",
+    "system_purpose",
+    "redhat_release",
+    "memory",
+    "hostnamectl",
+]
+
+
+def run_roles(tmp_path, roles, extravars):
+    """Run the given roles on localhost and return the facts they set."""
+    playbook = tmp_path / f"{'-'.join(roles)}.yml"
+    playbook.write_text(
+        yaml.safe_dump([{"hosts": "all", "gather_facts": False, "roles": roles}])
+    )
+    callback = InspectCallback()
+    runner_obj = ansible_runner.run(
+        private_data_dir=str(tmp_path),
+        inventory={"all": {"hosts": {"localhost": {"ansible_connection": "local"}}}},
+        event_handler=callback.event_callback,
+        playbook=str(playbook),
+        extravars=extravars,
+        envvars={
+            "ANSIBLE_ROLES_PATH": str(ROLES_PATH),
+            # the shell of the hosts we usually scan
+            "ANSIBLE_EXECUTABLE": "/bin/bash",
+        },
+        quiet=True,
+    )
+    assert runner_obj.status == "successful"
+    facts = callback.ansible_facts["localhost"]
+    facts.pop("internal_host_started_processing_role")
+    # processing only looks at the rc and stdout of the registered results
+    return {
+        name: {key: value.get(key) for key in ("rc", "stdout", "stdout_lines")}
+        if is_ansible_task_result(value)
+        else value
+        for name, value in facts.items()
+    }
+
+
+@pytest.fixture
+def ansible_path(monkeypatch):
+    """Make sure the ansible commands of this python environment are found."""
+    bin_dir = Path(sys.executable).parent
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+@pytest.mark.parametrize("have_rpm", (False, True))
+def test_collector_matches_roles(tmp_path, ansible_path, have_rpm):
+    """Test the collector role sets the facts of the roles it replaces."""
+    extravars = {
+        "internal_have_rpm_user": have_rpm,
+        "internal_have_rct_user": have_rpm,
+        "user_has_sudo": False,
+    }
+    roles_facts = run_roles(tmp_path, COLLECTED_ROLES, extravars)
+    collector_facts = run_roles(tmp_path, ["collector"], extravars)
+    assert collector_facts == roles_facts
+    assert collector_facts["uname_hostname"] == os.uname().nodename
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("enabled", (False, True))
+def test_collect_user_roles_setting(network_source, settings, mocker, enabled):
+    """Test QUIPUCORDS_NETWORK_COLLECT_USER_ROLES turns the collector role on."""
+    settings.QUIPUCORDS_NETWORK_COLLECT_USER_ROLES = enabled
+    mocker.patch.object(inspect, "write_to_yaml", side_effect=lambda inv: inv)
+    mocker.patch.object(InspectTaskRunner, "_persist_ansible_logs")
+    run = mocker.patch.object(
+        inspect.ansible_runner, "run", return_value=Mock(status="successful")
+    )
+    scan_job, scan_task = create_scan_job(network_source)
+    runner = InspectTaskRunner(scan_job, scan_task)
+    connected = [("1.2.3.4", {"username": "user"})]
+    assert runner._inspect_scan(connected) == (None, ScanTask.COMPLETED)
+    extravars = run.call_args.kwargs["extravars"]
+    assert extravars.get("collect_user_roles", False) is enabled
@@ -0,0 +1,176 @@
+"""Test the adaptive concurrency of network inspect."""
+
+from unittest.mock import Mock
+
+import pytest
+
+from api.models import ScanTask
+from scanner.network import concurrency, inspect
+from scanner.network.concurrency import AdaptiveConcurrency, ControllerLoad
+from scanner.network.inspect import InspectTaskRunner
+from tests.scanner.network.test_network_single_pass import SyncWriter
+from tests.scanner.test_util import create_scan_job
+
+IDLE = ControllerLoad(load_per_cpu=0.1, available_memory=0.8)
+
+
+@pytest.fixture
+def adaptive_settings(settings):
+    """Set the adaptive concurrency settings the tests expect."""
+    settings.QUIPUCORDS_NETWORK_ADAPTIVE_CONCURRENCY_BASELINE = 2
+    settings.QUIPUCORDS_NETWORK_ADAPTIVE_MAX_LOAD = 1.0
+    settings.QUIPUCORDS_NETWORK_ADAPTIVE_MIN_AVAILABLE_MEMORY = 0.1
+    return settings
+
+
+def adaptive_concurrency(ceiling=10, load=IDLE):
+    """Create an AdaptiveConcurrency reading the given controller load."""
+    return AdaptiveConcurrency(Mock(), ceiling=ceiling, read_load=lambda: load)
+
+
+def test_ramp_up_to_ceiling(adaptive_settings):
+    """Test the size doubles from the baseline up to the ceiling."""
+    adaptive = adaptive_concurrency(ceiling=10)
+    sizes = [adaptive.size]
+    for _ in range(4):
+        adaptive.record_run(adaptive.size, failed=0, seconds=10)
+        sizes.append(adaptive.size)
+    assert sizes == [2, 4, 8, 10, 10]
+    message = adaptive.scan_task.log_message.call_args_list[0].args[0]
+    assert message.startswith("ADAPTIVE CONCURRENCY 2 -> 4 (healthy)")
+
+
+def test_baseline_above_ceiling(adaptive_settings):
+    """Test the ceiling applies to the baseline too."""
+    assert adaptive_concurrency(ceiling=1).size == 1
+
+
+@pytest.mark.parametrize(
+    "load",
+    (
+        ControllerLoad(load_per_cpu=1.5, available_memory=0.8),
+        ControllerLoad(load_per_cpu=0.1, available_memory=0.05),
+    ),
+)
+def test_controller_overloaded(adaptive_settings, load):
+    """Test the size is halved when the controller is overloaded."""
+    adaptive = adaptive_concurrency(load=load)
+    adaptive.size = 8
+    adaptive.record_run(8, failed=0, seconds=10)
+    assert adaptive.size == 4
+    adaptive.record_run(4, failed=0, seconds=10)
+    adaptive.record_run(2, failed=0, seconds=10)
+    adaptive.record_run(1, failed=0, seconds=10)
+    assert adaptive.size == 1
+    message = adaptive.scan_task.log_message.call_args.args[0]
+    assert "(controller overloaded)" in message
+
+
+def test_high_error_rate(adaptive_settings):
+    """Test errors only shrink runs larger than the smallest one."""
+    adaptive = adaptive_concurrency()
+    adaptive.record_run(2, failed=2, seconds=10)
+    # the smallest run failed too, so the hosts are to blame
+    assert adaptive.size == 4
+    adaptive.record_run(4, failed=3, seconds=10)
+    assert adaptive.size == 2
+    assert "(high error rate)" in adaptive.scan_task.log_message.call_args.args[0]
+
+
+def test_high_latency(adaptive_settings):
+    """Test the size is halved when a run is much slower than the recent ones."""
+    adaptive = adaptive_concurrency()
+    adaptive.record_run(2, failed=0, seconds=10)
+    adaptive.record_run(4, failed=0, seconds=19)
+    assert adaptive.size == 8
+    adaptive.record_run(8, failed=0, seconds=30)
+    assert adaptive.size == 4
+    message = adaptive.scan_task.log_message.call_args.args[0]
+    assert "(high latency)" in message
+    assert "baseline_run=14.5s" in message
+
+
+def test_latency_baseline_ignores_failed_runs(adaptive_settings):
+    """Test runs where every host failed don't set the latency baseline."""
+    adaptive = adaptive_concurrency(ceiling=16)
+    # every host unreachable: a fast run that did no real work
+    adaptive.record_run(2, failed=2, seconds=1)
+    assert adaptive.size == 4
+    adaptive.record_run(4, failed=0, seconds=20)
+    adaptive.record_run(8, failed=1, seconds=22)
+    adaptive.record_run(16, failed=0, seconds=25)
+    assert adaptive.size == 16
+    messages = [call.args[0] for call in adaptive.scan_task.log_message.call_args_list]
+    assert not any("(high latency)" in message for message in messages)
+
+
+def test_latency_baseline_ages(adaptive_settings):
+    """Test the baseline follows the recent runs rather than the fastest ever."""
+    adaptive = adaptive_concurrency(ceiling=2)
+    adaptive.record_run(2, failed=0, seconds=5)
+    for _ in range(concurrency.LATENCY_WINDOW):
+        adaptive.record_run(2, failed=0, seconds=9)
+    adaptive.record_run(2, failed=0, seconds=12)
+    assert "(healthy)" in adaptive.scan_task.log_message.call_args.args[0]
+
+
+def test_available_memory(tmp_path, monkeypatch):
+    """Test the available memory is read from /proc/meminfo."""
+    meminfo = tmp_path / "meminfo"
+    meminfo.write_text(
+        "MemTotal:        1000 kB\nMemFree:          100 kB\nMemAvailable:     250 kB\n"
+    )
+    monkeypatch.setattr(concurrency, "MEMINFO", meminfo)
+    assert concurrency._available_memory() == 0.25
+    monkeypatch.setattr(concurrency, "MEMINFO", tmp_path / "missing")
+    assert concurrency._available_memory() is None
+
+
+@pytest.mark.django_db
+def test_inspect_with_adaptive_concurrency(network_source, adaptive_settings, mocker):
+    """Test each inspect run takes the next adaptive size of hosts."""
+    adaptive_settings.QUIPUCORDS_NETWORK_ADAPTIVE_CONCURRENCY = True
+    adaptive_settings.QUIPUCORDS_NETWORK_INSPECT_SCHEDULING = "group"
+    mocker.patch.object(concurrency, "read_controller_load", return_value=IDLE)
+    mocker.patch.object(inspect, "InspectResultWriter", SyncWriter)
+    mocker.patch.object(inspect, "write_to_yaml", side_effect=lambda inv: inv)
+    mocker.patch(
+        "scanner.network.post_process.process",
+        side_effect=lambda **kw: kw["fact_value"],
+    )
+    mocker.patch.object(InspectTaskRunner, "_persist_ansible_logs")
+
+    runs = []
+
+    def run(*, inventory, extravars, cmdline, event_handler, **kwargs):
+        children = inventory["all"]["children"]
+        groups = extravars["variable_host"].split(":")
+        hosts = [host for group in groups for host in children[group]["hosts"]]
+        runs.append((hosts, cmdline.split()[-1]))
+        for host in hosts:
+            facts = {"connection_host": host, "host_done": True}
+            event_handler(
+                {
+                    "event": "runner_on_ok",
+                    "event_data": {"host": host, "res": {"ansible_facts": facts}},
+                }
+            )
+        return Mock(status="successful")
+
+    mocker.patch.object(inspect.ansible_runner, "run", side_effect=run)
+    scan_job, scan_task = create_scan_job(
+        network_source, scan_options={"max_concurrency": 4}
+    )
+    connected = [(f"10.0.0.{i}", {"username": "user"}) for i in range(11)]
+    runner = InspectTaskRunner(scan_job, scan_task)
+    assert runner._inspect_scan(connected) == (None, ScanTask.COMPLETED)
+    assert [len(hosts) for hosts, _ in runs] == [2, 4, 4, 1]
+    assert [forks for _, forks in runs] == [
+        "--forks=2",
+        "--forks=4",
+        "--forks=4",
+        "--forks=1",
+    ]
+    assert [host for hosts, _ in runs for host in hosts] == [
+        host for host, _ in connected
+    ]
@@ -0,0 +1,95 @@
+"""Test the fact profiles of network scans."""
+
+from unittest.mock import Mock
+
+import pytest
+from django.conf import settings
+
+from api.models import InspectResult, Scan, ScanTask
+from fingerprinter.constants import FACT_PROFILE
+from scanner.network import inspect
+from scanner.network.fact_profiles import FACT_PROFILES, SKIPPED_ROLES
+from scanner.network.inspect import InspectTaskRunner
+from scanner.network.utils import _yaml_load
+from tests.scanner.network.test_network_single_pass import SyncWriter
+from tests.scanner.test_util import create_scan_job
+
+HOST = "10.0.0.1"
+
+
+def test_skipped_roles_are_optional_in_inspect_yml():
+    """Test inspect.yml skips the roles a fact profile leaves out."""
+    inspect_yml = settings.BASE_DIR / "scanner/network/runner/inspect.yml"
+    roles = {
+        role["role"]: role.get("when")
+        for role in _yaml_load(inspect_yml)[0]["roles"]
+        if isinstance(role, dict)
+    }
+    for profile in FACT_PROFILES.values():
+        for role in profile.skipped_roles:
+            conditions = roles[role] if isinstance(roles[role], list) else [roles[role]]
+            assert f"'{role}' not in {SKIPPED_ROLES} | default([])" in conditions
+
+
+def test_skipped_fact_names():
+    """Test the facts of a profile are the ones of its skipped roles."""
+    rhel_only = FACT_PROFILES[Scan.FACT_PROFILE_RHEL_ONLY].skipped_fact_names()
+    assert "jboss_eap_running_paths" in rhel_only
+    assert "redhat_packages_gpg_is_redhat" not in rhel_only
+    assert FACT_PROFILES[Scan.FACT_PROFILE_FULL].skipped_fact_names() == []
+
+
+@pytest.fixture
+def ansible_run(mocker):
+    """Fake the inspect playbook, returning the mocked ansible_runner.run."""
+    mocker.patch.object(inspect, "InspectResultWriter", SyncWriter)
+    mocker.patch.object(inspect, "write_to_yaml", side_effect=lambda inv: inv)
+    mocker.patch(
+        "scanner.network.post_process.process",
+        side_effect=lambda **kw: kw["fact_value"],
+    )
+    mocker.patch.object(InspectTaskRunner, "_persist_ansible_logs")
+
+    def run(*, event_handler, **kwargs):
+        facts = {"connection_host": HOST, "host_done": True}
+        event_handler(
+            {
+                "event": "runner_on_ok",
+                "event_data": {"host": HOST, "res": {"ansible_facts": facts}},
+            }
+        )
+        return Mock(status="successful")
+
+    return mocker.patch.object(inspect.ansible_runner, "run", side_effect=run)
+
+
+def inspect_host(source, fact_profile):
+    """Inspect HOST with the given fact profile, returning its facts."""
+    scan_job, scan_task = create_scan_job(
+        source, scan_options={Scan.FACT_PROFILE: fact_profile}
+    )
+    runner = InspectTaskRunner(scan_job, scan_task)
+    assert runner._inspect_scan([(HOST, {"username": "user"})]) == (
+        None,
+        ScanTask.COMPLETED,
+    )
+    result = InspectResult.objects.get(inspect_group__tasks=scan_task)
+    return {fact.name: fact.value for fact in result.facts.all()}
+
+
+@pytest.mark.django_db
+def test_inspect_with_fact_profile(network_source, ansible_run):
+    """Test the skipped roles are passed to inspect.yml and recorded per host."""
+    facts = inspect_host(network_source, Scan.FACT_PROFILE_RHEL_ONLY)
+    profile = FACT_PROFILES[Scan.FACT_PROFILE_RHEL_ONLY]
+    extravars = ansible_run.call_args.kwargs["extravars"]
+    assert extravars[SKIPPED_ROLES] == list(profile.skipped_roles)
+    assert facts[FACT_PROFILE] == profile.as_fact()
+
+
+@pytest.mark.django_db
+def test_inspect_with_full_fact_profile(network_source, ansible_run):
+    """Test nothing is skipped nor recorded with the full fact profile."""
+    facts = inspect_host(network_source, Scan.FACT_PROFILE_FULL)
+    assert SKIPPED_ROLES not in ansible_run.call_args.kwargs["extravars"]
+    assert FACT_PROFILE not in facts
@@ -0,0 +1,168 @@
+"""Test skipping the hosts connected to under another address."""
+
+from unittest.mock import Mock
+
+import pytest
+
+from api.models import InspectResult, ScanTask, SystemConnectionResult
+from scanner.network import inspect
+from scanner.network.connect_callback import ConnectResultCallback
+from scanner.network.host_identity import (
+    HOST_ALIASES,
+    dedupe_connected,
+    parse_host_identity,
+)
+from scanner.network.inspect import InspectTaskRunner
+from tests.scanner.network.test_network_single_pass import SyncWriter
+from tests.scanner.test_util import create_scan_job
+
+IDENTITY_LINES = ["Hello", "machine_id=abc", "boot_id=123"]
+
+
+@pytest.mark.parametrize(
+    "stdout_lines,expected",
+    (
+        (IDENTITY_LINES, ("abc", "123")),
+        ([" machine_id = abc ", "boot_id=123\r"], ("abc", "123")),
+        (["Hello"], None),
+        (["Hello", "machine_id=abc", "boot_id="], None),
+        (["Hello", "machine_id=", "boot_id=123"], None),
+    ),
+)
+def test_parse_host_identity(stdout_lines, expected):
+    """Test the identity is only parsed when both ids were printed."""
+    assert parse_host_identity(stdout_lines) == expected
+
+
+def test_dedupe_connected():
+    """Test the first host of each identity is kept, the others are its aliases."""
+    connected = [
+        ("host1", "cred"),
+        ("10.0.0.1", "cred"),
+        ("10.0.0.2", "cred"),
+        ("no-identity", "cred"),
+        ("fe80::1", "cred"),
+    ]
+    identities = {
+        "host1": ("abc", "1"),
+        "10.0.0.1": ("abc", "1"),
+        # cloned machine-id, booted separately
+        "10.0.0.2": ("abc", "2"),
+        "fe80::1": ("abc", "1"),
+    }
+    selected, aliases = dedupe_connected(connected, identities)
+    assert selected == [
+        ("host1", "cred"),
+        ("10.0.0.2", "cred"),
+        ("no-identity", "cred"),
+    ]
+    assert aliases == {"host1": ["10.0.0.1", "fe80::1"]}
+
+
+def test_connect_callback_records_identity():
+    """Test the identity printed by a connected host is recorded with it."""
+    result_store = Mock()
+    callback = ConnectResultCallback(result_store, Mock(), Mock())
+    task_result = {"rc": 0, "stdout_lines": IDENTITY_LINES}
+    callback.task_on_ok({}, "1.2.3.4", task_result)
+    result_store.record_result.assert_called_once_with(
+        "1.2.3.4",
+        callback.source,
+        callback.credential,
+        SystemConnectionResult.SUCCESS,
+        identity=("abc", "123"),
+    )
+
+
+def test_connect_callback_without_identity():
+    """Test no identity is recorded when the host did not print it."""
+    result_store = Mock()
+    callback = ConnectResultCallback(result_store, Mock(), Mock())
+    callback.task_on_ok({}, "1.2.3.4", {"rc": 0, "stdout_lines": ["Hello"]})
+    assert result_store.record_result.call_args.kwargs == {"identity": None}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "host_done,status,stat",
+    (
+        (True, InspectResult.SUCCESS, "systems_scanned"),
+        (False, InspectResult.FAILED, "systems_failed"),
+    ),
+)
+def test_inspect_skips_aliases(network_source, mocker, host_done, status, stat):
+    """Test aliases are not inspected and share the result of the inspected host."""
+    mocker.patch.object(inspect, "InspectResultWriter", SyncWriter)
+    mocker.patch.object(inspect, "write_to_yaml", side_effect=lambda inv: inv)
+    mocker.patch(
+        "scanner.network.post_process.process",
+        side_effect=lambda **kw: kw["fact_value"],
+    )
+    mocker.patch.object(InspectTaskRunner, "_persist_ansible_logs")
+
+    def run(*, inventory, event_handler, **kwargs):
+        for group in inventory["all"]["children"].values():
+            for host in group["hosts"]:
+                facts = {
+                    "connection_host": host,
+                    "host_done": host_done if host == "127.0.0.1" else True,
+                }
+                event_handler(
+                    {
+                        "event": "runner_on_ok",
+                        "event_data": {"host": host, "res": {"ansible_facts": facts}},
+                    }
+                )
+        return Mock(status="successful")
+
+    ansible_run = mocker.patch.object(inspect.ansible_runner, "run", side_effect=run)
+    scan_job, scan_task = create_scan_job(network_source)
+    # the identities are read back from the connection results, like after the
+    # connect step of another run (e.g. a resumed one)
+    credential = network_source.credentials.first()
+    for host, identity in (
+        ("127.0.0.1", ["abc", "1"]),
+        ("10.0.0.1", ["abc", "1"]),
+        ("10.0.0.2", ["def", "1"]),
+    ):
+        SystemConnectionResult.objects.create(
+            name=host,
+            source=network_source,
+            credential=credential,
+            status=SystemConnectionResult.SUCCESS,
+            task_connection_result=scan_task.connection_result,
+            identity=identity,
+        )
+    runner = InspectTaskRunner(scan_job, scan_task)
+    assert runner.inspect()[1] == ScanTask.COMPLETED
+
+    inventory = ansible_run.call_args.kwargs["inventory"]
+    inspected = {
+        host
+        for group in inventory["all"]["children"].values()
+        for host in group["hosts"]
+    }
+    assert inspected == {"127.0.0.1", "10.0.0.2"}
+    results = {
+        result.name: (
+            result.status,
+            {fact.name: fact.value for fact in result.facts.all()},
+        )
+        for result in InspectResult.objects.filter(inspect_group__tasks=scan_task)
+    }
+    # the alias is not reported unreachable
+    assert sorted(results) == ["10.0.0.2", "127.0.0.1"]
+    assert results["127.0.0.1"][0] == status
+    assert results["127.0.0.1"][1][HOST_ALIASES] == ["10.0.0.1"]
+    assert HOST_ALIASES not in results["10.0.0.2"][1]
+    scan_task.refresh_from_db()
+    assert scan_task.systems_count == 3  # noqa: PLR2004
+    stats = {
+        "systems_scanned": scan_task.systems_scanned,
+        "systems_failed": scan_task.systems_failed,
+    }
+    # the alias shares the status of the inspected host
+    assert stats == {
+        "systems_scanned": 1 + (stat == "systems_scanned") * 2,
+        "systems_failed": (stat == "systems_failed") * 2,
+    }
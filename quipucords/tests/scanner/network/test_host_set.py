@@ -0,0 +1,127 @@
+"""Test the scanner.network.host_set module."""
+
+import pytest
+
+from scanner.network.host_set import HostSet
+from scanner.network.utils import expand_hostpattern
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    (
+        "1.2.3.4",
+        "1.2.3.4:22",
+        "domain.com",
+        "domain.com:1234",
+        "[a:c].domain.com",
+        "host[01:03].domain.com",
+        "1.2.3.[4:6]",
+        "10.0.[1:2].[250:255]",
+        "10.0.0.[01:03]",
+        "192.168.1.0/30",
+        "192.168.1.0/24",
+        "192.168.1.7/31",
+        "192.168.1.7/32",
+        "fd00::/126",
+        "fd00::/127",
+        "fd00::[a:c]",
+        "2001:DB8:0:0::1",
+    ),
+)
+def test_same_hosts_as_expand_hostpattern(pattern):
+    """Test a HostSet holds the hosts expand_hostpattern returns."""
+    expected = expand_hostpattern(pattern)
+    host_set = HostSet([pattern])
+    assert len(host_set) == len(expected)
+    assert sorted(host_set) == sorted(expected)
+
+
+def test_order():
+    """Test IPv4 addresses come first, then IPv6 addresses, then names."""
+    host_set = HostSet(
+        ["host-b", "fd00::2", "10.0.0.10", "host-a", "fd00::1", "10.0.0.9", "host-b"]
+    )
+    assert list(host_set) == [
+        "10.0.0.9",
+        "10.0.0.10",
+        "fd00::1",
+        "fd00::2",
+        "host-b",
+        "host-a",
+    ]
+
+
+def test_overlapping_patterns():
+    """Test hosts described by several patterns are only listed once."""
+    host_set = HostSet(["10.0.0.0/30", "10.0.0.[2:5]", "10.0.0.4"])
+    assert len(host_set) == 5
+    assert list(host_set) == [f"10.0.0.{i}" for i in range(1, 6)]
+
+
+def test_exclude_hosts():
+    """Test excluded patterns are subtracted, whatever their kind.
+
+    Like expand_hostpattern, CIDRs only cover the hosts of the network, so
+    excluding 10.0.1.0/30 leaves 10.0.1.3.
+    """
+    host_set = HostSet(
+        ["10.0.0.[1:10]", "10.0.1.0/29", "host[1:3]", "fd00::/126"],
+        ["10.0.0.[3:4]", "10.0.0.10", "10.0.1.0/30", "host2", "fd00::2", "9.9.9.9"],
+    )
+    assert list(host_set) == [
+        "10.0.0.1",
+        "10.0.0.2",
+        "10.0.0.5",
+        "10.0.0.6",
+        "10.0.0.7",
+        "10.0.0.8",
+        "10.0.0.9",
+        "10.0.1.3",
+        "10.0.1.4",
+        "10.0.1.5",
+        "10.0.1.6",
+        "fd00::1",
+        "fd00::3",
+        "host1",
+        "host3",
+    ]
+    assert len(host_set) == 15
+
+
+def test_listed_addresses_keep_their_spelling():
+    """Test addresses listed on their own keep the spelling they were listed with.
+
+    The results and credentials of the previous scans are recorded under that
+    name; the addresses of CIDRs and ranges are in their canonical form.
+    """
+    host_set = HostSet(
+        ["2001:DB8:0:0::1", "2001:db8::/126", "FD00::[a:b]", "fd00::A"],
+        ["2001:DB8::2"],
+    )
+    assert list(host_set) == ["2001:DB8:0:0::1", "2001:db8::3", "fd00::A", "fd00::b"]
+    for host in ("2001:DB8:0:0::1", "2001:db8::1", "fd00::A", "fd00::a"):
+        assert host in host_set
+    assert host_set.index("2001:db8::1") == 0
+
+
+def test_huge_sources_are_not_expanded():
+    """Test huge sources are counted and sliced without expanding them."""
+    host_set = HostSet(["10.0.0.0/8", "fd00::/96"], ["10.0.[0:1].[0:255]"])
+    # the network address 10.0.0.0 is neither a host nor excluded twice
+    assert len(host_set) == (2**24 - 2 - 511) + (2**32 - 1)
+    hosts = iter(host_set)
+    assert [next(hosts) for _ in range(3)] == ["10.0.2.0", "10.0.2.1", "10.0.2.2"]
+
+
+def test_index_and_contains():
+    """Test hosts are found at their iteration position without expanding them."""
+    host_set = HostSet(
+        ["host-b", "10.0.0.0/30", "fd00::[1:2]", "10.0.1.[5:6]", "host-a"],
+        exclude_patterns=["10.0.0.2"],
+    )
+    hosts = list(host_set)
+    assert [host_set.index(host) for host in hosts] == list(range(len(hosts)))
+    for absent in ("10.0.0.2", "10.0.0.4", "10.0.1.7", "9.0.0.1", "fd00::3", "host"):
+        assert absent not in host_set
+        assert host_set.index(absent) is None
+    assert "host-a" in host_set
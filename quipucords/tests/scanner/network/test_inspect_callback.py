@@ -2,6 +2,8 @@
 
 import logging
 import os
+import socket
+from unittest.mock import Mock
 
 import ansible_runner
 import pytest
@@ -9,9 +11,9 @@ import yaml
 from ansible.parsing.yaml.dumper import AnsibleDumper
 from django.conf import settings
 
-from api.models import InspectResult, Scan
+from api.models import InspectResult, Scan, SystemConnectionResult
 from log_messages import TASK_UNEXPECTED_FAILURE
-from scanner.network.inspect_callback import InspectCallback
+from scanner.network.inspect_callback import ConnectInspectCallback, InspectCallback
 
 
 @pytest.fixture
@@ -296,6 +298,53 @@ class TestInspectCallback:
         assert results.facts == facts
         assert results.status == expected_status
 
+    def test_on_host_done_when_host_done(self, event_ok, mocker):
+        """Test results are handed over as soon as a host emits host_done."""
+        on_host_done = mocker.Mock()
+        callback = InspectCallback(on_host_done=on_host_done)
+        callback.event_callback(event_ok)
+        on_host_done.assert_not_called()
+
+        event_ok["event_data"]["res"]["ansible_facts"] = {"host_done": True}
+        callback.event_callback(event_ok)
+        on_host_done.assert_called_once()
+        results = on_host_done.call_args.args[0]
+        assert results.host == "127.0.0.1"
+        assert results.status == InspectResult.SUCCESS
+        assert results.facts == {"internal_have_rpm_user": True, "host_done": True}
+        # facts are released once handed over
+        assert callback._ansible_facts == {}
+        assert list(callback.iter_results()) == []
+
+    def test_on_host_done_when_unreachable(self, event_ok, event_unreachable, mocker):
+        """Test results are handed over as soon as a host becomes unreachable."""
+        on_host_done = mocker.Mock()
+        callback = InspectCallback(on_host_done=on_host_done)
+        callback.event_callback(event_ok)
+        callback.event_callback(event_unreachable)
+        on_host_done.assert_called_once()
+        results = on_host_done.call_args.args[0]
+        assert results.status == InspectResult.UNREACHABLE
+        assert results.facts == {"internal_have_rpm_user": True}
+        assert callback._ansible_facts == {}
+
+    def test_on_host_done_unreachable_without_facts(self, event_unreachable, mocker):
+        """Test unreachable hosts without facts are not handed over."""
+        on_host_done = mocker.Mock()
+        callback = InspectCallback(on_host_done=on_host_done)
+        callback.event_callback(event_unreachable)
+        on_host_done.assert_not_called()
+        assert "127.0.0.1" in callback._unreachable_hosts
+
+    def test_cancel_check(self, mocker):
+        """Test cancel_callback stops the playbook once cancel_check is True."""
+        cancel_check = mocker.Mock(side_effect=[False, True])
+        callback = InspectCallback(cancel_check=cancel_check)
+        assert not callback.cancel_callback()
+        assert callback.cancel_callback()
+        assert callback.cancel_callback()
+        assert cancel_check.call_count == 2
+
     def test_fact_sanitization_bad_byte_strings(self, caplog, fact_with_bad_bytes):
         """Test InspectCallback._process_task_facts with "bad" bytes in strings."""
         caplog.set_level(logging.WARNING)
@@ -351,3 +400,51 @@ def test_inspect_callback_with_inspect_playbook(local_inventory):
     assert results.status == InspectResult.SUCCESS
     # spot check at least one fact we expect to always work
     assert results.facts["uname_hostname"] == os.uname().nodename
+
+
+@pytest.fixture
+def closed_port():
+    """Return a local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.integration
+def test_connect_inspect_callback_with_inspect_playbook(tmp_path, closed_port):
+    """Test a host is not taken for connected on the playbook's set_fact tasks."""
+    inventory = {
+        "all": {
+            "hosts": {
+                "closed": {
+                    "ansible_host": "127.0.0.1",
+                    "ansible_port": closed_port,
+                    "ansible_connection": "ssh",
+                    "ansible_user": "nobody",
+                }
+            }
+        }
+    }
+    inventory_file = tmp_path / "inventory.yml"
+    inventory_file.write_text(yaml.dump(inventory, Dumper=AnsibleDumper))
+    result_store = Mock()
+    callback = ConnectInspectCallback(result_store, Mock(), Mock())
+
+    ansible_runner.run(
+        inventory=str(inventory_file),
+        event_handler=callback.event_callback,
+        playbook=str(settings.BASE_DIR / "scanner/network/runner/inspect.yml"),
+        extravars=Scan.get_default_extra_vars(),
+        private_data_dir=str(tmp_path),
+        quiet=True,
+    )
+    # the set_fact tasks before the first command succeeded, yet only the
+    # failure to connect is recorded
+    result_store.record_result.assert_called_once_with(
+        "closed",
+        callback.source,
+        callback.credential,
+        SystemConnectionResult.UNREACHABLE,
+    )
+    # the connection result is the only result of a host never connected to
+    assert list(callback.iter_results()) == []
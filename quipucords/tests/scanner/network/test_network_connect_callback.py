@@ -5,12 +5,16 @@ from unittest.mock import Mock
 
 import pytest
 
+from api.connresult.model import SystemConnectionResult
 from api.models import Source
 from api.scantask.model import ScanTask
 from constants import DataSources
-from scanner.network.connect_callback import ConnectResultCallback
+from scanner.network.connect_callback import (
+    ConnectResultCallback,
+    CredentialsConnectResultCallback,
+)
 from scanner.network.inspect import ConnectResultStore
-from tests.factories import ScanTaskFactory, SourceFactory
+from tests.factories import CredentialFactory, ScanTaskFactory, SourceFactory
 
 
 def build_event(host, return_code=0, stderr=False, msg=False, event=False):
@@ -54,6 +58,7 @@ class TestConnectResultCallback:
         )
         for event in events:
             callback.event_callback(event)
+        callback.result_store.flush()
         assert callback.result_store.scan_task.systems_count == 3
         assert callback.result_store.scan_task.systems_scanned == 1
         assert callback.result_store.scan_task.systems_failed == 0
@@ -73,6 +78,7 @@ class TestConnectResultCallback:
         )
         for event in events:
             callback.event_callback(event)
+        callback.result_store.flush()
         assert callback.result_store.scan_task.systems_failed == 0
         assert callback.result_store.scan_task.systems_count == 3
 
@@ -93,6 +99,7 @@ class TestConnectResultCallback:
         )
         for event in events:
             callback.event_callback(event)
+        callback.result_store.flush()
         assert callback.result_store.scan_task.systems_failed == 0
         assert callback.result_store.scan_task.systems_unreachable == 1
         assert callback.result_store.scan_task.systems_count == 3
@@ -145,3 +152,38 @@ class TestConnectResultCallback:
         callback.result_store.scan_task.log_message.assert_called_with(
             expected_error, log_level=logging.ERROR
         )
+
+
+@pytest.mark.django_db
+def test_credentials_callback_uses_credentials_in_order(source: Source):
+    """Test each connection attempt of a host is matched to the next credential."""
+    credentials = [CredentialFactory(cred_type=DataSources.NETWORK) for _ in range(3)]
+    results_store = ConnectResultStore(ScanTaskFactory(source=source))
+    callback = CredentialsConnectResultCallback(results_store, credentials, source)
+    include = build_event(host="1.2.3.4", event="runner_on_ok")
+    include["event_data"]["task_action"] = "include_tasks"
+    denied = "Failed to connect to the host via ssh: Permission denied (publickey)."
+    events = [
+        include,
+        build_event(host="1.2.3.4", event="runner_on_unreachable", msg=denied),
+        build_event(host="1.2.3.5", event="runner_on_unreachable", msg="timed out"),
+        build_event(host="1.2.3.6", event="runner_on_failed", return_code=1),
+        build_event(host="1.2.3.4", event="runner_on_ok"),
+        {"event": "runner_on_skipped", "event_data": {"host": "1.2.3.5"}},
+        build_event(host="1.2.3.6", event="runner_on_unreachable", msg=denied),
+        {"event": "runner_on_skipped", "event_data": {"host": "1.2.3.4"}},
+        build_event(host="1.2.3.6", event="runner_on_ok"),
+    ]
+    for event in events:
+        callback.event_callback(event)
+    results_store.flush()
+
+    connections = {
+        result.name: (result.status, result.credential)
+        for result in SystemConnectionResult.objects.all()
+    }
+    assert connections == {
+        "1.2.3.4": (SystemConnectionResult.SUCCESS, credentials[1]),
+        "1.2.3.5": (SystemConnectionResult.UNREACHABLE, credentials[0]),
+        "1.2.3.6": (SystemConnectionResult.SUCCESS, credentials[2]),
+    }
@@ -0,0 +1,122 @@
+"""Test trying the credential that last connected to a host first."""
+
+from unittest.mock import Mock
+
+import pytest
+
+from api.models import CredentialAffinity, ScanTask, Source, SystemConnectionResult
+from constants import DataSources
+from scanner.network import inspect
+from scanner.network.inspect import (
+    ConnectResultStore,
+    get_credential_affinity,
+    run_with_result_store,
+)
+from tests.factories import CredentialFactory
+from tests.scanner.test_util import create_scan_job
+
+# the user each host accepts
+ACCEPTED_USERS = {"10.0.0.1": "user0", "10.0.0.2": "user2", "10.0.0.3": "user2"}
+
+
+@pytest.fixture
+def credentials(db):
+    """Return three network credentials, tried in this order."""
+    return [
+        CredentialFactory(cred_type=DataSources.NETWORK, username=f"user{index}")
+        for index in range(3)
+    ]
+
+
+@pytest.fixture
+def network_source(credentials):
+    """Return a network Source with 3 hosts and 3 credentials."""
+    source = Source.objects.create(
+        name="affinity-source", port=22, hosts=["10.0.0.[1:3]"]
+    )
+    for credential in credentials:
+        source.credentials.add(credential)
+    return source
+
+
+@pytest.fixture
+def attempts(mocker, settings):
+    """Fake the connect playbook, returning the list of connection attempts."""
+    settings.QUIPUCORDS_NETWORK_CREDENTIAL_AFFINITY = True
+    attempts = []
+
+    def run(*, inventory, extravars, event_handler, **kwargs):
+        user = inventory["all"]["vars"]["ansible_user"]
+        for host in inventory["all"]["children"][extravars["variable_host"]]["hosts"]:
+            attempts.append((host, user))
+            if ACCEPTED_USERS[host] == user:
+                res, event = {"rc": 0}, "runner_on_ok"
+            else:
+                res, event = {"msg": "Permission denied"}, "runner_on_unreachable"
+            event_handler({"event": event, "event_data": {"host": host, "res": res}})
+        return Mock(status="successful")
+
+    mocker.patch.object(inspect, "write_to_yaml", side_effect=lambda inv: inv)
+    mocker.patch.object(inspect.ansible_runner, "run", side_effect=run)
+    return attempts
+
+
+def connect(source, scan_name="test"):
+    """Run the connect step of a new scan of the source."""
+    scan_job, scan_task = create_scan_job(source, scan_name=scan_name)
+    result_store = ConnectResultStore(scan_task)
+    assert run_with_result_store(scan_task, scan_job, result_store) == (
+        None,
+        ScanTask.COMPLETED,
+    )
+    return scan_task
+
+
+def test_rescan_tries_known_credentials_first(network_source, credentials, attempts):
+    """Test a re-scan only attempts the credentials that worked last time."""
+    connect(network_source)
+    assert len(attempts) == 7
+    assert get_credential_affinity(network_source, credentials) == {
+        "10.0.0.1": credentials[0],
+        "10.0.0.2": credentials[2],
+        "10.0.0.3": credentials[2],
+    }
+
+    attempts.clear()
+    scan_task = connect(network_source, scan_name="rescan")
+    assert sorted(attempts) == sorted(ACCEPTED_USERS.items())
+    assert set(
+        scan_task.connection_result.systems.values_list("name", "credential")
+    ) == {
+        ("10.0.0.1", credentials[0].id),
+        ("10.0.0.2", credentials[2].id),
+        ("10.0.0.3", credentials[2].id),
+    }
+
+
+def test_known_credential_failing_falls_back(network_source, credentials, attempts):
+    """Test hosts rejecting their known credential are tried with all credentials."""
+    CredentialAffinity.objects.create(
+        source=network_source, name="10.0.0.3", credential=credentials[1]
+    )
+    scan_task = connect(network_source)
+    assert attempts.count(("10.0.0.3", "user1")) == 2
+    result = scan_task.connection_result.systems.get(name="10.0.0.3")
+    assert result.status == SystemConnectionResult.SUCCESS
+    assert result.credential == credentials[2]
+    affinity = get_credential_affinity(network_source, credentials)
+    assert affinity["10.0.0.3"] == credentials[2]
+
+
+def test_affinity_stale_after_credential_update(network_source, credentials):
+    """Test affinities are ignored once their credential was updated."""
+    for host, credential in zip(("10.0.0.1", "10.0.0.2"), credentials):
+        CredentialAffinity.objects.create(
+            source=network_source, name=host, credential=credential
+        )
+    credentials[1].save()
+    assert get_credential_affinity(network_source, credentials) == {
+        "10.0.0.1": credentials[0]
+    }
+    # nor used for credentials removed from the source
+    assert get_credential_affinity(network_source, credentials[1:]) == {}
@@ -0,0 +1,198 @@
+"""Test reusing product facts of unchanged hosts in incremental inspections."""
+
+from unittest.mock import Mock
+
+import pytest
+
+from api.models import InspectGroup, InspectResult, Scan, ScanTask, Source
+from scanner.network import inspect
+from scanner.network.incremental import (
+    REUSED_FACTS,
+    PreviousInspection,
+    get_previous_inspections,
+    get_reusable_fact_names,
+    reuse_facts,
+)
+from scanner.network.inspect import InspectTaskRunner
+from scanner.network.utils import get_role_fact_names
+from tests.scanner.network.test_network_single_pass import SyncWriter
+from tests.scanner.test_util import create_scan_job
+
+HOSTS = ("10.0.0.1", "10.0.0.2")
+
+
+@pytest.fixture
+def network_source(network_credential):
+    """Return a network Source with 2 hosts."""
+    source = Source.objects.create(
+        name="incremental-source", port=22, hosts=["10.0.0.[1:2]"]
+    )
+    source.credentials.add(network_credential)
+    return source
+
+
+@pytest.fixture
+def signatures():
+    """Return the change signature of each host, as the fake ansible run sees it."""
+    return {"10.0.0.1": "sig-1", "10.0.0.2": "sig-2"}
+
+
+@pytest.fixture
+def ansible_run(mocker, settings, signatures):
+    """Fake the inspect playbook, returning the mocked ansible_runner.run."""
+    settings.QUIPUCORDS_NETWORK_INCREMENTAL_INSPECT = True
+    mocker.patch.object(inspect, "InspectResultWriter", SyncWriter)
+    mocker.patch.object(inspect, "write_to_yaml", side_effect=lambda inv: inv)
+    mocker.patch(
+        "scanner.network.post_process.process",
+        side_effect=lambda **kw: kw["fact_value"],
+    )
+    mocker.patch.object(InspectTaskRunner, "_persist_ansible_logs")
+
+    def run(*, inventory, extravars, event_handler, **kwargs):
+        group = inventory["all"]["children"][extravars["variable_host"]]
+        for host, host_vars in group["hosts"].items():
+            facts = {"connection_host": host, "change_signature": signatures[host]}
+            if host_vars.get("previous_change_signature") != signatures[host]:
+                facts["redhat_packages_gpg_num_rh_packages"] = len(signatures[host])
+            event_handler(
+                {
+                    "event": "runner_on_ok",
+                    "event_data": {"host": host, "res": {"ansible_facts": facts}},
+                }
+            )
+            event_handler(
+                {
+                    "event": "runner_on_ok",
+                    "event_data": {
+                        "host": host,
+                        "res": {"ansible_facts": {"host_done": True}},
+                    },
+                }
+            )
+        return Mock(status="successful")
+
+    return mocker.patch.object(inspect.ansible_runner, "run", side_effect=run)
+
+
+def inspect_hosts(source, scan_name="test", fact_profile=Scan.FACT_PROFILE_FULL):
+    """Run the inspect step of a new scan of the source, returning its facts."""
+    scan_job, scan_task = create_scan_job(source, scan_name=scan_name)
+    Scan.objects.filter(id=scan_job.scan_id).update(fact_profile=fact_profile)
+    scan_job.refresh_from_db()
+    runner = InspectTaskRunner(scan_job, scan_task)
+    connected = [(host, {"username": "user"}) for host in HOSTS]
+    assert runner._inspect_scan(connected) == (None, ScanTask.COMPLETED)
+    return {
+        result.name: {"id": result.id}
+        | {fact.name: fact.value for fact in result.facts.all()}
+        for result in InspectResult.objects.filter(inspect_group__tasks=scan_task)
+    }
+
+
+def test_get_role_fact_names():
+    """Test the fact names of a role are read from its set_fact tasks."""
+    fact_names = get_role_fact_names("jboss_ws")
+    assert "jws_installed_with_rpm" in fact_names
+    assert "internal_host_started_processing_role" not in fact_names
+    assert set(fact_names) <= set(get_reusable_fact_names())
+    assert "change_signature" not in get_reusable_fact_names()
+
+
+@pytest.mark.django_db
+def test_get_previous_inspections(network_source):
+    """Test the last successful inspection of each host is found."""
+    assert get_previous_inspections(network_source, HOSTS) == {}
+    group = InspectGroup.objects.create(source=network_source)
+    results = []
+    for status, signature in (
+        (InspectResult.SUCCESS, "old"),
+        (InspectResult.SUCCESS, "new"),
+        (InspectResult.FAILED, "failed"),
+    ):
+        result = InspectResult.objects.create(
+            name="10.0.0.1", status=status, inspect_group=group
+        )
+        result.facts.create(name="change_signature", value=signature)
+        results.append(result)
+
+    assert get_previous_inspections(network_source, HOSTS) == {
+        "10.0.0.1": PreviousInspection(results[1].id, "new")
+    }
+
+
+@pytest.mark.django_db
+def test_reuse_facts_signature_changed():
+    """Test facts are left alone when the host changed since its last inspection."""
+    facts = {"change_signature": "new"}
+    assert reuse_facts(facts, PreviousInspection(1, "old")) == {
+        "change_signature": "new"
+    }
+    assert reuse_facts(facts, None) == {"change_signature": "new"}
+
+
+@pytest.mark.django_db
+def test_incremental_inspect(network_source, ansible_run, signatures):
+    """Test unchanged hosts get the product facts of their previous inspection."""
+    first_facts = inspect_hosts(network_source)
+    inventory = ansible_run.call_args.kwargs["inventory"]
+    group = next(iter(inventory["all"]["children"].values()))
+    assert all(
+        "previous_change_signature" not in host_vars
+        for host_vars in group["hosts"].values()
+    )
+    assert ansible_run.call_args.kwargs["extravars"]["incremental_inspect"]
+    assert REUSED_FACTS not in first_facts["10.0.0.1"]
+
+    signatures["10.0.0.2"] = "sig-2-changed"
+    facts = inspect_hosts(network_source, scan_name="rescan")
+
+    inventory = ansible_run.call_args.kwargs["inventory"]
+    group = next(iter(inventory["all"]["children"].values()))
+    assert {
+        host: host_vars["previous_change_signature"]
+        for host, host_vars in group["hosts"].items()
+    } == {"10.0.0.1": "sig-1", "10.0.0.2": "sig-2"}
+    # unchanged host: the facts come from the first scan
+    reused = facts["10.0.0.1"][REUSED_FACTS]
+    assert reused["inspect_result_id"] == first_facts["10.0.0.1"]["id"]
+    assert reused["roles"] == ["redhat_packages", "jboss_eap", "jboss_fuse", "jboss_ws"]
+    assert "redhat_packages_gpg_num_rh_packages" in reused["facts"]
+    assert facts["10.0.0.1"]["redhat_packages_gpg_num_rh_packages"] == 5
+    # changed host: inspected from scratch
+    assert REUSED_FACTS not in facts["10.0.0.2"]
+    assert facts["10.0.0.2"]["redhat_packages_gpg_num_rh_packages"] == 13
+
+
+@pytest.mark.django_db
+def test_incremental_inspect_disabled(network_source, ansible_run, settings):
+    """Test nothing is reused unless incremental inspection is enabled."""
+    inspect_hosts(network_source)
+    settings.QUIPUCORDS_NETWORK_INCREMENTAL_INSPECT = False
+    facts = inspect_hosts(network_source, scan_name="rescan")
+    assert "incremental_inspect" not in ansible_run.call_args.kwargs["extravars"]
+    assert REUSED_FACTS not in facts["10.0.0.1"]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "fact_profile", (Scan.FACT_PROFILE_RHEL_ONLY, Scan.FACT_PROFILE_MIDDLEWARE)
+)
+def test_incremental_inspect_after_partial_profile(
+    network_source, ansible_run, fact_profile
+):
+    """Test nothing is reused from an inspection that skipped reusable roles."""
+    inspect_hosts(network_source, fact_profile=fact_profile)
+    facts = inspect_hosts(network_source, scan_name="full")
+
+    inventory = ansible_run.call_args.kwargs["inventory"]
+    group = next(iter(inventory["all"]["children"].values()))
+    assert all(
+        "previous_change_signature" not in host_vars
+        for host_vars in group["hosts"].values()
+    )
+    assert REUSED_FACTS not in facts["10.0.0.1"]
+    assert facts["10.0.0.1"]["redhat_packages_gpg_num_rh_packages"] == 5
+    assert get_previous_inspections(network_source, HOSTS)["10.0.0.1"] == (
+        PreviousInspection(facts["10.0.0.1"]["id"], "sig-1")
+    )
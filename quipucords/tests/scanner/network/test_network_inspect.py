@@ -13,15 +13,18 @@ from django.test import override_settings
 from api.inspectresult.model import RawFact
 from api.models import (
     Credential,
+    InspectResult,
     ScanJob,
     ScanTask,
     Source,
     SystemConnectionResult,
 )
 from api.serializers import SourceSerializer
-from constants import GENERATED_SSH_KEYFILE, SCAN_JOB_LOG
-from scanner.network import InspectTaskRunner
+from constants import GENERATED_SSH_KEYFILE, SCAN_JOB_LOG, DataSources
+from scanner.network import InspectTaskRunner, inspect
 from scanner.network.inspect import construct_inventory, run_with_result_store
+from tests.factories import SourceFactory
+from tests.scanner.network.test_network_single_pass import SyncWriter
 from tests.scanner.test_util import create_scan_job
 
 ANSIBLE_FACTS = "ansible_facts"
@@ -47,6 +50,9 @@ class MockResultStore:
 
         self._remaining_hosts.remove(name)
 
+    def flush(self):
+        """Nothing is buffered."""
+
     def remaining_hosts(self):
         """Need this method because the task runner uses it."""
         return list(self._remaining_hosts)
@@ -334,6 +340,39 @@ class TestNetworkInspectScanner:
         assert "verbosity" in run_call.kwargs
         assert run_call.kwargs["verbosity"] == 1
 
+    @patch("ansible_runner.run")
+    @override_settings(QUIPUCORDS_NETWORK_INSPECT_SCHEDULING="group")
+    def test__inspect_scan_group_scheduling(self, mock_run, mocker):
+        """Test the default scheduling runs one playbook per concurrency group."""
+        mock_run.return_value.status = "successful"
+        self.scan_job.scan.max_concurrency = 2
+        self.scan_job.scan.save()
+        scanner = InspectTaskRunner(self.scan_job, self.scan_task)
+        mocker.patch.object(scanner, "_persist_ansible_logs")
+        hosts = [(f"1.2.3.{i}", self.cred_data) for i in range(5)]
+        scanner._inspect_scan(hosts)
+        assert mock_run.call_count == 3
+        assert all(call.kwargs["envvars"] is None for call in mock_run.mock_calls)
+
+    @patch("ansible_runner.run")
+    @override_settings(QUIPUCORDS_NETWORK_INSPECT_SCHEDULING="sliding")
+    def test__inspect_scan_sliding_scheduling(self, mock_run, mocker):
+        """Test sliding scheduling runs all hosts in a single "free" playbook."""
+        mock_run.return_value.status = "successful"
+        self.scan_job.scan.max_concurrency = 2
+        self.scan_job.scan.save()
+        scanner = InspectTaskRunner(self.scan_job, self.scan_task)
+        mocker.patch.object(scanner, "_persist_ansible_logs")
+        hosts = [(f"1.2.3.{i}", self.cred_data) for i in range(5)]
+        scanner._inspect_scan(hosts)
+        mock_run.assert_called_once()
+        run_kwargs = mock_run.mock_calls[0].kwargs
+        assert run_kwargs["envvars"] == {"ANSIBLE_STRATEGY": "free"}
+        assert "--forks=2" in run_kwargs["cmdline"]
+        assert run_kwargs["settings"]["job_timeout"] == (
+            settings.QUIPUCORDS_NETWORK_INSPECT_JOB_TIMEOUT * 5
+        )
+
 
 def test_inspect_scan_with_multiple_inspection_groups_stdout_logs(mocker):
     """Ensure all logs are collected when inspection have multiple groups."""
@@ -373,7 +412,7 @@ def test_inspect_scan_with_multiple_inspection_groups_stdout_logs(mocker):
     # we should be using a scanjob from db, but that would make the test
     # unnecessarily slow (just by initializing db in a test we "lose" 2 seconds
     # while this unit test alone takes less than half a second)
-    scanjob = Mock(id=999)
+    scanjob = Mock(id=999, scan=None)
     scanjob.get_extra_vars.side_effect = lambda: {}
     # InspectTaskRunner requires scanjob and scan_task
     inspect_runner = InspectTaskRunner(scanjob, Mock())
@@ -395,3 +434,56 @@ def test_inspect_scan_with_multiple_inspection_groups_stdout_logs(mocker):
     # output shall be saved twice
     assert stdout_log.read_text().splitlines() == 2 * ["ansible stdout"]
     assert stderr_log.read_text().splitlines() == 2 * ["ansible stderr"]
+
+
+@pytest.mark.django_db
+def test_inspect_scan_persists_hosts_as_they_finish(mocker):
+    """Ensure a host is persisted while ansible is still running other hosts."""
+    source = SourceFactory(source_type=DataSources.NETWORK)
+    scan_job, scan_task = create_scan_job(source)
+    scanner = InspectTaskRunner(scan_job, scan_task)
+    mocker.patch.object(scanner, "_persist_ansible_logs")
+    mocker.patch(
+        "scanner.network.post_process.process",
+        side_effect=lambda fact_value, **kwargs: fact_value,
+    )
+    # persist the results in the ansible thread, as soon as they are submitted
+    mocker.patch.object(inspect, "InspectResultWriter", SyncWriter)
+
+    def _fact_event(host, facts):
+        return {
+            "event": "runner_on_ok",
+            "event_data": {"host": host, "res": {"ansible_facts": facts}},
+        }
+
+    persisted_while_running = []
+
+    def _run(*, event_handler, **kwargs):
+        event_handler(_fact_event("done-host", {"connection_host": "done-host"}))
+        event_handler(_fact_event("done-host", {"host_done": True}))
+        event_handler(_fact_event("failed-host", {"connection_host": "failed-host"}))
+        # the assertions are made once _inspect_scan, which logs and skips any
+        # error of the run, returns
+        persisted_while_running.extend(
+            InspectResult.objects.values_list("name", flat=True)
+        )
+        return Mock(status="failed")
+
+    mocker.patch("scanner.network.inspect.ansible_runner.run", side_effect=_run)
+    scanner._inspect_scan([("done-host", {}), ("failed-host", {})])
+
+    # done-host is written while the playbook is still "running"
+    assert persisted_while_running == ["done-host"]
+
+    results = dict(
+        InspectResult.objects.filter(inspect_group__tasks=scan_task).values_list(
+            "name", "status"
+        )
+    )
+    assert results == {
+        "done-host": InspectResult.SUCCESS,
+        "failed-host": InspectResult.FAILED,
+    }
+    scan_task.refresh_from_db()
+    assert scan_task.systems_scanned == 1
+    assert scan_task.systems_failed == 1
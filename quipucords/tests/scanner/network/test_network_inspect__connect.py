@@ -21,7 +21,7 @@ def test__connect_paramiko(mock_run, network_source):
     _connect(
         scan_task=scan_task,
         hosts=network_source.hosts,
-        result_store=Mock(),
+        result_store=Mock(connected_count=0),
         credential=network_source.credentials.first(),
         connection_port=network_source.port,
         forks=Scan.DEFAULT_MAX_CONCURRENCY,
@@ -44,7 +44,7 @@ def test__connect_raises_exception_when_ansible_runner_run_fails(
         _connect(
             scan_task=scan_task,
             hosts=network_source.hosts,
-            result_store=Mock(),
+            result_store=Mock(connected_count=0),
             credential=network_source.credentials.first(),
             connection_port=network_source.port,
             forks=Scan.DEFAULT_MAX_CONCURRENCY,
@@ -62,7 +62,7 @@ def test__connect_with_modified_ansible_log_level(mock_run, network_source):
     _connect(
         scan_task=scan_task,
         hosts=network_source.hosts,
-        result_store=Mock(),
+        result_store=Mock(connected_count=0),
         credential=network_source.credentials.first(),
         connection_port=network_source.port,
         forks=Scan.DEFAULT_MAX_CONCURRENCY,
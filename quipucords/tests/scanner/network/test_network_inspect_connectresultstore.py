@@ -4,8 +4,17 @@ import pytest
 
 from api.connresult.model import SystemConnectionResult
 from api.scantask.model import ScanTask
+from api.source.model import Source
+from constants import DataSources
+from scanner.network import inspect
 from scanner.network.inspect import ConnectResultStore
-from tests.factories import ScanFactory, ScanTaskFactory, SourceFactory
+from tests.factories import (
+    CredentialFactory,
+    ScanFactory,
+    ScanTaskFactory,
+    SourceFactory,
+)
+from tests.scanner.test_util import create_scan_job
 
 pytestmark = pytest.mark.django_db  # all tests here require the database
 
@@ -24,7 +33,7 @@ def test_result_store_when_host_address_is_unreachable(faker):
 
     result_store = ConnectResultStore(scan_task)
 
-    assert result_store.remaining_hosts() == [host_address]
+    assert list(result_store.remaining_hosts()) == [host_address]
     assert result_store.scan_task.systems_count == 1
     assert result_store.scan_task.systems_scanned == 0
     assert result_store.scan_task.systems_failed == 0
@@ -33,7 +42,8 @@ def test_result_store_when_host_address_is_unreachable(faker):
         host_address, source, credential, SystemConnectionResult.UNREACHABLE
     )
 
-    assert result_store.remaining_hosts() == []
+    assert list(result_store.remaining_hosts()) == []
+    result_store.flush()
     assert result_store.scan_task.systems_count == 1
     assert result_store.scan_task.systems_scanned == 0
     assert result_store.scan_task.systems_unreachable == 1
@@ -70,6 +80,7 @@ def test_result_store_with_multiple_conditions(faker):
     result_store.record_result(host, source, credential, SystemConnectionResult.SUCCESS)
 
     assert len(result_store.remaining_hosts()) == len(host_addresses)
+    result_store.flush()
     assert result_store.scan_task.systems_count == 3
     assert result_store.scan_task.systems_scanned == 1
     assert result_store.scan_task.systems_failed == 0
@@ -78,6 +89,7 @@ def test_result_store_with_multiple_conditions(faker):
     # Check failure without cred
     result_store.record_result(host, source, None, SystemConnectionResult.FAILED)
     assert len(result_store.remaining_hosts()) == len(host_addresses)
+    result_store.flush()
     assert result_store.scan_task.systems_count == 3
     assert result_store.scan_task.systems_scanned == 1
     assert result_store.scan_task.systems_failed == 1
@@ -86,6 +98,123 @@ def test_result_store_with_multiple_conditions(faker):
     # Check failure with cred
     result_store.record_result(host, source, credential, SystemConnectionResult.FAILED)
     assert len(result_store.remaining_hosts()) == len(host_addresses)
+    result_store.flush()
     assert result_store.scan_task.systems_count == 3
     assert result_store.scan_task.systems_scanned == 1
     assert result_store.scan_task.systems_failed == 2
+
+
+def test_result_store_buffers_results(settings):
+    """Test results are written in bulk, keeping the remaining hosts up to date."""
+    settings.QUIPUCORDS_BULK_CREATE_BATCH_SIZE = 2
+    source = SourceFactory(hosts=["10.0.0.[1:3]"])
+    credential = source.credentials.first()
+    scan_task = ScanTaskFactory(source=source, scan_type=ScanTask.SCAN_TYPE_INSPECT)
+    result_store = ConnectResultStore(scan_task)
+    results = SystemConnectionResult.objects.filter(
+        task_connection_result=scan_task.connection_result
+    )
+
+    result_store.record_result(
+        "10.0.0.1", source, credential, SystemConnectionResult.SUCCESS
+    )
+    assert not results.exists()
+    assert sorted(result_store.remaining_hosts()) == ["10.0.0.2", "10.0.0.3"]
+    result_store.record_result(
+        "10.0.0.2", source, credential, SystemConnectionResult.UNREACHABLE
+    )
+    assert results.count() == 2
+    result_store.record_result("10.0.0.3", source, None, SystemConnectionResult.FAILED)
+    assert results.count() == 2
+    assert list(result_store.remaining_hosts()) == []
+
+    result_store.flush()
+    assert dict(results.values_list("name", "status")) == {
+        "10.0.0.1": SystemConnectionResult.SUCCESS,
+        "10.0.0.2": SystemConnectionResult.UNREACHABLE,
+        "10.0.0.3": SystemConnectionResult.FAILED,
+    }
+    scan_task.refresh_from_db()
+    assert (scan_task.systems_scanned, scan_task.systems_unreachable) == (1, 1)
+
+
+def test_canceled_connect_keeps_buffered_results(mocker):
+    """Test results recorded before the connect run got canceled are written."""
+    source = Source.objects.create(name="canceled", port=22, hosts=["10.0.0.[1:3]"])
+    source.credentials.add(CredentialFactory(cred_type=DataSources.NETWORK))
+    scan_job, scan_task = create_scan_job(source)
+
+    def run(*, event_handler, **kwargs):
+        event_handler(
+            {
+                "event": "runner_on_ok",
+                "event_data": {"host": "10.0.0.1", "res": {"rc": 0}},
+            }
+        )
+        return mocker.Mock(status="canceled")
+
+    mocker.patch.object(inspect, "write_to_yaml")
+    mocker.patch.object(inspect.ansible_runner, "run", side_effect=run)
+    result_store = ConnectResultStore(scan_task)
+
+    _, status = inspect.run_with_result_store(scan_task, scan_job, result_store)
+
+    assert status == ScanTask.CANCELED
+    assert list(
+        SystemConnectionResult.objects.filter(
+            task_connection_result=scan_task.connection_result
+        ).values_list("name", "status")
+    ) == [("10.0.0.1", SystemConnectionResult.SUCCESS)]
+    scan_task.refresh_from_db()
+    assert scan_task.systems_scanned == 1
+
+
+def test_remaining_hosts_are_not_expanded(mocker):
+    """Test the remaining hosts of a large range are counted and taken lazily."""
+    source = SourceFactory(hosts=["10.0.0.0/8"])
+    credential = source.credentials.first()
+    scan_task = ScanTaskFactory(source=source, scan_type=ScanTask.SCAN_TYPE_INSPECT)
+    result_store = ConnectResultStore(scan_task)
+    get_hosts = mocker.spy(inspect.HostSet, "__iter__")
+
+    remaining_hosts = result_store.remaining_hosts()
+    # the network and broadcast addresses are left out
+    assert len(remaining_hosts) == 2**24 - 2
+    assert "10.1.2.3" in remaining_hosts
+    assert "192.168.0.1" not in remaining_hosts
+    result_store.record_result(
+        "10.0.0.1", source, credential, SystemConnectionResult.UNREACHABLE
+    )
+    assert len(remaining_hosts) == 2**24 - 3
+    assert "10.0.0.1" not in remaining_hosts
+    get_hosts.assert_not_called()
+    hosts = iter(remaining_hosts)
+    assert [next(hosts), next(hosts)] == ["10.0.0.2", "10.0.0.3"]
+
+
+def test_connect_inventories_hold_a_group(mocker):
+    """Test each connect playbook run gets an inventory of its group only."""
+    source = SourceFactory(hosts=["10.0.0.[1:5]"])
+    scan_task = ScanTaskFactory(source=source, scan_type=ScanTask.SCAN_TYPE_INSPECT)
+    result_store = ConnectResultStore(scan_task)
+    inventories = []
+    mocker.patch.object(inspect, "write_to_yaml", side_effect=inventories.append)
+    mocker.patch.object(
+        inspect.ansible_runner, "run", return_value=mocker.Mock(status="successful")
+    )
+
+    inspect._connect(
+        scan_task=scan_task,
+        hosts=result_store.remaining_hosts(),
+        result_store=result_store,
+        credential=source.credentials.first(),
+        connection_port=22,
+        forks=2,
+        ssh_keyfile=None,
+    )
+    assert [inventory["all"]["children"] for inventory in inventories] == [
+        {f"group_{index}": {"hosts": {host: {"ansible_host": host} for host in hosts}}}
+        for index, hosts in enumerate(
+            (["10.0.0.1", "10.0.0.2"], ["10.0.0.3", "10.0.0.4"], ["10.0.0.5"])
+        )
+    ]
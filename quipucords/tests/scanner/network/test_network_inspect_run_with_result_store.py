@@ -15,8 +15,14 @@ import pytest
 
 from api.connresult.model import SystemConnectionResult
 from api.models import Credential, Scan, ScanTask, Source
-from scanner.network.inspect import ConnectResultStore, run_with_result_store
+from constants import DataSources
+from scanner.network.inspect import (
+    ConnectResultStore,
+    get_source_hosts,
+    run_with_result_store,
+)
 from scanner.network.utils import construct_inventory
+from tests.factories import CredentialFactory
 from tests.scanner.test_util import create_scan_job
 
 
@@ -25,14 +31,14 @@ def build_ansible_run_inventory(
     scan_job: "ScanJob",  # noqa: F821
 ) -> tuple[list[str], dict]:
     """Build inventory for Ansible run, simulating _connect function's inner logic."""
+    # _connect takes the remaining hosts in the HostSet order, a group at a time
     group_names, inventory = construct_inventory(
-        hosts=source.hosts,
+        hosts=list(get_source_hosts(source)),
         credential={},  # required dict arg, but value is irrelevant for testing
         connection_port=42069,  # required int arg, but value is irrelevant for testing
         concurrency_count=scan_job.options.get(
             "max_concurrency", Scan.DEFAULT_MAX_CONCURRENCY
         ),
-        exclude_hosts=source.exclude_hosts,
     )
     return group_names, inventory
 
@@ -269,3 +275,64 @@ def test_run_with_result_store_unexpected_runner_response(
 
     conn_dict = run_with_result_store(connect_scan_task, scan_job, result_store)
     assert conn_dict[1] == ScanTask.FAILED
+
+
+@pytest.mark.django_db
+def test_run_with_result_store_all_credentials_at_once(mocker, settings, faker):
+    """Test all credentials are tried in one run, keeping their precedence."""
+    settings.QUIPUCORDS_NETWORK_CONNECT_ALL_CREDENTIALS = True
+    credentials = [
+        CredentialFactory(cred_type=DataSources.NETWORK, username=f"user{index}")
+        for index in range(3)
+    ]
+    source = Source.objects.create(
+        name="source", port=22, hosts=["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+    )
+    for credential in credentials:
+        source.credentials.add(credential)
+    # the users each host accepts; 10.0.0.3 is unreachable
+    accepted = {"10.0.0.1": {"user1", "user2"}, "10.0.0.2": set()}
+    attempts = []
+
+    def run(*, inventory, extravars, event_handler, playbook, **kwargs):
+        """Play connect_credentials.yml, emitting the events of ansible-runner."""
+        assert playbook.endswith("connect_credentials.yml")
+        inventory_vars = inventory["all"]["vars"]
+        hosts = inventory["all"]["children"][extravars["variable_host"]]["hosts"]
+        for host in hosts:
+            for cred_vars in inventory_vars["connect_credentials"]:
+                user = cred_vars["ansible_user"]
+                attempts.append((host, user))
+                denied = host in accepted and user not in accepted[host]
+                if host not in accepted:
+                    event, res = "runner_on_unreachable", {"msg": "timed out"}
+                elif denied:
+                    event, res = "runner_on_unreachable", {"msg": "Permission denied"}
+                else:
+                    event, res = "runner_on_ok", {"rc": 0}
+                event_data = {"host": host, "res": res, "task_action": "raw"}
+                event_handler({"event": event, "event_data": event_data})
+                if not denied:
+                    break  # the next credentials are skipped
+        return Mock(status="successful")
+
+    mocker.patch("scanner.network.inspect.write_to_yaml", side_effect=lambda inv: inv)
+    mock_run = mocker.patch("ansible_runner.run", side_effect=run)
+    scan_job, scan_task = create_scan_job(source)
+    result_store = ConnectResultStore(scan_task)
+
+    assert run_with_result_store(scan_task, scan_job, result_store) == (
+        None,
+        ScanTask.COMPLETED,
+    )
+    assert mock_run.call_count == 1
+    assert [host for host, _ in attempts].count("10.0.0.3") == 1
+    connections = {
+        result.name: (result.status, result.credential)
+        for result in scan_task.connection_result.systems.all()
+    }
+    assert connections == {
+        "10.0.0.1": (SystemConnectionResult.SUCCESS, credentials[1]),
+        "10.0.0.2": (SystemConnectionResult.FAILED, None),
+        "10.0.0.3": (SystemConnectionResult.UNREACHABLE, credentials[0]),
+    }
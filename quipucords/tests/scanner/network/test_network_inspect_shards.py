@@ -0,0 +1,222 @@
+"""Test splitting a network source into shards."""
+
+from unittest import mock
+
+import pytest
+
+from api.models import InspectResult, ScanTask, Source, SystemConnectionResult
+from scanner.network import inspect
+from scanner.network.host_set import HostSet
+from scanner.network.inspect import (
+    ConnectResultStore,
+    InspectTaskRunner,
+    ScanTaskCancelCheck,
+    Shard,
+    get_shard_count,
+)
+from scanner.network.inspect_callback import AnsibleResults
+from tests.scanner.network.test_network_single_pass import (
+    _inventory_hosts,
+    _unreachable,
+)
+from tests.scanner.test_util import create_scan_job
+
+HOSTS = [f"10.0.0.{i}" for i in range(1, 11)]
+UNREACHABLE_HOSTS = {"10.0.0.2", "10.0.0.7"}
+FAILED_HOSTS = {"10.0.0.5"}
+
+
+@pytest.fixture
+def network_source(network_credential):
+    """Return a network Source with 10 hosts, one of them excluded."""
+    source = Source.objects.create(
+        name="sharded-source",
+        port=22,
+        hosts=["10.0.0.[1:11]"],
+        exclude_hosts=["10.0.0.11"],
+    )
+    source.credentials.add(network_credential)
+    return source
+
+
+def fake_connect(*, hosts, result_store, credential, **kwargs):
+    """Record connection results like a real connect run would do."""
+    for host in hosts:
+        status = (
+            SystemConnectionResult.UNREACHABLE
+            if host in UNREACHABLE_HOSTS
+            else SystemConnectionResult.SUCCESS
+        )
+        source = result_store.scan_task.source
+        result_store.record_result(host, source, credential, status)
+    return None, ScanTask.COMPLETED
+
+
+def fake_inspect_scan(runner, connected):
+    """Persist inspect results like a real inspect run would do."""
+    for host, _ in connected:
+        status = InspectResult.FAILED if host in FAILED_HOSTS else InspectResult.SUCCESS
+        runner._persist_results(
+            AnsibleResults(host=host, status=status, facts={"connection_host": host})
+        )
+    return None, ScanTask.COMPLETED
+
+
+@pytest.fixture
+def fake_ansible(mocker):
+    """Replace the ansible runs of connect and inspect."""
+    mocker.patch.object(inspect, "_connect", side_effect=fake_connect)
+    mocker.patch.object(
+        InspectTaskRunner, "_inspect_scan", autospec=True, side_effect=fake_inspect_scan
+    )
+    mocker.patch(
+        "scanner.network.post_process.process",
+        side_effect=lambda **kwargs: kwargs["fact_value"],
+    )
+
+
+def test_shards_split_hosts():
+    """Test shards take every host exactly once."""
+    shards = [list(Shard(index, 3).select(HOSTS)) for index in range(3)]
+    assert sorted(host for shard in shards for host in shard) == sorted(HOSTS)
+    assert [len(shard) for shard in shards] == [4, 3, 3]
+    assert [Shard(index, 3).size(HOSTS) for index in range(3)] == [4, 3, 3]
+    assert all(
+        Shard(index, 3).contains(HostSet(HOSTS), host) == (host in shard)
+        for index, shard in enumerate(shards)
+        for host in HOSTS
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "max_shards,min_hosts,expected",
+    ((1, 1, 1), (3, 1, 3), (20, 1, 10), (3, 4, 2), (3, 100, 1)),
+)
+def test_get_shard_count(  # noqa: PLR0913
+    network_source, settings, max_shards, min_hosts, expected
+):
+    """Test the shard count is capped by the settings and the number of hosts."""
+    settings.QUIPUCORDS_NETWORK_SCAN_SHARDS = max_shards
+    settings.QUIPUCORDS_NETWORK_SCAN_SHARD_MIN_HOSTS = min_hosts
+    assert get_shard_count(network_source) == expected
+
+
+@pytest.mark.django_db
+def test_connect_result_store_shard(network_source):
+    """Test a shard store only connects to its hosts and keeps the task stats."""
+    _, scan_task = create_scan_job(network_source)
+    scan_task.update_stats("", sys_count=10)
+    store = ConnectResultStore(scan_task, shard=Shard(1, 3))
+    assert sorted(store.remaining_hosts()) == list(Shard(1, 3).select(HOSTS))
+    scan_task.refresh_from_db()
+    assert scan_task.systems_count == 10
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("shard_count", (None, 1, 3))
+def test_sharded_stats_add_up(network_source, fake_ansible, shard_count):
+    """Test shards end up with the same stats and results as a single run."""
+    scan_job, scan_task = create_scan_job(network_source)
+    scan_task.status_start()
+    if shard_count is None:
+        message, status = InspectTaskRunner(scan_job, scan_task).run()
+    else:
+        InspectTaskRunner(scan_job, scan_task).start_shards()
+        shard_statuses = [
+            InspectTaskRunner(
+                scan_job, scan_task, shard=Shard(index, shard_count)
+            ).run()[1]
+            for index in range(shard_count)
+        ]
+        message, status = InspectTaskRunner(scan_job, scan_task).finish_shards(
+            shard_statuses
+        )
+
+    assert status == ScanTask.COMPLETED
+    assert message == "1 systems could not be scanned."
+    scan_task.refresh_from_db()
+    assert (
+        scan_task.systems_count,
+        scan_task.systems_scanned,
+        scan_task.systems_failed,
+        scan_task.systems_unreachable,
+    ) == (8, 7, 1, 0)
+    assert scan_task.inspect_groups.count() == 1
+    results = InspectResult.objects.filter(inspect_group__tasks=scan_task)
+    assert sorted(results.values_list("name", flat=True)) == sorted(
+        set(HOSTS) - UNREACHABLE_HOSTS
+    )
+
+
+@pytest.mark.django_db
+def test_finish_shards_statuses(network_source):
+    """Test the task status when no shard completed."""
+    scan_job, scan_task = create_scan_job(network_source)
+    runner = InspectTaskRunner(scan_job, scan_task)
+    assert runner.finish_shards([ScanTask.CANCELED, ScanTask.CANCELED])[1] == (
+        ScanTask.CANCELED
+    )
+    assert runner.finish_shards([ScanTask.FAILED, ScanTask.CANCELED]) == (
+        "All 2 shards failed.",
+        ScanTask.FAILED,
+    )
+
+
+@pytest.mark.django_db
+def test_cancel_check(network_source):
+    """Test the cancel check sees a canceled task, polling the database sparingly."""
+    _, scan_task = create_scan_job(network_source)
+    check = ScanTaskCancelCheck(scan_task.id, interval=60)
+    fresh_check = ScanTaskCancelCheck(scan_task.id, interval=60)
+    assert not check()
+    scan_task.status_cancel()
+    assert not check()  # not queried again yet
+    assert fresh_check()
+
+    with mock.patch.object(inspect.time, "monotonic", return_value=10**9):
+        assert check()
+
+
+@pytest.mark.django_db
+def test_shard_passes_cancel_check(network_source, mocker):
+    """Test shards stop their ansible runs when the task gets canceled."""
+    scan_job, scan_task = create_scan_job(network_source)
+    connect = mocker.patch.object(
+        inspect, "_connect", return_value=("canceled", ScanTask.CANCELED)
+    )
+    runner = InspectTaskRunner(scan_job, scan_task, shard=Shard(0, 2))
+    assert runner.check_connection() == ("canceled", ScanTask.CANCELED)
+    cancel_check = connect.call_args.kwargs["cancel_check"]
+    assert isinstance(cancel_check, ScanTaskCancelCheck)
+    assert cancel_check.scan_task_id == scan_task.id
+
+    assert InspectTaskRunner(scan_job, scan_task)._cancel_check is None
+
+
+@pytest.mark.django_db
+def test_shard_without_connections_fails(network_source, mocker):
+    """Test a shard fails to connect even when other shards connected to hosts."""
+
+    def run(*, inventory, extravars, event_handler, **kwargs):
+        for host in _inventory_hosts(inventory, extravars["variable_host"]):
+            event_handler(_unreachable(host, "No route to host"))
+        return mock.Mock(status="unreachable")
+
+    mocker.patch.object(inspect.ansible_runner, "run", side_effect=run)
+    mocker.patch.object(inspect, "write_to_yaml", side_effect=lambda inv: inv)
+    _, scan_task = create_scan_job(network_source)
+    # the other shards connected to their hosts
+    scan_task.update_stats("", sys_count=10, sys_scanned=6)
+    store = ConnectResultStore(scan_task, shard=Shard(1, 3))
+
+    assert inspect._connect(
+        scan_task=scan_task,
+        hosts=store.remaining_hosts(),
+        result_store=store,
+        credential=network_source.credentials.first(),
+        connection_port=22,
+        forks=2,
+        ssh_keyfile=None,
+    ) == ("No successful connections", ScanTask.FAILED)
+    assert store.connected_count == 0
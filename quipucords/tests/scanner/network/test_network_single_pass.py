@@ -0,0 +1,311 @@
+"""Test the single-pass (connect and inspect at once) network scan."""
+
+import math
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from api.models import (
+    Credential,
+    InspectResult,
+    ScanTask,
+    Source,
+    SystemConnectionResult,
+)
+from constants import DataSources
+from scanner.network import inspect
+from scanner.network.inspect import InspectTaskRunner
+from scanner.network.inspect_callback import ConnectInspectCallback
+from tests.factories import CredentialFactory
+from tests.scanner.test_util import create_scan_job
+
+
+class SyncWriter:
+    """InspectResultWriter replacement persisting results in the calling thread."""
+
+    def __init__(self, persist, max_pending, batch_size=1):
+        self.submit = persist
+
+    def __enter__(self):
+        """Start writing."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop writing."""
+
+
+def _event(event, host, res=None):
+    return {"event": event, "event_data": {"host": host, "res": res or {}}}
+
+
+def _ok(host, **facts):
+    return _event("runner_on_ok", host, {"ansible_facts": facts})
+
+
+def _raw(host, rc=0):
+    """Return the result of a command that ran on the host."""
+    return _event("runner_on_ok" if rc == 0 else "runner_on_failed", host, {"rc": rc})
+
+
+def _started(host):
+    """Return the result of the first (set_fact) task of the inspect playbook."""
+    return _ok(host, internal_host_started_processing_role="check_dependencies")
+
+
+def _unreachable(host, msg):
+    return _event("runner_on_unreachable", host, {"msg": msg})
+
+
+def _inventory_hosts(inventory, group_name):
+    return inventory["all"]["children"][group_name]["hosts"]
+
+
+@pytest.fixture
+def credentials(db):
+    """Return two network credentials, tried in this order."""
+    return [
+        CredentialFactory(cred_type=DataSources.NETWORK, username=username)
+        for username in ("first", "second")
+    ]
+
+
+@pytest.fixture
+def network_source(credentials):
+    """Return a network Source with 4 hosts and 2 credentials."""
+    source = Source.objects.create(
+        name="single-pass-source", port=22, hosts=["10.0.0.[1:4]"]
+    )
+    for credential in credentials:
+        source.credentials.add(credential)
+    return source
+
+
+@pytest.fixture
+def single_pass(mocker, settings):
+    """Enable single-pass scans, persisting results synchronously."""
+    settings.QUIPUCORDS_NETWORK_SINGLE_PASS_SCAN = True
+    mocker.patch.object(inspect, "InspectResultWriter", SyncWriter)
+    # keep the inventory as a dict so the fake ansible run can read it
+    mocker.patch.object(inspect, "write_to_yaml", side_effect=lambda inv: inv)
+    mocker.patch(
+        "scanner.network.post_process.process",
+        side_effect=lambda **kw: kw["fact_value"],
+    )
+    mocker.patch.object(InspectTaskRunner, "_persist_ansible_logs")
+
+
+class TestConnectInspectCallback:
+    """Test ConnectInspectCallback."""
+
+    @pytest.fixture
+    def result_store(self):
+        """Return a mocked ConnectResultStore."""
+        return Mock()
+
+    @pytest.fixture
+    def callback(self, result_store):
+        """Return a ConnectInspectCallback."""
+        return ConnectInspectCallback(result_store, Mock(), Mock())
+
+    @pytest.mark.parametrize("rc", (0, 1))
+    def test_command_records_connection_once(self, callback, result_store, rc):
+        """Test the first command run on a host records a successful connection."""
+        callback.event_callback(_started("host"))
+        result_store.record_result.assert_not_called()
+        callback.event_callback(_raw("host", rc))
+        callback.event_callback(_raw("host"))
+        callback.event_callback(_ok("host", fact="value"))
+        result_store.record_result.assert_called_once_with(
+            "host", callback.source, callback.credential, SystemConnectionResult.SUCCESS
+        )
+
+    def test_controller_tasks_dont_record_connection(self, callback, result_store):
+        """Test set_fact results, which need no connection, don't prove one."""
+        callback.event_callback(_started("host"))
+        callback.event_callback(_event("runner_on_failed", "host", {"msg": "error"}))
+        result_store.record_result.assert_not_called()
+        assert list(callback.iter_results()) == []
+
+    def test_permission_denied_keeps_host(self, callback, result_store):
+        """Test a host rejecting the credential is left for the next credential."""
+        callback.event_callback(_started("host"))
+        callback.event_callback(_unreachable("host", "Permission denied (publickey)"))
+        result_store.record_result.assert_not_called()
+        assert "host" not in callback._unreachable_hosts
+        assert list(callback.iter_results()) == []
+
+    def test_unreachable(self, callback, result_store):
+        """Test an unreachable host is recorded as such."""
+        callback.event_callback(_unreachable("host", "No route to host"))
+        result_store.record_result.assert_called_once_with(
+            "host",
+            callback.source,
+            callback.credential,
+            SystemConnectionResult.UNREACHABLE,
+        )
+
+    def test_unreachable_after_connecting(self, callback, result_store):
+        """Test a host lost in the middle of the scan stays connected."""
+        callback.event_callback(_raw("host"))
+        callback.event_callback(_ok("host", fact="value"))
+        callback.event_callback(_unreachable("host", "Connection reset"))
+        result_store.record_result.assert_called_once()
+        assert [r.status for r in callback.iter_results()] == [
+            InspectResult.UNREACHABLE
+        ]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "chunk_size,run_count",
+    (
+        (1000, 2),  # one inspect run per credential
+        (3, 3),  # the first credential tries 4 hosts, in chunks of 3 and 1
+    ),
+)
+def test_connect_and_inspect(  # noqa: PLR0913
+    mocker, settings, single_pass, network_source, credentials, chunk_size, run_count
+):
+    """Test hosts are inspected in the run that finds their credential."""
+    settings.QUIPUCORDS_NETWORK_SINGLE_PASS_CHUNK_SIZE = chunk_size
+    # 10.0.0.1 accepts the first credential, 10.0.0.2 the second one,
+    # 10.0.0.3 is unreachable, and 10.0.0.4 accepts none of them
+    accepted_by = {"10.0.0.1": "first", "10.0.0.2": "second"}
+
+    def run(*, inventory, extravars, event_handler, **kwargs):
+        for host, host_vars in _inventory_hosts(
+            inventory, extravars["variable_host"]
+        ).items():
+            event_handler(_started(host))
+            if host == "10.0.0.3":
+                event_handler(_unreachable(host, "No route to host"))
+            elif accepted_by.get(host) != host_vars["ansible_user"]:
+                event_handler(_unreachable(host, "Permission denied"))
+            else:
+                event_handler(_raw(host))
+                event_handler(_ok(host, connection_host=host))
+                event_handler(_ok(host, host_done=True))
+        return Mock(status="successful")
+
+    ansible_run = mocker.patch.object(inspect.ansible_runner, "run", side_effect=run)
+    connect = mocker.patch.object(inspect, "_connect")
+    scan_job, scan_task = create_scan_job(network_source)
+
+    message, status = InspectTaskRunner(scan_job, scan_task).run()
+
+    assert status == ScanTask.COMPLETED
+    assert message == "1 systems could not be scanned."
+    connect.assert_not_called()
+    assert ansible_run.call_count == run_count
+    connections = {
+        result.name: (result.status, result.credential)
+        for result in scan_task.connection_result.systems.all()
+    }
+    assert connections == {
+        "10.0.0.1": (SystemConnectionResult.SUCCESS, credentials[0]),
+        "10.0.0.2": (SystemConnectionResult.SUCCESS, credentials[1]),
+        "10.0.0.3": (SystemConnectionResult.UNREACHABLE, credentials[0]),
+        "10.0.0.4": (SystemConnectionResult.FAILED, None),
+    }
+    results = dict(
+        InspectResult.objects.filter(inspect_group__tasks=scan_task).values_list(
+            "name", "status"
+        )
+    )
+    assert results == {
+        "10.0.0.1": InspectResult.SUCCESS,
+        "10.0.0.2": InspectResult.SUCCESS,
+    }
+    scan_task.refresh_from_db()
+    assert (
+        scan_task.systems_count,
+        scan_task.systems_scanned,
+        scan_task.systems_failed,
+        scan_task.systems_unreachable,
+    ) == (4, 2, 1, 1)
+
+
+@pytest.mark.django_db
+def test_connect_and_inspect_no_connection(mocker, single_pass, network_source):
+    """Test the scan fails when no host could be connected to."""
+
+    def run(*, inventory, extravars, event_handler, **kwargs):
+        for host in _inventory_hosts(inventory, extravars["variable_host"]):
+            event_handler(_started(host))
+            event_handler(_unreachable(host, "Permission denied"))
+        return Mock(status="unreachable")
+
+    mocker.patch.object(inspect.ansible_runner, "run", side_effect=run)
+    scan_job, scan_task = create_scan_job(network_source)
+
+    assert InspectTaskRunner(scan_job, scan_task).run() == (
+        "No successful connections",
+        ScanTask.FAILED,
+    )
+    assert set(
+        scan_task.connection_result.systems.values_list("status", flat=True)
+    ) == {SystemConnectionResult.FAILED}
+
+
+# Latency model for the benchmark, scaled down 100x from typical values: an
+# ansible-playbook startup (2s), an SSH handshake (1s), and running the inspect
+# roles on a host (3s). Hosts of one run are handled `forks` at a time.
+PLAYBOOK_STARTUP = 0.02
+SSH_HANDSHAKE = 0.01
+INSPECT_WORK = 0.03
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+@pytest.mark.parametrize("single_pass_scan", (False, True))
+def test_benchmark_1k_hosts(mocker, settings, single_pass_scan, capsys):
+    """Compare scan durations of both modes over 1000 simulated hosts."""
+    settings.QUIPUCORDS_NETWORK_SINGLE_PASS_SCAN = single_pass_scan
+    mocker.patch.object(inspect, "InspectResultWriter", SyncWriter)
+    mocker.patch.object(inspect, "write_to_yaml", side_effect=lambda inv: inv)
+    mocker.patch(
+        "scanner.network.post_process.process",
+        side_effect=lambda **kw: kw["fact_value"],
+    )
+    mocker.patch.object(InspectTaskRunner, "_persist_ansible_logs")
+    forks = 25
+
+    def run(*, inventory, extravars, event_handler, playbook, **kwargs):
+        hosts = list(_inventory_hosts(inventory, extravars["variable_host"]))
+        per_host = SSH_HANDSHAKE
+        if playbook.endswith("inspect.yml"):
+            per_host += INSPECT_WORK
+        time.sleep(PLAYBOOK_STARTUP + math.ceil(len(hosts) / forks) * per_host)
+        for host in hosts:
+            if playbook.endswith("connect.yml"):
+                event_handler(_event("runner_on_ok", host, {"rc": 0}))
+            else:
+                event_handler(_ok(host, connection_host=host))
+                event_handler(_ok(host, host_done=True))
+        return Mock(status="successful")
+
+    ansible_run = mocker.patch.object(inspect.ansible_runner, "run", side_effect=run)
+    source = Source.objects.create(
+        name="benchmark", port=22, hosts=["10.0.[0:3].[1:250]"]
+    )
+    source.credentials.add(
+        Credential.objects.create(
+            name="benchmark", cred_type=DataSources.NETWORK, username="user"
+        )
+    )
+    scan_job, scan_task = create_scan_job(source, scan_options={"max_concurrency": 25})
+
+    start = time.monotonic()
+    _, status = InspectTaskRunner(scan_job, scan_task).run()
+    duration = time.monotonic() - start
+
+    assert status == ScanTask.COMPLETED
+    assert InspectResult.objects.filter(inspect_group__tasks=scan_task).count() == 1000
+    # connect and inspect take one ansible run per group of hosts each
+    assert ansible_run.call_count == (40 if single_pass_scan else 80)
+    with capsys.disabled():
+        print(  # noqa: T201
+            f"\nsingle_pass={single_pass_scan}: 1000 hosts scanned in"
+            f" {duration:.2f}s with {ansible_run.call_count} ansible runs"
+        )
@@ -0,0 +1,89 @@
+"""Test the post processing of network inspect facts."""
+
+import logging
+from unittest.mock import Mock
+
+import pytest
+
+from scanner.network.inspect_callback import AnsibleResults
+from scanner.network.post_process import PostProcessPool, process_host_facts
+
+LOCATE_JAR = "jboss_eap_locate_jboss_modules_jar"
+
+
+def host_results(host, have_locate=True):
+    """Build the results of a host with a fact depending on another."""
+    return AnsibleResults(
+        host=host,
+        status="success",
+        facts={
+            "internal_have_locate": have_locate,
+            LOCATE_JAR: {
+                "rc": 0,
+                "stdout_lines": [f"/opt/{host}/jboss-modules.jar", ""],
+            },
+            "uname_hostname": host,
+        },
+    )
+
+
+def expected_facts(host, have_locate=True):
+    """Get the processed facts of host_results."""
+    return {
+        "internal_have_locate": have_locate,
+        LOCATE_JAR: [f"/opt/{host}/jboss-modules.jar"] if have_locate else None,
+        "uname_hostname": host,
+    }
+
+
+def test_process_host_facts_dependencies():
+    """Test facts are processed with the facts processed before them."""
+    scan_task = Mock()
+    results = host_results("host1", have_locate=False)
+    assert process_host_facts(scan_task, results.host, results.facts) == (
+        expected_facts("host1", have_locate=False)
+    )
+    scan_task.log_message.assert_called_once_with(
+        f"POST PROCESSING MISSING REQ DEP host1. Fact {LOCATE_JAR}"
+        " missing dependency internal_have_locate",
+        log_level=logging.DEBUG,
+    )
+
+
+@pytest.mark.parametrize("workers", (0, 2))
+def test_pool_processes_hosts_in_order(workers):
+    """Test the pool processes each host like inline, replaying its messages."""
+    scan_task = Mock()
+    results = [
+        host_results("host1"),
+        host_results("host2", have_locate=False),
+        host_results("host3"),
+    ]
+    with PostProcessPool(scan_task, workers) as pool:
+        assert pool.process(results) == [
+            expected_facts("host1"),
+            expected_facts("host2", have_locate=False),
+            expected_facts("host3"),
+        ]
+    messages = [call.args[0] for call in scan_task.log_message.call_args_list]
+    assert messages == [
+        f"POST PROCESSING MISSING REQ DEP host2. Fact {LOCATE_JAR}"
+        " missing dependency internal_have_locate"
+    ]
+
+
+def test_pool_falls_back_inline(mocker):
+    """Test hosts are processed inline when the pool can't start processes."""
+    scan_task = Mock()
+    results = [host_results("host1"), host_results("host2")]
+    with PostProcessPool(scan_task, 2) as pool:
+        mocker.patch.object(
+            pool._executor, "submit", side_effect=AssertionError("daemonic")
+        )
+        assert pool.process(results) == [
+            expected_facts("host1"),
+            expected_facts("host2"),
+        ]
+        assert pool._executor is None
+    message = scan_task.log_message.call_args.args[0]
+    assert message.startswith("POST PROCESSING POOL FAILED")
@@ -0,0 +1,82 @@
+"""Test the TCP probe of network hosts."""
+
+import socket
+
+import pytest
+
+from api.models import ScanTask, Source, SystemConnectionResult
+from constants import DataSources
+from scanner.network import inspect
+from scanner.network.inspect import ConnectResultStore, run_with_result_store
+from scanner.network.probe import probe_hosts
+from tests.factories import CredentialFactory
+from tests.scanner.test_util import create_scan_job
+
+
+@pytest.fixture
+def listening_port():
+    """Listen on a local port, returning the port number."""
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        yield listener.getsockname()[1]
+
+
+@pytest.fixture
+def closed_port():
+    """Return a local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_probe_hosts(listening_port):
+    """Test only the hosts accepting connections on the port are returned."""
+    hosts = ["127.0.0.1", "name.invalid"]
+    assert probe_hosts(hosts, listening_port, concurrency=2, timeout=5) == {"127.0.0.1"}
+
+
+@pytest.mark.parametrize("host", ("a" * 300, "a..b", "null\x00char"))
+def test_probe_invalid_hostname(closed_port, host):
+    """Test hosts whose name can't be probed are kept, not taken for dead."""
+    assert probe_hosts([host], closed_port, concurrency=1, timeout=5) == {host}
+
+
+def test_probe_closed_port(closed_port):
+    """Test hosts refusing connections are left out."""
+    assert probe_hosts(["127.0.0.1"], closed_port, concurrency=10, timeout=5) == set()
+
+
+@pytest.mark.django_db
+def test_unresponsive_hosts_are_unreachable(listening_port, settings, mocker):
+    """Test only the hosts answering the probe are given to the connect runs."""
+    settings.QUIPUCORDS_NETWORK_TCP_PROBE = True
+    source = Source.objects.create(
+        name="probed-source", port=listening_port, hosts=["127.0.0.1", "name.invalid"]
+    )
+    source.credentials.add(CredentialFactory(cred_type=DataSources.NETWORK))
+    scan_job, scan_task = create_scan_job(source, scan_name="probed-scan")
+    connected_hosts = []
+
+    def fake_connect(*, hosts, result_store, credential, **kwargs):
+        for host in hosts:
+            connected_hosts.append(host)
+            result_store.record_result(
+                host, source, credential, SystemConnectionResult.SUCCESS
+            )
+        return None, ScanTask.COMPLETED
+
+    mocker.patch.object(inspect, "_connect", side_effect=fake_connect)
+    result_store = ConnectResultStore(scan_task)
+    assert run_with_result_store(scan_task, scan_job, result_store) == (
+        None,
+        ScanTask.COMPLETED,
+    )
+
+    assert connected_hosts == ["127.0.0.1"]
+    assert dict(scan_task.connection_result.systems.values_list("name", "status")) == {
+        "127.0.0.1": SystemConnectionResult.SUCCESS,
+        "name.invalid": SystemConnectionResult.UNREACHABLE,
+    }
+    scan_task.refresh_from_db()
+    assert (scan_task.systems_scanned, scan_task.systems_unreachable) == (1, 1)
@@ -47,4 +47,9 @@ def test_check_all_roles_are_included(inspect_yml_path, path_to_playbooks):
         for playbook in path_to_playbooks.rglob("roles/*/tasks/main.yml")
     }
     inspect_data = _yaml_load(inspect_yml_path)
-    assert role_names == set(inspect_data[0]["roles"])
+    # roles are either listed by name or as a mapping (e.g. with a "when" condition)
+    included_roles = {
+        role["role"] if isinstance(role, dict) else role
+        for role in inspect_data[0]["roles"]
+    }
+    assert role_names == included_roles
@@ -0,0 +1,151 @@
+"""Test network scan tasks resume where an interrupted run left them."""
+
+from unittest.mock import Mock
+
+import pytest
+
+from api.models import InspectResult, ScanTask
+from scanner.network import inspect
+from scanner.network.inspect import InspectTaskRunner
+from tests.scanner.network.test_network_single_pass import SyncWriter
+from tests.scanner.test_util import create_scan_job
+
+HOSTS = [f"10.0.0.{i}" for i in range(1, 7)]
+
+
+class WorkerKilledError(BaseException):
+    """Stand for the worker being killed, which no `except Exception` handles."""
+
+
+class FakeAnsible:
+    """Fake the connect and inspect playbooks, dying at the given host."""
+
+    def __init__(self, kill_at=None):
+        """Die when the `kill_at` (playbook, host) is about to finish."""
+        self.kill_at = kill_at
+        self.connected = []
+        self.inspected = []
+
+    def run(self, *, playbook, inventory, extravars, event_handler, **kwargs):
+        """Emit the events of a successful run on every host of the run."""
+        children = inventory["all"]["children"]
+        groups = extravars["variable_host"].strip().split(":")
+        hosts = [host for group in groups for host in children[group]["hosts"]]
+        for host in hosts:
+            if playbook.endswith("connect.yml"):
+                if self.kill_at == ("connect", host):
+                    raise WorkerKilledError
+                self.connected.append(host)
+                self._emit(event_handler, host, {"rc": 0})
+                continue
+            self.inspected.append(host)
+            # a command run on the host, which records the single pass connection
+            self._emit(event_handler, host, {"rc": 0})
+            facts = {"connection_host": host}
+            self._emit(event_handler, host, {"ansible_facts": facts})
+            if self.kill_at == ("inspect", host):
+                raise WorkerKilledError
+            facts = {"host_done": True}
+            self._emit(event_handler, host, {"ansible_facts": facts})
+        return Mock(status="successful", rc=0, stats={})
+
+    @staticmethod
+    def _emit(event_handler, host, result):
+        event_handler(
+            {"event": "runner_on_ok", "event_data": {"host": host, "res": result}}
+        )
+
+
+@pytest.fixture
+def network_host_addresses():
+    """Scan HOSTS."""
+    return HOSTS
+
+
+@pytest.fixture
+def fake_ansible(mocker, settings):
+    """Patch the playbook runs with a FakeAnsible, resuming interrupted scans."""
+    settings.QUIPUCORDS_NETWORK_SCAN_RESUME = True
+    # results are written right away, as if the worker was killed much later
+    mocker.patch.object(inspect, "CONNECT_FLUSH_INTERVAL", 0)
+    mocker.patch.object(inspect, "InspectResultWriter", SyncWriter)
+    mocker.patch.object(inspect, "write_to_yaml", side_effect=lambda inv: inv)
+    mocker.patch(
+        "scanner.network.post_process.process",
+        side_effect=lambda **kw: kw["fact_value"],
+    )
+    mocker.patch.object(InspectTaskRunner, "_persist_ansible_logs")
+
+    def use(ansible: FakeAnsible):
+        mocker.patch.object(inspect.ansible_runner, "run", side_effect=ansible.run)
+        return ansible
+
+    return use
+
+
+def run_scan_task(scan_task_id):
+    """Run the scan task like a worker would, starting from the database."""
+    scan_task = ScanTask.objects.get(id=scan_task_id)
+    return InspectTaskRunner(scan_task.job, scan_task).run()
+
+
+def inspected_hosts(scan_task):
+    """List the host of each inspect result of the task."""
+    return sorted(
+        InspectResult.objects.filter(inspect_group__tasks=scan_task).values_list(
+            "name", flat=True
+        )
+    )
+
+
+def connected_hosts(scan_task):
+    """List the host of each connection result of the task."""
+    return sorted(scan_task.connection_result.systems.values_list("name", flat=True))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("single_pass", (False, True))
+def test_resume_after_worker_killed_during_inspect(
+    network_source, fake_ansible, settings, single_pass
+):
+    """Test no host inspected before the worker was killed is inspected again."""
+    settings.QUIPUCORDS_NETWORK_SINGLE_PASS_SCAN = single_pass
+    scan_job, scan_task = create_scan_job(
+        network_source, scan_options={"max_concurrency": 2}
+    )
+    fake_ansible(FakeAnsible(kill_at=("inspect", HOSTS[3])))
+    with pytest.raises(WorkerKilledError):
+        run_scan_task(scan_task.id)
+    assert inspected_hosts(scan_task) == HOSTS[:3]
+    # HOSTS[3] started, so it is connected even with single pass
+    assert connected_hosts(scan_task) == (HOSTS[:4] if single_pass else HOSTS)
+
+    ansible = fake_ansible(FakeAnsible())
+    assert run_scan_task(scan_task.id) == (None, ScanTask.COMPLETED)
+    assert ansible.connected == []
+    assert ansible.inspected == HOSTS[3:]
+    assert inspected_hosts(scan_task) == HOSTS
+    assert connected_hosts(scan_task) == HOSTS
+    scan_task.refresh_from_db()
+    assert (scan_task.systems_count, scan_task.systems_scanned) == (6, 6)
+    assert scan_task.systems_failed == scan_task.systems_unreachable == 0
+
+
+@pytest.mark.django_db
+def test_resume_after_worker_killed_during_connect(network_source, fake_ansible):
+    """Test hosts connected to before the worker was killed are not retried."""
+    scan_job, scan_task = create_scan_job(
+        network_source, scan_options={"max_concurrency": 2}
+    )
+    fake_ansible(FakeAnsible(kill_at=("connect", HOSTS[4])))
+    with pytest.raises(WorkerKilledError):
+        run_scan_task(scan_task.id)
+    assert connected_hosts(scan_task) == HOSTS[:4]
+    assert inspected_hosts(scan_task) == []
+
+    ansible = fake_ansible(FakeAnsible())
+    assert run_scan_task(scan_task.id) == (None, ScanTask.COMPLETED)
+    assert ansible.connected == HOSTS[4:]
+    assert ansible.inspected == HOSTS
+    assert connected_hosts(scan_task) == HOSTS
+    assert inspected_hosts(scan_task) == HOSTS
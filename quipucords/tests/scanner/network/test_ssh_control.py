@@ -0,0 +1,149 @@
+"""Test sharing SSH connections between the playbook runs of a network scan."""
+
+import socket
+from unittest.mock import Mock
+
+import pytest
+
+from api.models import Scan, ScanTask
+from scanner.network import inspect, ssh_control
+from scanner.network.inspect import InspectTaskRunner, _connect
+from scanner.network.ssh_control import (
+    SSHControl,
+    close_stale_connections,
+    control_socket_name,
+)
+from tests.scanner.test_util import create_scan_job
+
+pytestmark = pytest.mark.django_db  # all tests here require the database
+
+
+@pytest.fixture
+def control_dir(settings, tmp_path):
+    """Keep the SSH control directories in a temporary directory."""
+    settings.QUIPUCORDS_NETWORK_SSH_CONTROL_DIR = tmp_path
+    return tmp_path
+
+
+@pytest.fixture
+def scan_task(network_source):
+    """Return the scan task of a network source."""
+    _, scan_task = create_scan_job(network_source)
+    return scan_task
+
+
+def open_master(directory, host, port, user):
+    """Create a socket the way a ControlMaster connection would."""
+    sock = socket.socket(socket.AF_UNIX)
+    path = directory / control_socket_name(host, port, user)
+    path.unlink(missing_ok=True)
+    sock.bind(str(path))
+    return sock
+
+
+def test_control_directory(control_dir, scan_task):
+    """Test each task and shard of a scan job gets its own directory."""
+    control = SSHControl(scan_task, shard_index=2)
+    expected = control_dir / str(scan_task.job_id) / f"{scan_task.id}-2"
+    assert control.directory == expected
+    assert control.envvars["ANSIBLE_SSH_CONTROL_PATH_DIR"] == str(expected)
+    assert "ControlPersist=" in control.envvars["ANSIBLE_SSH_ARGS"]
+    assert SSHControl(scan_task).directory.name == str(scan_task.id)
+
+
+def test_handshakes(control_dir, scan_task, mocker):
+    """Test every new master connection of a host counts as a handshake."""
+    run = mocker.patch.object(ssh_control.subprocess, "run")
+    log_message = mocker.spy(scan_task, "log_message")
+    source = scan_task.source
+    port, user = source.port, source.credentials.first().username
+    host1, host2 = "10.0.0.1", "10.0.0.2"
+    with SSHControl(scan_task) as control:
+        # connect run
+        sockets = [
+            open_master(control.directory, host, port, user) for host in (host1, host2)
+        ]
+        control.record_sockets([host1, host2])
+        # inspect run: host1 reuses its connection, host2 connects again
+        sockets[1].close()
+        sockets.append(open_master(control.directory, host2, port, user))
+        control.record_sockets([host1, host2])
+        assert control.handshakes() == {host1: 1, host2: 2}
+    for sock in sockets:
+        sock.close()
+
+    assert not control.directory.exists()
+    assert run.call_count == 2
+    socket_names = {control_socket_name(host, port, user) for host in (host1, host2)}
+    assert {call.args[0][2] for call in run.call_args_list} == {
+        f"ControlPath={control.directory / name}" for name in socket_names
+    }
+    log_message.assert_any_call(
+        "SSH HANDSHAKES PER HOST: 1 hosts with 1, 1 hosts with 2."
+    )
+    log_message.assert_any_call(
+        f"SSH HANDSHAKES OF HOSTS CONNECTED MORE THAN ONCE: {{'{host2}': 2}}"
+    )
+
+
+def test_teardown_when_task_fails(control_dir, scan_task, settings, mocker):
+    """Test the control directory is removed even when the task fails."""
+    settings.QUIPUCORDS_NETWORK_SSH_MULTIPLEXING = True
+    runner = InspectTaskRunner(scan_task.job, scan_task)
+    directories = []
+
+    def execute_task():
+        directories.append(runner._ssh_control.directory)
+        assert directories[0].is_dir()
+        raise RuntimeError("boom")
+
+    mocker.patch.object(runner, "_execute_task", side_effect=execute_task)
+    with pytest.raises(RuntimeError):
+        runner.execute_task()
+    assert not directories[0].exists()
+    assert runner._ssh_control is None
+
+
+@pytest.mark.parametrize(
+    "status,is_active",
+    (
+        (ScanTask.RUNNING, True),
+        (ScanTask.PAUSED, True),
+        (ScanTask.COMPLETED, False),
+        (ScanTask.CANCELED, False),
+    ),
+)
+def test_close_stale_connections(control_dir, scan_task, mocker, status, is_active):
+    """Test the directories of scan jobs no longer active are removed."""
+    close_connections = mocker.patch.object(ssh_control, "close_connections")
+    job_directory = control_dir / str(scan_task.job_id) / str(scan_task.id)
+    stale = control_dir / "999999" / "1"
+    for directory in (job_directory, stale):
+        directory.mkdir(parents=True)
+    scan_task.job.status = status
+    scan_task.job.save()
+
+    close_stale_connections(control_dir)
+    closed = [call.args[0] for call in close_connections.call_args_list]
+    assert sorted(closed) == sorted([stale] + ([] if is_active else [job_directory]))
+    assert job_directory.is_dir() == is_active
+    assert not stale.parent.exists()
+
+
+def test_connect_uses_control_directory(control_dir, scan_task, mocker):
+    """Test connect runs use the control directory of the task."""
+    run = mocker.patch.object(inspect.ansible_runner, "run")
+    run.return_value.status = "successful"
+    source = scan_task.source
+    with SSHControl(scan_task) as control:
+        _connect(
+            scan_task=scan_task,
+            hosts=source.hosts,
+            result_store=Mock(connected_count=0),
+            credential=source.credentials.first(),
+            connection_port=source.port,
+            forks=Scan.DEFAULT_MAX_CONCURRENCY,
+            ssh_keyfile=None,
+            ssh_control=control,
+        )
+        assert run.call_args.kwargs["envvars"] == control.envvars
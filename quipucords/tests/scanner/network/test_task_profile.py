@@ -0,0 +1,116 @@
+"""Test the task profile of network scans."""
+
+import csv
+import json
+
+import pytest
+
+from scanner.network.inspect_callback import InspectCallback
+from scanner.network.task_profile import (
+    PROFILE_FIELDS,
+    append_task_profile,
+    summarize_task_profile,
+    task_profile_path,
+    write_task_profile_summary,
+)
+from tests.scanner.test_util import create_scan_job
+
+
+def task_event(event, host, role, task, duration):
+    """Build an ansible-runner event for a task result."""
+    return {
+        "event": event,
+        "event_data": {
+            "host": host,
+            "role": role,
+            "task": task,
+            "duration": duration,
+            "res": {},
+        },
+    }
+
+
+@pytest.mark.parametrize("enabled", (False, True))
+def test_callback_records_durations(settings, enabled):
+    """Test the callback adds up the durations of each host, role and task."""
+    settings.QUIPUCORDS_NETWORK_TASK_PROFILE = enabled
+    callback = InspectCallback()
+    for event in (
+        task_event("runner_on_ok", "host1", "uname", "gather uname", 1.5),
+        task_event("runner_on_skipped", "host1", "uname", "gather uname", 0.5),
+        task_event("runner_on_failed", "host2", "", "check sudo", 2),
+        # item results are already counted by the result of their task
+        task_event("runner_item_on_ok", "host1", "uname", "gather uname", 9),
+    ):
+        callback.event_callback(event)
+    if enabled:
+        assert callback.task_durations == {
+            ("host1", "uname", "gather uname"): 2.0,
+            ("host2", "", "check sudo"): 2,
+        }
+    else:
+        assert not callback.task_durations
+
+
+def test_summarize_task_profile():
+    """Test the profile is added up by role, task and host, slowest first."""
+    rows = [
+        {"host": "host1", "role": "uname", "task": "a", "seconds": "1"},
+        {"host": "host2", "role": "uname", "task": "a", "seconds": "2"},
+        {"host": "host2", "role": "uname", "task": "b", "seconds": "1.5"},
+        {"host": "host1", "role": "jboss_eap", "task": "c", "seconds": "5"},
+    ]
+    assert summarize_task_profile(rows) == {
+        "roles": [
+            {"role": "jboss_eap", "seconds": 5.0, "hosts": 1},
+            {"role": "uname", "seconds": 4.5, "hosts": 2},
+        ],
+        "tasks": [
+            {"role": "jboss_eap", "task": "c", "seconds": 5.0, "hosts": 1},
+            {"role": "uname", "task": "a", "seconds": 3.0, "hosts": 2},
+            {"role": "uname", "task": "b", "seconds": 1.5, "hosts": 1},
+        ],
+        "hosts": [
+            {"host": "host1", "seconds": 6.0},
+            {"host": "host2", "seconds": 3.5},
+        ],
+    }
+
+
+@pytest.mark.django_db
+def test_write_task_profile(network_source, mocker):
+    """Test the profile of each run is saved and summarized for the job."""
+    scan_job, scan_task = create_scan_job(network_source)
+    append_task_profile(scan_task, {("host1", "uname", "a"): 1.23456})
+    append_task_profile(
+        scan_task, {("host2", "uname", "a"): 2, ("host2", "uname", "b"): 3}
+    )
+    with task_profile_path(scan_job.id, "csv").open(newline="") as file_obj:
+        rows = list(csv.reader(file_obj))
+    assert rows == [
+        list(PROFILE_FIELDS),
+        [str(scan_task.id), "host1", "uname", "a", "1.235"],
+        [str(scan_task.id), "host2", "uname", "a", "2"],
+        [str(scan_task.id), "host2", "uname", "b", "3"],
+    ]
+
+    log_message = mocker.spy(scan_task, "log_message")
+    write_task_profile_summary(scan_task)
+    profile = json.loads(task_profile_path(scan_job.id, "json").read_text())
+    assert profile["roles"] == [{"role": "uname", "seconds": 6.235, "hosts": 2}]
+    assert [host["host"] for host in profile["hosts"]] == ["host2", "host1"]
+    messages = [call.args[0] for call in log_message.call_args_list]
+    assert messages == [
+        "TASK PROFILE slowest roles: uname=6.2s",
+        "TASK PROFILE slowest hosts: host2=5.0s, host1=1.2s",
+    ]
+
+
+@pytest.mark.django_db
+def test_write_task_profile_without_durations(network_source):
+    """Test nothing is written when no task was timed."""
+    scan_job, scan_task = create_scan_job(network_source)
+    append_task_profile(scan_task, {})
+    write_task_profile_summary(scan_task)
+    assert not task_profile_path(scan_job.id, "csv").exists()
+    assert not task_profile_path(scan_job.id, "json").exists()
@@ -0,0 +1,159 @@
+"""Test the network inspect result writer."""
+
+import threading
+
+import pytest
+
+from api.models import InspectGroup, InspectResult, RawFact
+from constants import DataSources
+from scanner.inspect_results import InspectResultBatch
+from scanner.network.inspect_callback import AnsibleResults
+from scanner.network.writer import InspectResultWriter
+from tests.factories import SourceFactory
+from tests.scanner.test_util import create_scan_job
+
+
+def _results(host):
+    return AnsibleResults(host=host, status=InspectResult.SUCCESS, facts={})
+
+
+def test_writer_persists_in_background_thread():
+    """Test results are persisted by the writer thread, in submission order."""
+    persisted = []
+
+    def persist(result):
+        persisted.append((result.host, threading.current_thread().name))
+
+    with InspectResultWriter(persist, max_pending=2) as writer:
+        for host in ("host1", "host2", "host3"):
+            writer.submit(_results(host))
+
+    assert persisted == [
+        ("host1", "inspect-result-writer"),
+        ("host2", "inspect-result-writer"),
+        ("host3", "inspect-result-writer"),
+    ]
+    assert writer.written == 3
+    assert writer.failed == 0
+
+
+def test_writer_keeps_going_after_errors(caplog):
+    """Test a failure to persist one host does not stop the writer."""
+    persisted = []
+
+    def persist(result):
+        if result.host == "bad":
+            raise ValueError("boom")
+        persisted.append(result.host)
+
+    with InspectResultWriter(persist, max_pending=1) as writer:
+        for host in ("good1", "bad", "good2"):
+            writer.submit(_results(host))
+
+    assert persisted == ["good1", "good2"]
+    assert writer.written == 2
+    assert writer.failed == 1
+    assert "[host=bad] Unexpected error persisting inspect results" in caplog.text
+
+
+def test_writer_is_bounded():
+    """Test submit blocks once max_pending results are waiting."""
+    release = threading.Event()
+
+    def persist(result):
+        release.wait()
+
+    writer = InspectResultWriter(persist, max_pending=1)
+    with writer:
+        writer.submit(_results("host1"))  # picked up by the writer, then blocks
+        writer.submit(_results("host2"))  # fills the queue
+        producer = threading.Thread(target=writer.submit, args=(_results("host3"),))
+        producer.start()
+        producer.join(timeout=0.2)
+        assert producer.is_alive()
+        release.set()
+        producer.join()
+    assert writer.written == 3
+
+
+def test_writer_persists_waiting_results_together():
+    """Test results waiting in the queue are persisted in batches."""
+    started, release = threading.Event(), threading.Event()
+    batches = []
+
+    def persist(*results):
+        started.set()
+        release.wait()
+        batches.append([result.host for result in results])
+
+    with InspectResultWriter(persist, max_pending=10, batch_size=3) as writer:
+        writer.submit(_results("host0"))
+        started.wait()
+        for index in range(1, 6):
+            writer.submit(_results(f"host{index}"))
+        release.set()
+
+    # host0 is picked up alone, the others were waiting for it
+    assert batches == [["host0"], ["host1", "host2", "host3"], ["host4", "host5"]]
+    assert writer.written == 6
+
+
+def test_writer_isolates_failing_result_of_batch(caplog):
+    """Test a batch that can't be persisted is retried one result at a time."""
+    started, release = threading.Event(), threading.Event()
+    persisted = []
+
+    def persist(*results):
+        started.set()
+        release.wait()
+        if "bad" in (result.host for result in results):
+            raise ValueError("boom")
+        persisted.extend(result.host for result in results)
+
+    with InspectResultWriter(persist, max_pending=10, batch_size=10) as writer:
+        writer.submit(_results("first"))
+        started.wait()
+        for host in ("good1", "bad", "good2"):
+            writer.submit(_results(host))
+        release.set()
+
+    assert persisted == ["first", "good1", "good2"]
+    assert (writer.written, writer.failed) == (3, 1)
+    assert "[host=bad] Unexpected error persisting inspect results" in caplog.text
+
+
+@pytest.mark.django_db(transaction=True)
+def test_writer_retry_persists_each_result_once():
+    """Test a batch failing midway persists nothing before its hosts are retried."""
+    _, scan_task = create_scan_job(SourceFactory(source_type=DataSources.NETWORK))
+    inspect_group = InspectGroup.objects.create(source=scan_task.source)
+    inspect_group.tasks.add(scan_task)
+    attempts = []
+
+    def persist(*results):
+        with InspectResultBatch(scan_task, inspect_group) as batch:
+            for result in results:
+                attempts.append(result.host)
+                if result.host == "host2" and len(results) > 1:
+                    raise ValueError("boom")
+                batch.add(result.host, result.status, {"fact": result.host})
+
+    writer = InspectResultWriter(persist, max_pending=10, batch_size=10)
+    # queued before the writer starts, so all 3 are persisted together
+    for host in ("host1", "host2", "host3"):
+        writer.submit(_results(host))
+    with writer:
+        pass
+
+    assert attempts == ["host1", "host2", "host1", "host2", "host3"]
+    assert (writer.written, writer.failed) == (3, 0)
+    assert sorted(inspect_group.inspect_results.values_list("name", flat=True)) == [
+        "host1",
+        "host2",
+        "host3",
+    ]
+    assert (
+        RawFact.objects.filter(inspect_result__inspect_group=inspect_group).count() == 3
+    )
+    scan_task.refresh_from_db()
+    assert (scan_task.systems_scanned, scan_task.systems_failed) == (3, 0)
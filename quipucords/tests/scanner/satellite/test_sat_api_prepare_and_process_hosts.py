@@ -1,9 +1,10 @@
-"""Test SatelliteInterface._prepare_and_process_hosts when Celery is enabled."""
+"""Test SatelliteInterface._prepare_and_process_hosts."""
 
-from unittest.mock import Mock, patch
+import threading
+import time
+from unittest.mock import Mock, call, patch
 
 import pytest
-from django.test import override_settings
 
 from api.scantask.model import ScanTask
 from constants import DataSources
@@ -13,13 +14,15 @@ from tests.factories import ScanTaskFactory
 
 def fake_six_request_host_details(  # noqa: PLR0913
     *,
-    scan_task_id,
-    logging_options,
     host_id,
     host_name,
-    fields_url,
-    subs_url,
-    request_options,
+    scan_task_id=None,
+    logging_options=None,
+    fields_url=None,
+    subs_url=None,
+    request_options=None,
+    host_fields_json=None,
+    request_subscriptions=True,
 ):
     """Generate a fake response for a call to Satellite 6 style request_host_details.
 
@@ -85,47 +88,26 @@ def inspect_scan_job():
     return connect_task.job
 
 
-@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
-@pytest.mark.django_db(transaction=True)
-def test__prepare_and_process_hosts_using_celery(
+@pytest.mark.django_db
+def test__prepare_and_process_hosts(
     mock_prepare_hosts,
     mock__request_host_details,
-    celery_worker,
     inspect_scan_job,
-    faker,
+    settings,
 ):
-    """Test SatelliteInterface._prepare_and_process_hosts Celery task interaction.
+    """Test SatelliteInterface._prepare_and_process_hosts processes chunks in order.
 
     This test uses the SatelliteSixV2 implementation of SatelliteInterface, but the same
     logic should also apply to SatelliteSixV1 because the code relevant to
     this test's behavior lives in the parent SatelliteInterface class.
-
-    We use the celery_worker fixture here to embed a live worker because we are
-    interested specifically in verifying that the Celery tasks are invoked as expected.
-    We patch out their inner implementations, though, because they would normally make
-    external API calls.
     """
+    settings.QUIPUCORDS_INSPECT_RESULT_BATCH_SIZE = 2
     inspect_scan_task = inspect_scan_job.tasks.first()
     satellite = six.SatelliteSixV2(inspect_scan_job, inspect_scan_task)
 
-    hosts = [
-        {"name": "host_a", "id": 1},
-        {"name": "host_b", "id": 2},
-        {"name": "host_c", "id": 3},
-    ]
-
-    expected_prepare_host_return = [
-        # All these Nones are just to fill out the function signature.
-        # Since we are patching, we do not need to supply real values for everything.
-        fake_six_request_host_details(
-            scan_task_id=faker.pyint(),
-            logging_options=None,
-            host_id=host["id"],
-            host_name=host["name"],
-            fields_url=None,
-            subs_url=None,
-            request_options=None,
-        )
+    hosts = [{"name": f"host_{host_id}", "id": host_id} for host_id in range(1, 6)]
+    expected_results = [
+        fake_six_request_host_details(host_id=host["id"], host_name=host["name"])
         for host in hosts
     ]
 
@@ -136,4 +118,67 @@ def test__prepare_and_process_hosts_using_celery(
 
     mock_prepare_hosts.assert_called_once()
     assert mock__request_host_details.call_count == len(hosts)
-    mock_process_results.assert_called_once_with(results=expected_prepare_host_return)
+    assert mock_process_results.call_args_list == [
+        call(results=expected_results[:2]),
+        call(results=expected_results[2:4]),
+        call(results=expected_results[4:]),
+    ]
+
+
+@pytest.mark.django_db
+def test__prepare_and_process_hosts_max_concurrency(
+    mock_prepare_hosts,
+    mock__request_host_details,
+    inspect_scan_job,
+):
+    """Test no more than max_concurrency hosts are requested at once."""
+    inspect_scan_task = inspect_scan_job.tasks.first()
+    satellite = six.SatelliteSixV2(inspect_scan_job, inspect_scan_task)
+    satellite.max_concurrency = 2
+
+    lock = threading.Lock()
+    in_flight = []
+    max_in_flight = 0
+
+    def request_host_details(**kwargs):
+        nonlocal max_in_flight
+        with lock:
+            in_flight.append(kwargs["host_id"])
+            max_in_flight = max(max_in_flight, len(in_flight))
+        time.sleep(0.01)
+        with lock:
+            in_flight.remove(kwargs["host_id"])
+        return fake_six_request_host_details(**kwargs)
+
+    mock__request_host_details.side_effect = request_host_details
+    hosts = [{"name": f"host_{host_id}", "id": host_id} for host_id in range(10)]
+    mock_process_results = Mock()
+    satellite._prepare_and_process_hosts(
+        hosts, six.request_host_details, mock_process_results
+    )
+
+    assert max_in_flight == 2  # noqa: PLR2004
+    (processed,) = mock_process_results.call_args_list
+    assert [result["unique_name"] for result in processed.kwargs["results"]] == [
+        f"{host['id']}-unique_name" for host in hosts
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test__prepare_and_process_hosts_error(
+    mock_prepare_hosts,
+    mock__request_host_details,
+    inspect_scan_job,
+):
+    """Test an unexpected error requesting a host is handled like in a Celery task."""
+    inspect_scan_task = inspect_scan_job.tasks.first()
+    satellite = six.SatelliteSixV2(inspect_scan_job, inspect_scan_task)
+    mock__request_host_details.side_effect = RuntimeError("boom")
+    mock_process_results = Mock()
+
+    satellite._prepare_and_process_hosts(
+        [{"name": "host_a", "id": 1}], six.request_host_details, mock_process_results
+    )
+
+    # set_scan_task_failure_on_exception fails the scan task of fake_prepare_hosts
+    mock_process_results.assert_called_once_with(results=[(False, 42, ScanTask.FAILED)])
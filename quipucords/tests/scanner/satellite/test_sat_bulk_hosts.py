@@ -0,0 +1,145 @@
+"""Test the bulk collection of Satellite 6 host details."""
+
+import pytest
+import requests_mock
+
+from api.models import Credential, InspectResult, Source
+from constants import DataSources
+from scanner.satellite.six import (
+    FACT_VALUES_V2_URL,
+    HOSTS_FIELDS_V2_URL,
+    HOSTS_SUBS_V2_URL,
+    HOSTS_V2_URL,
+    BulkApiCalls,
+    SatelliteSixV2,
+)
+from scanner.satellite.utils import construct_url
+from tests.scanner.test_util import create_scan_job
+
+SAT_HOST = "1.2.3.4"
+
+GUEST_FACTS = {
+    "virt::is_guest": "true",
+    "cpu::cpu(s)": "2",
+    "net::interface::eth0::ipv4_address": "10.0.0.1",
+}
+
+
+@pytest.fixture
+def satellite(settings):
+    """Create a SatelliteSixV2 interface collecting host details in bulk."""
+    settings.QUIPUCORDS_SATELLITE_BULK_HOSTS = True
+    settings.QUIPUCORDS_SATELLITE_BULK_PER_PAGE = 2
+    credential = Credential.objects.create(
+        name="cred1",
+        cred_type=DataSources.SATELLITE,
+        username="username",
+        password="password",
+    )
+    source = Source.objects.create(
+        name="source1",
+        source_type=DataSources.SATELLITE,
+        port=443,
+        hosts=[SAT_HOST],
+    )
+    source.credentials.add(credential)
+    scan_job, scan_task = create_scan_job(source)
+    return SatelliteSixV2(scan_job, scan_task)
+
+
+def url(template, **kwargs):
+    """Format a Satellite url template."""
+    return construct_url(template, SAT_HOST, **kwargs)
+
+
+def test_bulk_api_calls_summary():
+    """Test the API calls are compared with those requesting each host."""
+    api_calls = BulkApiCalls(hosts=1000, pages=3, host_details=200)
+    assert api_calls.summary() == (
+        "SATELLITE BULK HOSTS 1000 host(s) in 203 API call(s):"
+        " 203 per 1k hosts instead of 2010 requesting the details of each host"
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bulk_hosts_facts(satellite, mocker):
+    """Test only the details missing from the list pages are requested per host."""
+    guest = {
+        "id": 1,
+        "name": "guest",
+        "operatingsystem_name": "RedHat 9.2",
+        "subscription_facet_attributes": {"uuid": "uuid-guest"},
+    }
+    unknown_facts = {"id": 2, "name": "unknown-facts"}
+    hypervisor = {
+        "id": 3,
+        "name": "hypervisor",
+        "subscription_facet_attributes": {"uuid": "uuid-hypervisor"},
+    }
+    log_message = mocker.spy(satellite.inspect_scan_task, "log_message")
+    with requests_mock.Mocker() as satellite_api:
+        satellite_api.get(
+            url(FACT_VALUES_V2_URL) + "?page=1",
+            json={
+                "subtotal": 3,
+                "per_page": 2,
+                "results": {"guest": GUEST_FACTS, "hypervisor": {"cpu::cpu(s)": "8"}},
+            },
+        )
+        satellite_api.get(
+            url(FACT_VALUES_V2_URL) + "?page=2",
+            json={
+                "subtotal": 3,
+                "per_page": 2,
+                "results": {"hypervisor": {"virt::is_guest": "false"}},
+            },
+        )
+        satellite_api.get(
+            url(HOSTS_V2_URL) + "?page=1",
+            json={"subtotal": 3, "per_page": 2, "results": [guest, unknown_facts]},
+        )
+        satellite_api.get(
+            url(HOSTS_V2_URL) + "?page=2",
+            json={"subtotal": 3, "per_page": 2, "results": [hypervisor]},
+        )
+        satellite_api.get(
+            url(HOSTS_FIELDS_V2_URL, host_id=2),
+            json={"name": "unknown-facts", "facts": {"cpu::cpu(s)": "4"}},
+        )
+        satellite_api.get(
+            url(HOSTS_FIELDS_V2_URL, host_id=3),
+            json={**hypervisor, "virtual_guests": [{"name": "guest"}]},
+        )
+        for host_id in (1, 3):
+            satellite_api.get(
+                url(HOSTS_SUBS_V2_URL, host_id=host_id),
+                json={"results": [{"product_name": f"product{host_id}"}]},
+            )
+        satellite.hosts_facts()
+        requested = [request.path for request in satellite_api.request_history]
+
+    # the 2 pages of fact values and of hosts come first
+    assert sorted(requested[4:]) == [
+        "/api/v2/hosts/1/subscriptions",
+        "/api/v2/hosts/2",
+        "/api/v2/hosts/3",
+        "/api/v2/hosts/3/subscriptions",
+    ]
+    facts = {
+        result.name: {fact.name: fact.value for fact in result.facts.all()}
+        for result in InspectResult.objects.filter(
+            inspect_group__tasks=satellite.inspect_scan_task
+        )
+    }
+    assert facts["guest_1"]["cores"] == "2"
+    assert facts["guest_1"]["ip_addresses"] == ["10.0.0.1"]
+    assert facts["guest_1"]["os_release"] == "RedHat 9.2"
+    assert facts["guest_1"]["entitlements"][0]["name"] == "product1"
+    assert facts["unknown-facts_2"]["cores"] == "4"
+    assert facts["unknown-facts_2"]["entitlements"] == []
+    assert facts["hypervisor_3"]["num_virtual_guests"] == 1
+    # pages of 2 hosts don't pay off, unlike pages of the default size
+    assert (
+        "SATELLITE BULK HOSTS 3 host(s) in 8 API call(s):"
+        " 2667 per 1k hosts instead of 2333 requesting the details of each host"
+    ) in [call.args[0] for call in log_message.call_args_list]
@@ -0,0 +1,224 @@
+"""Test the incremental scans of Satellite 6 sources."""
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+import requests_mock
+
+from api.models import (
+    Credential,
+    InspectGroup,
+    InspectResult,
+    RawFact,
+    ScanTask,
+    Source,
+)
+from constants import DataSources
+from scanner.satellite import incremental
+from scanner.satellite.incremental import CARRIED_FORWARD, get_previous_scan
+from scanner.satellite.six import (
+    HOSTS_FIELDS_V2_URL,
+    HOSTS_SUBS_V2_URL,
+    HOSTS_V2_URL,
+    SatelliteSixV2,
+)
+from scanner.satellite.utils import construct_url
+from tests.scanner.test_util import create_scan_job
+
+SAT_HOST = "1.2.3.4"
+
+
+@pytest.fixture
+def source():
+    """Create a Satellite source."""
+    credential = Credential.objects.create(
+        name="cred1",
+        cred_type=DataSources.SATELLITE,
+        username="username",
+        password="password",
+    )
+    source = Source.objects.create(
+        name="source1",
+        source_type=DataSources.SATELLITE,
+        port=443,
+        hosts=[SAT_HOST],
+    )
+    source.credentials.add(credential)
+    return source
+
+
+def create_previous_scan(source, start_time, results):
+    """Create a completed scan of the source with the given results and facts."""
+    _, scan_task = create_scan_job(source, scan_name=f"scan {start_time}")
+    ScanTask.objects.filter(id=scan_task.id).update(
+        status=ScanTask.COMPLETED, start_time=start_time
+    )
+    inspect_group = InspectGroup.objects.create(
+        source_type=source.source_type,
+        source_name=source.name,
+        server_id="server",
+        server_version="1.0",
+        source=source,
+    )
+    inspect_group.tasks.add(scan_task)
+    ids = {}
+    for name, (status, facts) in results.items():
+        inspect_result = InspectResult.objects.create(
+            name=name, status=status, inspect_group=inspect_group
+        )
+        for fact_name, value in facts.items():
+            RawFact.objects.create(
+                name=fact_name, value=value, inspect_result=inspect_result
+            )
+        ids[name] = inspect_result.id
+    return ids
+
+
+def test_updated_since_search():
+    """Test the search of updated hosts uses UTC timestamps."""
+    since = datetime(2026, 10, 16, 14, 30, tzinfo=UTC) + timedelta(microseconds=5)
+    assert incremental.updated_since_search(since) == (
+        'last_checkin > "2026-10-16 14:30:00 UTC"'
+        ' or updated_at > "2026-10-16 14:30:00 UTC"'
+    )
+
+
+@pytest.mark.django_db
+def test_previous_scan_full_refresh_due(source, settings):
+    """Test the last full scan is remembered through incremental scans."""
+    settings.QUIPUCORDS_SATELLITE_FULL_REFRESH_DAYS = 7
+    now = datetime.now(UTC)
+    last_full_scan = now - timedelta(days=8)
+    create_previous_scan(source, last_full_scan, {})
+    create_previous_scan(
+        source,
+        now - timedelta(days=1),
+        {
+            "host_1": (
+                InspectResult.SUCCESS,
+                {CARRIED_FORWARD: {"last_full_scan": last_full_scan.isoformat()}},
+            )
+        },
+    )
+    _, scan_task = create_scan_job(source)
+
+    previous = get_previous_scan(scan_task)
+    assert previous.start_time == now - timedelta(days=1)
+    assert previous.last_full_scan == last_full_scan
+    assert previous.full_refresh_due(now)
+    assert not previous.full_refresh_due(now - timedelta(days=2))
+
+
+@pytest.mark.django_db
+def test_no_previous_scan(source):
+    """Test a source never scanned successfully has no previous scan."""
+    _, scan_task = create_scan_job(source)
+    assert get_previous_scan(scan_task) is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_incremental_hosts_facts(source, settings, mocker):
+    """Test only updated and new hosts are requested, the others carried forward."""
+    settings.QUIPUCORDS_SATELLITE_INCREMENTAL_SCAN = True
+    previous_start = datetime.now(UTC) - timedelta(days=1)
+    previous_ids = create_previous_scan(
+        source,
+        previous_start,
+        {
+            "unchanged_1": (InspectResult.SUCCESS, {"cores": 2}),
+            "updated_2": (InspectResult.SUCCESS, {"cores": 4}),
+            "failed_3": (InspectResult.FAILED, {}),
+            "deleted_4": (InspectResult.SUCCESS, {"cores": 8}),
+        },
+    )
+    scan_job, scan_task = create_scan_job(source)
+    satellite = SatelliteSixV2(scan_job, scan_task)
+    log_message = mocker.spy(scan_task, "log_message")
+    hosts = [
+        {"id": 1, "name": "unchanged"},
+        {"id": 2, "name": "updated"},
+        {"id": 3, "name": "failed"},
+        {"id": 5, "name": "new"},
+    ]
+    searches = []
+
+    def list_hosts(request, context):
+        search = request.qs.get("search")
+        searches.append(search)
+        if search:
+            return {"per_page": 100, "results": [hosts[1], hosts[3]]}
+        return {"per_page": 100, "results": hosts}
+
+    with requests_mock.Mocker() as satellite_api:
+        satellite_api.get(construct_url(HOSTS_V2_URL, SAT_HOST), json=list_hosts)
+        for host in hosts[1:]:
+            satellite_api.get(
+                construct_url(HOSTS_FIELDS_V2_URL, SAT_HOST, host_id=host["id"]),
+                json={**host, "facts": {"cpu::cpu(s)": "16"}},
+            )
+            satellite_api.get(
+                construct_url(HOSTS_SUBS_V2_URL, SAT_HOST, host_id=host["id"]),
+                json={"results": []},
+            )
+        satellite.hosts_facts()
+        requested = sorted(
+            request.path
+            for request in satellite_api.request_history
+            if request.path != "/api/v2/hosts"
+        )
+
+    assert requested == [
+        "/api/v2/hosts/2",
+        "/api/v2/hosts/2/subscriptions",
+        "/api/v2/hosts/3",
+        "/api/v2/hosts/3/subscriptions",
+        "/api/v2/hosts/5",
+        "/api/v2/hosts/5/subscriptions",
+    ]
+    since = (previous_start - incremental.CLOCK_SKEW_MARGIN).strftime(
+        "%Y-%m-%d %H:%M:%S UTC"
+    )
+    # query strings are lower cased by requests_mock
+    assert searches[0] == [
+        f'last_checkin > "{since}" or updated_at > "{since}"'.lower()
+    ]
+    facts = {
+        result.name: {fact.name: fact.value for fact in result.facts.all()}
+        for result in InspectResult.objects.filter(inspect_group__tasks=scan_task)
+    }
+    assert sorted(facts) == ["failed_3", "new_5", "unchanged_1", "updated_2"]
+    assert facts["unchanged_1"] == {
+        "cores": 2,
+        CARRIED_FORWARD: {
+            "inspect_result_id": previous_ids["unchanged_1"],
+            "collected_at": previous_start.isoformat(),
+            "last_full_scan": previous_start.isoformat(),
+        },
+    }
+    for name in ("updated_2", "failed_3", "new_5"):
+        assert facts[name]["cores"] == "16"
+        assert CARRIED_FORWARD not in facts[name]
+    scan_task.refresh_from_db()
+    assert scan_task.systems_scanned == 4  # noqa: PLR2004
+    assert (
+        "SATELLITE INCREMENTAL SCAN requested 3 host(s) updated since"
+        f" {(previous_start - incremental.CLOCK_SKEW_MARGIN).isoformat()},"
+        " carried 1 forward"
+    ) in [call.args[0] for call in log_message.call_args_list]
+
+
+@pytest.mark.django_db
+def test_incremental_scan_falls_back_to_full_scan(source, settings, mocker):
+    """Test all hosts are requested when there is no previous scan."""
+    settings.QUIPUCORDS_SATELLITE_INCREMENTAL_SCAN = True
+    scan_job, scan_task = create_scan_job(source)
+    satellite = SatelliteSixV2(scan_job, scan_task)
+    full_scan = mocker.patch("scanner.satellite.six.SatelliteSix.hosts_facts")
+    log_message = mocker.spy(scan_task, "log_message")
+    satellite.hosts_facts()
+    full_scan.assert_called_once_with()
+    log_message.assert_called_once_with(
+        "SATELLITE INCREMENTAL SCAN skipped, no previous successful scan of the"
+        " source: requesting all hosts",
+        log_level=20,
+    )
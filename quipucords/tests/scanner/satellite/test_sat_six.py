@@ -309,7 +309,7 @@ class TestSatelliteSixV1:
             "scanner.satellite.utils.get_connect_data",
             return_value=connect_data_return_value,
         ) as mock_connect:
-            host_params = SatelliteSixV1.prepare_hosts(self.api, chunk)
+            host_params = list(SatelliteSixV1.prepare_hosts(self.api, chunk))
             assert expected == host_params
             mock_connect.assert_called_once_with(ANY)
 
@@ -362,7 +362,7 @@ class TestSatelliteSixV1:
             "scanner.satellite.utils.get_connect_data",
             return_value=connect_data_return_value,
         ):
-            host_params = SatelliteSixV1.prepare_hosts(self.api, chunk)
+            host_params = list(SatelliteSixV1.prepare_hosts(self.api, chunk))
             assert expected == host_params
 
     @pytest.mark.django_db
@@ -1,9 +1,12 @@
 """Test the satellite utils."""
 
 import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import ANY, patch
 
 import pytest
+import requests
 import requests_mock
 
 from api.models import Credential, Source
@@ -11,11 +14,14 @@ from constants import DataSources
 from scanner.satellite.exceptions import SatelliteAuthError
 from scanner.satellite.utils import (
     SATELLITE_VERSION_6,
+    close_session,
     construct_url,
     data_map,
     execute_request,
     get_connect_data,
     get_credential,
+    get_session,
+    session_key,
     status,
     validate_task_stats,
 )
@@ -166,7 +172,7 @@ class TestSatelliteUtils:
 
     @pytest.mark.django_db
     def test_execute_request_with_proxy_https(self):
-        """Test that HTTPS proxy is passed to requests.get() when proxy_url is set."""
+        """Test that HTTPS proxy is passed to the request when proxy_url is set."""
         self.source.proxy_url = "https://proxy.example.com:8080"
         self.source.save()
 
@@ -174,7 +180,7 @@ class TestSatelliteUtils:
         expected_url = construct_url(status_url, "1.2.3.4")
         expected_proxies = {"https": "https://proxy.example.com:8080"}
 
-        with patch("requests.get") as mock_get:
+        with patch.object(requests.Session, "get") as mock_get:
             mock_response = mock_get.return_value
             mock_response.status_code = 200
             mock_response.json.return_value = {"api_version": 2}
@@ -190,7 +196,7 @@ class TestSatelliteUtils:
 
     @pytest.mark.django_db
     def test_execute_request_with_proxy_http(self):
-        """Test that HTTP proxy is passed to requests.get() when URL is HTTP."""
+        """Test that HTTP proxy is passed to the request when URL is HTTP."""
         self.source.proxy_url = "http://proxy.example.com:8080"
         self.source.save()
 
@@ -198,7 +204,7 @@ class TestSatelliteUtils:
         expected_url = construct_url(status_url, "1.2.3.4")
         expected_proxies = {"http": "http://proxy.example.com:8080"}
 
-        with patch("requests.get") as mock_get:
+        with patch.object(requests.Session, "get") as mock_get:
             mock_response = mock_get.return_value
             mock_response.status_code = 200
             mock_response.json.return_value = {"api_version": 2}
@@ -221,7 +227,7 @@ class TestSatelliteUtils:
         status_url = "https://{sat_host}:{port}/api/status"
         expected_url = construct_url(status_url, "1.2.3.4")
 
-        with patch("requests.get") as mock_get:
+        with patch.object(requests.Session, "get") as mock_get:
             mock_response = mock_get.return_value
             mock_response.status_code = 200
             mock_response.json.return_value = {"api_version": 2}
@@ -234,3 +240,56 @@ class TestSatelliteUtils:
             mock_get.assert_called_once()
             _, kwargs = mock_get.call_args
             assert kwargs.get("proxies") is None
+
+    @pytest.mark.django_db
+    def test_session_per_connection_data(self):
+        """Test requests with the same connection data share a session."""
+        session = get_session(session_key("1.2.3.4", 443, "user", "pass", True, None))
+        assert session is get_session(
+            session_key("1.2.3.4", "443", "user", "pass", True, None)
+        )
+        assert session is not get_session(
+            session_key("1.2.3.4", 443, "user", "other", True, None)
+        )
+        assert session is not get_session(
+            session_key("1.2.3.4", 443, "user", "pass", False, None)
+        )
+
+    @pytest.mark.django_db
+    def test_connections_reused(self, caplog):
+        """Test requests of the scan task reuse the connections of its session."""
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                body = b'{"api_version": 2}'
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StatusHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.source.hosts = ["127.0.0.1"]
+        self.source.port = server.server_address[1]
+        self.source.save()
+        try:
+            for _ in range(3):
+                response, _url = execute_request(
+                    self.scan_task, "http://{sat_host}:{port}/api/status"
+                )
+                assert response.json() == {"api_version": 2}
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        caplog.set_level(logging.INFO)
+        close_session(self.scan_task)
+        assert "SATELLITE CONNECTIONS opened 1 connection(s) for 3 request(s)" in (
+            caplog.text
+        )
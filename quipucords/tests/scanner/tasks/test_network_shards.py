@@ -0,0 +1,129 @@
+"""Test the Celery tasks that scan a network source in shards."""
+
+import pytest
+from django.test import override_settings
+
+from api.scantask.model import ScanTask
+from constants import DataSources
+from scanner import tasks
+from tests.factories import ScanTaskFactory
+
+
+@pytest.fixture
+def scan_task():
+    """Return a running network inspect ScanTask."""
+    return ScanTaskFactory(
+        source__source_type=DataSources.NETWORK,
+        scan_type=ScanTask.SCAN_TYPE_INSPECT,
+        status=ScanTask.RUNNING,
+    )
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+@pytest.mark.django_db
+def test_run_network_shard(mocker, scan_task):
+    """Test a shard runs an InspectTaskRunner limited to its hosts."""
+    mock_runner_class = mocker.patch.object(tasks, "InspectTaskRunner")
+    mock_runner_class.return_value.run.return_value = (None, ScanTask.COMPLETED)
+
+    result = tasks.celery_run_network_shard.delay(
+        scan_task_id=scan_task.id, shard_index=1, shard_count=4
+    ).get()
+
+    assert result == (True, scan_task.id, ScanTask.COMPLETED)
+    mock_runner_class.assert_called_once_with(
+        scan_task.job, scan_task, shard=tasks.Shard(1, 4)
+    )
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+@pytest.mark.django_db
+@pytest.mark.parametrize("job_canceled,task_canceled", ((True, False), (False, True)))
+def test_run_network_shard_canceled(mocker, scan_task, job_canceled, task_canceled):
+    """Test shards skip their hosts once the scan was canceled."""
+    mocker.patch.object(tasks, "scan_job_is_canceled", return_value=job_canceled)
+    if task_canceled:
+        scan_task.status_cancel()
+    mock_runner_class = mocker.patch.object(tasks, "InspectTaskRunner")
+
+    result = tasks.celery_run_network_shard.delay(
+        scan_task_id=scan_task.id, shard_index=0, shard_count=2
+    ).get()
+
+    assert result == (False, scan_task.id, ScanTask.CANCELED)
+    mock_runner_class.assert_not_called()
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+@pytest.mark.django_db
+def test_run_network_shard_unexpected_error(mocker, scan_task):
+    """Test an unexpected error fails the shard but not the whole ScanTask."""
+    mock_runner_class = mocker.patch.object(tasks, "InspectTaskRunner")
+    mock_runner_class.return_value.run.side_effect = ValueError("boom")
+
+    result = tasks.celery_run_network_shard.delay(
+        scan_task_id=scan_task.id, shard_index=0, shard_count=2
+    ).get()
+
+    assert result == (False, scan_task.id, ScanTask.FAILED)
+    scan_task.refresh_from_db()
+    assert scan_task.status == ScanTask.RUNNING
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "finished_status", (ScanTask.COMPLETED, ScanTask.FAILED, ScanTask.CANCELED)
+)
+def test_finish_network_shards(mocker, scan_task, finished_status):
+    """Test the ScanTask status is saved once every shard is done."""
+    mock_finish = mocker.patch.object(
+        tasks.InspectTaskRunner, "finish_shards", return_value=("", finished_status)
+    )
+    shard_results = [
+        (True, scan_task.id, ScanTask.COMPLETED),
+        (False, scan_task.id, ScanTask.FAILED),
+    ]
+
+    success, scan_task_id, task_status = tasks.finish_network_shards.delay(
+        shard_results, scan_task_id=scan_task.id
+    ).get()
+
+    mock_finish.assert_called_once_with([ScanTask.COMPLETED, ScanTask.FAILED])
+    assert success is (finished_status == ScanTask.COMPLETED)
+    assert task_status == finished_status
+    scan_task.refresh_from_db()
+    assert scan_task.status == finished_status
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+@pytest.mark.django_db
+def test_finish_network_shards_canceled(mocker, scan_task):
+    """Test a canceled ScanTask stays canceled after its shards are done."""
+    scan_task.status_cancel()
+    mock_finish = mocker.patch.object(tasks.InspectTaskRunner, "finish_shards")
+
+    result = tasks.finish_network_shards.delay(
+        [(True, scan_task.id, ScanTask.COMPLETED)], scan_task_id=scan_task.id
+    ).get()
+
+    assert result == (False, scan_task.id, ScanTask.CANCELED)
+    mock_finish.assert_not_called()
+    scan_task.refresh_from_db()
+    assert scan_task.status == ScanTask.CANCELED
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+@pytest.mark.django_db
+def test_start_network_shards(mocker, scan_task):
+    """Test the ScanTask is started and prepared for its shards."""
+    scan_task.status = ScanTask.PENDING
+    scan_task.save()
+    mock_start = mocker.patch.object(tasks.InspectTaskRunner, "start_shards")
+
+    result = tasks.start_network_shards.delay(scan_task_id=scan_task.id).get()
+
+    assert result == (True, scan_task.id, ScanTask.RUNNING)
+    mock_start.assert_called_once_with()
+    scan_task.refresh_from_db()
+    assert scan_task.status == ScanTask.RUNNING
@@ -0,0 +1,190 @@
+"""Test persisting inspect results in batches."""
+
+import time
+
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.models import InspectGroup, InspectResult, RawFact
+from constants import DataSources
+from scanner.inspect_results import InspectResultBatch
+from scanner.satellite.six import SatelliteSixV2
+from scanner.satellite.utils import raw_facts_template
+from tests.factories import SourceFactory
+from tests.scanner.test_util import create_scan_job
+
+
+@pytest.fixture
+def scan_task(db):
+    """Return an inspect scan task."""
+    _, scan_task = create_scan_job(SourceFactory(source_type=DataSources.NETWORK))
+    return scan_task
+
+
+@pytest.fixture
+def inspect_group(scan_task):
+    """Return the inspect group of the scan task."""
+    inspect_group = InspectGroup.objects.create(source=scan_task.source)
+    inspect_group.tasks.add(scan_task)
+    return inspect_group
+
+
+def test_batch_persists_when_full(scan_task, inspect_group):
+    """Test results are persisted once the batch is full and when leaving it."""
+    with InspectResultBatch(scan_task, inspect_group, batch_size=2) as batch:
+        batch.add("host1", InspectResult.SUCCESS, {"fact": 1, "other": None})
+        assert not InspectResult.objects.exists()
+        batch.add("host2", InspectResult.FAILED, {"fact": 2})
+        assert InspectResult.objects.count() == 2
+        assert len(batch) == 0
+        batch.add("host3", InspectResult.UNREACHABLE, {})
+    facts = RawFact.objects.filter(inspect_result__inspect_group=inspect_group)
+    assert sorted(facts.values_list("inspect_result__name", "name", "value")) == [
+        ("host1", "fact", 1),
+        ("host1", "other", None),
+        ("host2", "fact", 2),
+    ]
+    assert dict(inspect_group.inspect_results.values_list("name", "status")) == {
+        "host1": InspectResult.SUCCESS,
+        "host2": InspectResult.FAILED,
+        "host3": InspectResult.UNREACHABLE,
+    }
+    scan_task.refresh_from_db()
+    assert (
+        scan_task.systems_scanned,
+        scan_task.systems_failed,
+        scan_task.systems_unreachable,
+    ) == (1, 1, 1)
+
+
+def test_batch_counts_systems_without_result(scan_task, inspect_group):
+    """Test systems counted without a result are only added to the stats."""
+    with InspectResultBatch(scan_task, inspect_group, batch_size=1) as batch:
+        batch.count(InspectResult.FAILED)
+        batch.add("host1", InspectResult.FAILED, {})
+        batch.count(InspectResult.SUCCESS)
+    assert list(inspect_group.inspect_results.values_list("name", flat=True)) == [
+        "host1"
+    ]
+    scan_task.refresh_from_db()
+    assert (scan_task.systems_scanned, scan_task.systems_failed) == (1, 2)
+
+
+def test_batch_queries(scan_task, inspect_group):
+    """Test a batch takes the same number of queries whatever its size."""
+    query_counts = []
+    # the first flush also loads what the stats log message needs
+    for size in (1, 10, 50):
+        batch = InspectResultBatch(scan_task, inspect_group, batch_size=100)
+        for index in range(size):
+            batch.add(f"host{size}-{index}", InspectResult.SUCCESS, {"fact": index})
+        with CaptureQueriesContext(connection) as queries:
+            assert len(batch.flush()) == size
+        query_counts.append(len(queries))
+    assert query_counts[1] == query_counts[2]
+    scan_task.refresh_from_db()
+    assert scan_task.systems_scanned == 61
+
+
+def _persist_one_by_one(scan_task, inspect_group, hosts):
+    """Persist results like the scanners used to, one system at a time."""
+    for name, facts in hosts:
+        inspect_result = InspectResult.objects.create(
+            name=name, status=InspectResult.SUCCESS, inspect_group=inspect_group
+        )
+        RawFact.objects.bulk_create(
+            RawFact(name=key, value=value, inspect_result=inspect_result)
+            for key, value in facts.items()
+        )
+        scan_task.increment_stats(name, increment_sys_scanned=True)
+
+
+def _persist_in_batches(scan_task, inspect_group, hosts):
+    with InspectResultBatch(scan_task, inspect_group) as batch:
+        for name, facts in hosts:
+            batch.add(name, InspectResult.SUCCESS, facts)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize(
+    "persist", (_persist_one_by_one, _persist_in_batches), ids=("single", "batch")
+)
+def test_benchmark_rows_per_second(scan_task, inspect_group, persist, capsys):
+    """Measure how many rows per second each persistence strategy writes."""
+    hosts = [
+        (f"host{index}", {f"fact{fact}": index for fact in range(20)})
+        for index in range(1000)
+    ]
+    start = time.monotonic()
+    persist(scan_task, inspect_group, hosts)
+    duration = time.monotonic() - start
+
+    rows = InspectResult.objects.count() + RawFact.objects.count()
+    assert rows == 21000
+    with capsys.disabled():
+        print(  # noqa: T201
+            f"\n{persist.__name__}: {rows} rows in {duration:.2f}s"
+            f" ({rows / duration:.0f} rows/s)"
+        )
+
+
+def _save_each_satellite_fact(satellite, hosts):
+    """Persist results like Satellite scans used to, one fact row at a time."""
+    for name, facts in hosts:
+        with transaction.atomic():
+            inspect_result = InspectResult.objects.create(
+                name=name,
+                status=InspectResult.SUCCESS,
+                inspect_group=satellite._inspect_group,
+            )
+            for key, value in facts.items():
+                RawFact(name=key, value=value, inspect_result=inspect_result).save()
+        satellite.inspect_scan_task.increment_stats(name, increment_sys_scanned=True)
+
+
+def _record_satellite_batches(satellite, hosts):
+    with satellite.inspect_result_batch() as batch:
+        for name, facts in hosts:
+            satellite.record_inspect_result(name, facts, batch=batch)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize(
+    "persist,batch_size",
+    (
+        (_save_each_satellite_fact, None),
+        (_record_satellite_batches, 50),
+        (_record_satellite_batches, 500),
+    ),
+    ids=("save_each_fact", "batch50", "batch500"),
+)
+def test_benchmark_satellite_rows_per_second(
+    scan_task, persist, batch_size, settings, capsys
+):
+    """Measure the rows per second Satellite scans write, with ~40 facts a host."""
+    settings.QUIPUCORDS_INSPECT_RESULT_BATCH_SIZE = batch_size
+    satellite = SatelliteSixV2(scan_task.job, scan_task)
+    hosts = [
+        (
+            f"host{index}",
+            {
+                **{name: f"{name}-{index}" for name in raw_facts_template()},
+                **{f"fact{fact}": index for fact in range(21)},
+            },
+        )
+        for index in range(1000)
+    ]
+    start = time.monotonic()
+    persist(satellite, hosts)
+    duration = time.monotonic() - start
+
+    rows = InspectResult.objects.count() + RawFact.objects.count()
+    assert rows == 41000
+    scan_task.refresh_from_db()
+    assert scan_task.systems_scanned == 1000
+    with capsys.disabled():
+        print(  # noqa: T201
+            f"\n{persist.__name__} ({batch_size=}): {rows} rows in {duration:.2f}s"
+            f" ({rows / duration:.0f} rows/s)"
+        )
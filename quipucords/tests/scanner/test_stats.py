@@ -0,0 +1,73 @@
+"""Test counting scan task stats in memory."""
+
+import pytest
+
+from constants import DataSources
+from scanner import stats
+from scanner.stats import ScanTaskStatsCounter
+from tests.factories import SourceFactory
+from tests.scanner.test_util import create_scan_job
+
+
+@pytest.fixture
+def scan_task(db):
+    """Return an inspect scan task."""
+    _, scan_task = create_scan_job(SourceFactory(source_type=DataSources.NETWORK))
+    return scan_task
+
+
+def _stats(scan_task):
+    scan_task.refresh_from_db()
+    return (
+        scan_task.systems_scanned,
+        scan_task.systems_failed,
+        scan_task.systems_unreachable,
+    )
+
+
+def test_flush_on_count(scan_task):
+    """Test stats are written once enough systems were counted."""
+    counter = ScanTaskStatsCounter(scan_task, flush_count=3, flush_interval=60)
+    counter.increment("host1", sys_scanned=1)
+    counter.increment("host2", sys_failed=1)
+    assert _stats(scan_task) == (0, 0, 0)
+    counter.increment("host3", sys_unreachable=1)
+    assert _stats(scan_task) == (1, 1, 1)
+
+
+def test_flush_on_interval(scan_task, mocker):
+    """Test stats are written once the oldest unwritten count is old enough."""
+    monotonic = mocker.patch.object(stats.time, "monotonic", return_value=100)
+    counter = ScanTaskStatsCounter(scan_task, flush_count=100, flush_interval=5)
+    counter.increment("host1", sys_scanned=1)
+    monotonic.return_value = 104
+    counter.increment("host2", sys_scanned=1)
+    assert _stats(scan_task) == (0, 0, 0)
+    monotonic.return_value = 105
+    counter.increment("host3", sys_scanned=1)
+    assert _stats(scan_task) == (3, 0, 0)
+
+
+def test_flush_on_exit(scan_task):
+    """Test pending stats are written when leaving the counter context."""
+    with ScanTaskStatsCounter(scan_task, flush_count=100) as counter:
+        counter.increment("host1", sys_scanned=1)
+        counter.increment("host2", sys_scanned=0)
+        assert _stats(scan_task) == (0, 0, 0)
+    assert _stats(scan_task) == (1, 0, 0)
+
+
+def test_counters_add_up(scan_task):
+    """Test counters of the same task (e.g. of several shards) add up."""
+    counters = [ScanTaskStatsCounter(scan_task, flush_count=100) for _ in range(2)]
+    for counter in counters:
+        counter.increment("host", sys_failed=1)
+    for counter in counters:
+        counter.flush()
+    assert _stats(scan_task) == (0, 2, 0)
+
+
+def test_unknown_stat(scan_task):
+    """Test counting an unknown stat fails."""
+    with pytest.raises(TypeError, match="sys_other"):
+        ScanTaskStatsCounter(scan_task).increment("host", sys_other=1)
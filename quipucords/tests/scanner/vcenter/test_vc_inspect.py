@@ -339,7 +339,7 @@ class TestVCenterInspectTaskRunnerTest:
             mock_parse_parent_props.assert_called_with(ANY, ANY)
             mock_parse_cluster_props.assert_called_with(ANY, ANY)
             mock_parse_host_props.assert_called_with(ANY, ANY)
-            mock_parse_vm_props.assert_called_with(ANY, ANY)
+            mock_parse_vm_props.assert_called_with(ANY, ANY, batch=ANY)
 
     def test_inspect(self, mocker):
         """Test the inspect method."""